@@ -1 +1,54 @@
+#!/usr/bin/env python3
+#   encoding: UTF-8
+
+# This file is part of tallywallet.
+#
+# Tallywallet is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Tallywallet is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with tallywallet.  If not, see <http://www.gnu.org/licenses/>.
+
+import importlib
+
+# The public API of the package, by submodule. Each name is imported
+# on first access, so importing the package itself costs almost nothing.
+_api = {
+    "currency": ["Currency", "ISO4217", "lookup", "minor_units"],
+    "exchange": ["Exchange"],
+    "finance": ["Amortization", "Note", "schedule"],
+    "ledger": ["Column", "Ledger", "Role", "Status"],
+    "output": ["journal", "metadata"],
+    "trade": ["TradeFees", "TradeGain", "TradePath"],
+}
+
+_attrs = {name: mod for mod, names in _api.items() for name in names}
+
+__all__ = sorted(_attrs)
+
+
+def __getattr__(name):
+    if name in _api:
+        return importlib.import_module("." + name, __name__)
+    try:
+        mod = importlib.import_module("." + _attrs[name], __name__)
+    except KeyError:
+        raise AttributeError(
+            "module {!r} has no attribute {!r}".format(__name__, name))
+    rv = getattr(mod, name)
+    globals()[name] = rv
+    return rv
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_attrs))
+
+# Keep this assignment last. The setup script may parse it from the text.
 __version__ = "0.10.0"
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+#   encoding: UTF-8
+
+# This file is part of tallywallet.
+#
+# Tallywallet is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Tallywallet is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with tallywallet.  If not, see <http://www.gnu.org/licenses/>.
+
+from collections import OrderedDict
+from decimal import Decimal
+import itertools
+import os
+import sys
+import tempfile
+import time
+
+from tallywallet.common.test.helpers import book
+
+__doc__ = """
+The benchmark module times the fast paths of the package against the
+code they replace. These timings are not part of the tests, since they
+depend on the load of the machine. Run it as a script, naming the
+benchmarks to run::
+
+    python -m tallywallet.common.benchmark portfolio
+
+Each benchmark reports the best of several runs, in seconds.
+"""
+
+
+def best(fn, repeat=3):
+    """
+    Return the shortest duration of `repeat` calls of `fn`.
+    """
+    rv = None
+    for i in range(repeat):
+        then = time.perf_counter()
+        fn()
+        span = time.perf_counter() - then
+        rv = span if rv is None else min(rv, span)
+    return rv
+
+
+def portfolio(repeat=3, size=20000, workers=(0, 1, 2, 4)):
+    """
+    Time the schedules of a portfolio calculated in batches in this
+    process, and in a pool of each number of `workers`.
+
+    This function is a generator. It produces 2-tuples of a label and
+    a duration.
+    """
+    from tallywallet.common.finance import schedule
+    from tallywallet.common.portfolio import parallel
+    from tallywallet.common.portfolio import schedules
+    notes = book(size)
+
+    def serial():
+        for note in notes:
+            for record in schedule(note):
+                pass
+
+    yield ("schedule for each Note", best(serial, repeat))
+    for exact in (True, False):
+        yield (
+            "schedules exact={}".format(exact),
+            best(lambda: list(schedules(notes, exact=exact)), repeat))
+        for n in workers:
+            yield (
+                "parallel exact={} workers={}".format(exact, n),
+                best(
+                    lambda: list(parallel(notes, exact=exact, workers=n)),
+                    repeat))
+
+
+def annuity(repeat=3, size=20000):
+    """
+    Time the annuity factors of a portfolio with the cache of
+    :py:func:`compound <tallywallet.common.finance.compound>` cleared
+    before each Note, and then kept.
+
+    This function is a generator. It produces 2-tuples of a label and
+    a duration.
+    """
+    from tallywallet.common.finance import compound
+    from tallywallet.common.finance import discount_simple
+    notes = book(size)
+
+    def cold():
+        for note in notes:
+            compound.cache_clear()
+            discount_simple(note)
+
+    def warm():
+        for note in notes:
+            discount_simple(note)
+
+    yield ("discount_simple cold", best(cold, repeat))
+    yield ("discount_simple warm", best(warm, repeat))
+
+
+def store(repeat=3, size=2000):
+    """
+    Time the schedules of a portfolio calculated, and then loaded from
+    a :py:class:`ScheduleStore <tallywallet.common.store.ScheduleStore>`.
+
+    This function is a generator. It produces 2-tuples of a label and
+    a duration.
+    """
+    from tallywallet.common.finance import schedule
+    from tallywallet.common.store import ScheduleStore
+    notes = book(size)
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ScheduleStore(os.path.join(tmp, "schedules"))
+        for note in notes:
+            cache.schedule(note)
+        yield (
+            "schedule for each Note",
+            best(lambda: [list(schedule(i)) for i in notes], repeat))
+        yield (
+            "ScheduleStore hits",
+            best(lambda: [cache.schedule(i) for i in notes], repeat))
+
+
+def consistency(repeat=3, size=180):
+    """
+    Time the search for inconsistent quotes among `size` currencies,
+    when the bad quote is off, and then on, the spanning tree.
+
+    This function is a generator. It produces 2-tuples of a label and
+    a duration.
+    """
+    from tallywallet.common.consistency import inconsistencies
+    from tallywallet.common.exchange import Exchange
+    codes = ["C{:03d}".format(i) for i in range(size)]
+    values = {c: Decimal(n + 1) for n, c in enumerate(codes)}
+    for label, pair in (
+        ("off the tree", (codes[7], codes[size // 2])),
+        ("on the tree", (codes[0], codes[size // 2]))
+    ):
+        exchange = Exchange(
+            ((a, b), values[b] / values[a])
+            for a, b in itertools.combinations(codes, 2))
+        exchange[pair] *= Decimal("1.001")
+        yield (
+            "inconsistencies {}".format(label),
+            best(lambda: list(inconsistencies(exchange)), repeat))
+
+
+def flow(repeat=3, steps=500):
+    """
+    Time timesteps of the money circuit by its operations, and by a
+    :py:class:`Plan <tallywallet.common.flow.Plan>`.
+
+    This function is a generator. It produces 2-tuples of a label and
+    a duration.
+    """
+    from tallywallet.common.currency import Currency as Cy
+    from tallywallet.common.debunking import HOUR
+    from tallywallet.common.debunking import INITIAL
+    from tallywallet.common.debunking import banking_licence
+    from tallywallet.common.debunking import columns
+    from tallywallet.common.debunking import cycle
+    from tallywallet.common.debunking import model
+    from tallywallet.common.flow import Plan
+    from tallywallet.common.ledger import Ledger
+
+    def run(step):
+        ldgr = Ledger(*columns.values(), ref=Cy.USD)
+        banking_licence(ldgr, INITIAL)
+        for n in range(steps):
+            step(ldgr)
+
+    plan = Plan(model, HOUR)
+    yield ("cycle", best(lambda: run(lambda x: cycle(x, HOUR)), repeat))
+    yield ("Plan.apply", best(lambda: run(plan.apply), repeat))
+
+
+benchmarks = OrderedDict([
+    ("portfolio", portfolio),
+    ("annuity", annuity),
+    ("store", store),
+    ("consistency", consistency),
+    ("flow", flow),
+])
+
+
+def main(args):
+    for name in args.names or benchmarks:
+        for label, span in benchmarks[name](args.repeat):
+            print("{:<48}{:>10.3f}".format(label, span))
+    return 0
+
+
+def parser():
+    import argparse
+    rv = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    rv.add_argument(
+        "names", nargs="*",
+        help="Choose the benchmarks to run from: {} [all]".format(
+            ", ".join(benchmarks)))
+    rv.add_argument(
+        "--repeat", type=int, default=3,
+        help="Set the number of runs of each timing [3]")
+    return rv
+
+
+def run():
+    p = parser()
+    args = p.parse_args()
+    unknown = set(args.names) - set(benchmarks)
+    if unknown:
+        p.error("Unknown benchmark: {}".format(", ".join(sorted(unknown))))
+    rv = main(args)
+    sys.exit(rv)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+#   encoding: UTF-8
+
+# This file is part of tallywallet.
+#
+# Tallywallet is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Tallywallet is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with tallywallet.  If not, see <http://www.gnu.org/licenses/>.
+
+from collections import namedtuple
+from collections import OrderedDict
+import decimal
+from decimal import Decimal
+import heapq
+
+from tallywallet.common.finance import Amortization
+from tallywallet.common.finance import schedule
+from tallywallet.common.ledger import Column
+from tallywallet.common.ledger import Role
+
+__doc__ = """
+The cashflow module combines the amortization schedules of many
+:py:class:`Notes <tallywallet.common.finance.Note>` into a single
+time series of payments.
+
+The schedule of each Note is generated lazily, and the schedules are
+merged in date order. Only the next payment of each Note is held in
+memory, regardless of the length of the loans.
+
+Payments are posted to a
+:py:class:`Ledger <tallywallet.common.ledger.Ledger>` according to a
+set of :py:class:`Posting <tallywallet.common.cashflow.Posting>` rules.
+Those for a lender and for a borrower are provided as `LENDER` and
+`BORROWER`.
+"""
+
+CashFlow = namedtuple(
+    "CashFlow",
+    ["date", "currency", "payment", "interest", "repaid", "count"])
+CashFlow.__doc__ = """`{}`
+
+The total of all payments made in one currency on one date:
+
+    date
+        The date on which the payments are made.
+    currency
+        The currency of the payments.
+    payment
+        The total amount of the payments.
+    interest
+        The total amount paid as interest.
+    repaid
+        The total amount repaid from principal.
+    count
+        The number of payments.
+""".format(CashFlow.__doc__)
+
+Posting = namedtuple("Posting", ["field", "sign", "column"])
+Posting.__doc__ = """`{}`
+
+A rule by which one field of a payment is posted to a Ledger:
+
+    field
+        The name of the field, eg: `interest`.
+    sign
+        1 or -1. The value of the field is multiplied by this before
+        it is committed.
+    column
+        The key by which the Column is found in the mapping supplied
+        to :py:func:`bulk <tallywallet.common.cashflow.bulk>`.
+""".format(Posting.__doc__)
+
+Batch = namedtuple("Batch", ["date", "count", "totals"])
+Batch.__doc__ = """`{}`
+
+The result of committing a batch of payments to a Ledger:
+
+    date
+        The date of the payments.
+    count
+        The number of payments in the batch.
+    totals
+        An ordered dictionary of the value committed to each Column.
+""".format(Batch.__doc__)
+
+LENDER = (
+    Posting("payment", 1, "cash"), Posting("interest", 1, "income"),
+    Posting("repaid", -1, "loans"))
+
+BORROWER = (
+    Posting("payment", -1, "cash"), Posting("interest", 1, "expense"),
+    Posting("repaid", -1, "loans"))
+
+
+def merge(notes, places=2, rounding=decimal.ROUND_UP):
+    """
+    Merge the schedules of a sequence of Notes in date order.
+
+    Parameters `places` and `rounding` are as for
+    :py:func:`schedule <tallywallet.common.finance.schedule>`.
+
+    This function is a generator. It produces 3-tuples of
+    (position of Note in sequence, Note,
+    :py:class:`Amortization <tallywallet.common.finance.Amortization>`).
+    Payments due on the same date are ordered by position.
+    """
+    def stream(n, note):
+        for record in schedule(note, places, rounding):
+            yield (record.date, n, note, record)
+
+    for date, n, note, record in heapq.merge(
+        *(stream(n, note) for n, note in enumerate(notes))
+    ):
+        yield (n, note, record)
+
+
+def cashflows(notes, places=2, rounding=decimal.ROUND_UP):
+    """
+    Aggregate the schedules of a sequence of Notes by date and currency.
+
+    Parameters `places` and `rounding` are as for
+    :py:func:`schedule <tallywallet.common.finance.schedule>`.
+
+    This function is a generator. It produces a sequence of
+    :py:class:`CashFlow <tallywallet.common.cashflow.CashFlow>` objects
+    in date order. Within a date, currencies appear in the order in which
+    they are first met.
+    """
+    date = None
+    totals = OrderedDict()
+    for n, note, record in merge(notes, places, rounding):
+        if record.date != date:
+            for currency, vals in totals.items():
+                yield CashFlow(date, currency, *vals)
+            date = record.date
+            totals = OrderedDict()
+
+        vals = totals.setdefault(
+            note.currency, [Decimal(0), Decimal(0), Decimal(0), 0])
+        vals[0] += record.payment
+        vals[1] += record.interest
+        vals[2] += record.repaid
+        vals[3] += 1
+
+    for currency, vals in totals.items():
+        yield CashFlow(date, currency, *vals)
+
+
+def column(arg, currency):
+    """
+    Return `arg` if it is a Column. Otherwise `arg` is a mapping, and the
+    Column for `currency` is returned from it.
+    """
+    return arg if isinstance(arg, Column) else arg[currency]
+
+
+def post(ledger, flows, cash, income, loans):
+    """
+    Commit a sequence of CashFlow objects to a Ledger from the point of
+    view of the lender. Each payment is received as cash. The interest is
+    income, and the repayment reduces the value of the loans.
+
+    :param ledger:  The Ledger to update.
+    :param flows:   An iterable of CashFlow objects.
+    :param cash:    The Column to receive payments. Alternatively, a
+                    mapping of currency to Column.
+    :param income:  The Column (or mapping) for interest.
+    :param loans:   The Column (or mapping) of principal lent.
+
+    This function is a generator. It produces each CashFlow once it has
+    been committed.
+    """
+    cols = {"cash": cash, "income": income, "loans": loans}
+    for flow in flows:
+        for rule in LENDER:
+            ledger.commit(
+                rule.sign * getattr(flow, rule.field),
+                column(cols[rule.column], flow.currency), ts=flow.date)
+        yield flow
+
+
+def balanced(rules, cols, currency):
+    """
+    Return True if a set of Posting rules keeps the Fundamental Accounting
+    Equation of a Ledger in balance for payments in `currency`.
+    """
+    record = Amortization(None, Decimal(3), Decimal(1), Decimal(2), None)
+    lhs = rhs = 0
+    for rule in rules:
+        col = column(cols[rule.column], currency)
+        val = rule.sign * getattr(record, rule.field)
+        if col.role in (Role.asset, Role.expense, Role.dividend):
+            lhs += val
+        else:
+            rhs += val
+    return lhs == rhs
+
+
+def bulk(ledger, stream, cols, rules=LENDER, size=None):
+    """
+    Commit a stream of payments to a Ledger in batches.
+
+    :param ledger:  The Ledger to update.
+    :param stream:  An iterable of 3-tuples of (position, Note,
+                    Amortization) in date order, as produced by
+                    :py:func:`merge <tallywallet.common.cashflow.merge>`.
+    :param cols:    A mapping of the keys of the rules to Columns, or to
+                    mappings of currency to Column.
+    :param rules:   A sequence of
+                    :py:class:`Posting <tallywallet.common.cashflow.Posting>`
+                    rules.
+    :param size:    The largest number of payments in a batch. If None,
+                    a batch holds all the payments made on one date.
+
+    The payments of a batch are totalled for each Column, and each total
+    is committed once. A ValueError is raised if the rules do not balance
+    for the currency of a payment.
+
+    This function is a generator. It produces a
+    :py:class:`Batch <tallywallet.common.cashflow.Batch>` object once
+    each batch has been committed.
+    """
+    checked = set()
+
+    def flush(date, count, totals):
+        for col, val in totals.items():
+            ledger.commit(val, col, ts=date)
+        return Batch(date, count, totals)
+
+    date = None
+    count = 0
+    totals = OrderedDict()
+    for n, note, record in stream:
+        if count and (record.date != date or count == size):
+            yield flush(date, count, totals)
+            count = 0
+            totals = OrderedDict()
+
+        if note.currency not in checked:
+            if not balanced(rules, cols, note.currency):
+                raise ValueError(
+                    "Postings do not balance in {}".format(note.currency))
+            checked.add(note.currency)
+
+        date = record.date
+        count += 1
+        for rule in rules:
+            col = column(cols[rule.column], note.currency)
+            totals[col] = totals.get(col, Decimal(0)) + (
+                rule.sign * getattr(record, rule.field))
+
+    if count:
+        yield flush(date, count, totals)
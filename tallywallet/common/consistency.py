@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+#   encoding: UTF-8
+
+# This file is part of tallywallet.
+#
+# Tallywallet is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Tallywallet is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with tallywallet.  If not, see <http://www.gnu.org/licenses/>.
+
+from collections import defaultdict
+from collections import deque
+from collections import namedtuple
+import math
+
+__doc__ = """
+The consistency module checks the rates in an Exchange_ against each
+other.
+
+A set of rates is consistent when every round trip between currencies
+returns the amount you started with. If some cycle of trades has a
+product different from unity, then the result of converting one currency
+to another depends on the path taken, and an arbitrage is possible.
+
+Working with the logarithm of each rate, a cycle whose product exceeds
+unity is a negative cycle in the graph of negated log-rates. Because
+every quoted rate implies its reciprocal, that graph is symmetric. So
+rather than search for negative cycles edge by edge, this module assigns
+each currency a potential along a spanning tree of the quotes. Any quote
+which disagrees with the potentials closes an inconsistent cycle. The
+search visits each quote once.
+"""
+
+Inconsistency = namedtuple("Inconsistency", ["pair", "cycle", "product"])
+Inconsistency.__doc__ = """`{}`
+
+A 3-tuple describing a cycle of trades which does not return to unity:
+
+    pair
+        The key of the Exchange_ quote which closes the cycle.
+    cycle
+        A tuple of currencies, beginning and ending with the same one,
+        in the direction which returns more than was traded.
+    product
+        The float product of the rates around the cycle.
+""".format(Inconsistency.__doc__)
+
+
+def rate_graph(exchange):
+    """
+    Build the graph of log-rates for the quotes in an Exchange_.
+
+    Returns a dictionary mapping each currency to a list of
+    2-tuples of (currency, log-rate). Every quote contributes an edge
+    in each direction.
+
+    Raises ValueError if a rate is zero or negative, since it has no
+    logarithm and no round trip through it can return to unity.
+    """
+    rv = defaultdict(list)
+    for (rcv, out), rate in exchange.items():
+        if not rate > 0:
+            raise ValueError("Rate is not positive: {}/{} {}".format(
+                rcv.name, out.name, rate))
+        w = math.log(rate)
+        rv[rcv].append((out, w))
+        rv[out].append((rcv, -w))
+    return rv
+
+
+def potentials(graph, exclude=()):
+    """
+    Assign a log-value to every currency in the graph by breadth-first
+    search from the first currency of each connected component.
+
+    :param exclude: A collection of frozensets, each of two currencies
+                    between which no edge is to be used in the tree.
+
+    Returns a 2-tuple of dictionaries; the potential of each currency,
+    and its parent in the spanning tree.
+    """
+    pot = {}
+    parent = {}
+    for root in graph:
+        if root in pot:
+            continue
+
+        pot[root] = 0.0
+        parent[root] = None
+        queue = deque([root])
+        while queue:
+            node = queue.popleft()
+            for nbr, w in graph[node]:
+                if nbr not in pot and frozenset((node, nbr)) not in exclude:
+                    pot[nbr] = pot[node] + w
+                    parent[nbr] = node
+                    queue.append(nbr)
+    return pot, parent
+
+
+def tree_path(parent, src, dst):
+    """
+    Return the list of currencies on the spanning tree path from
+    `src` to `dst`.
+    """
+    ancestors = []
+    node = src
+    while node is not None:
+        ancestors.append(node)
+        node = parent[node]
+    index = {node: n for n, node in enumerate(ancestors)}
+
+    tail = []
+    node = dst
+    while node not in index:
+        tail.append(node)
+        node = parent[node]
+    return ancestors[:index[node] + 1] + list(reversed(tail))
+
+
+def residuals(exchange, pot, tolerance=1E-6):
+    """
+    Return a list of 2-tuples of the key of each quote in an Exchange_
+    which disagrees with the potentials `pot`, and the logarithm of
+    the disagreement.
+    """
+    rv = []
+    for (rcv, out), rate in exchange.items():
+        residual = math.log(rate) - (pot[out] - pot[rcv])
+        if abs(residual) > tolerance:
+            rv.append(((rcv, out), residual))
+    return rv
+
+
+def inconsistencies(exchange, tolerance=1E-6):
+    """
+    Find the quotes in an Exchange_ which are inconsistent with the rest.
+
+    :param tolerance: The largest magnitude of the logarithm of a cycle
+                      product which is considered to be unity.
+
+    A bad quote which lies on the spanning tree shifts the potentials of
+    all the currencies beyond it. Then every other quote across it seems
+    to be at fault. So when there are several, the tree edges they have in
+    common are suspected. The tree is built again without each suspect in
+    turn, and the suspect is blamed instead if fewer quotes then disagree.
+
+    This function is a generator. It produces a sequence of
+    :py:class:`Inconsistency
+    <tallywallet.common.consistency.Inconsistency>` objects.
+    """
+    graph = rate_graph(exchange)
+    pot, parent = potentials(graph)
+    found = residuals(exchange, pot, tolerance)
+    if len(found) > 1:
+        common = None
+        for (rcv, out), residual in found:
+            if rcv != out:
+                path = tree_path(parent, out, rcv)
+                edges = list(map(frozenset, zip(path, path[1:])))
+                common = edges if common is None else [
+                    i for i in common if i in edges]
+        for edge in common or ():
+            alt, tree = potentials(graph, exclude={edge})
+            rv = residuals(exchange, alt, tolerance)
+            if len(rv) < len(found):
+                pot, parent, found = alt, tree, rv
+
+    for (rcv, out), residual in found:
+        if rcv == out:
+            cycle = (rcv, out)
+        else:
+            cycle = tuple([rcv] + tree_path(parent, out, rcv))
+
+        if residual < 0:
+            cycle = tuple(reversed(cycle))
+        yield Inconsistency((rcv, out), cycle, math.exp(abs(residual)))
+
+
+def consistent(exchange, tolerance=1E-6):
+    """
+    Return True if all the rates in an Exchange_ agree with each other.
+    """
+    return next(inconsistencies(exchange, tolerance), None) is None
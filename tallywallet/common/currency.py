@@ -16,17 +16,60 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with tallywallet.  If not, see <http://www.gnu.org/licenses/>.
 
+from collections import namedtuple
 import enum
 
-import tallywallet.common
-
 __doc__ = """
 The currency module defines currencies of various types. Use them
 wherever you need to record loans or transactions of exchange.
 
-Tallwallet {} only defines a handful of currency types. Look out for
-improvements in future releases.
-""".format(tallywallet.common.__version__)
+Tallywallet defines a handful of currency types in the Currency
+enumeration. The full set of `ISO 4217`_ codes is available from a
+registry which is loaded the first time you look one up.
+"""
+
+ISO4217 = namedtuple("ISO4217", ["name", "value", "minor"])
+ISO4217.__doc__ = """`{}`
+
+A 3-tuple describing a currency defined by `ISO 4217`_:
+
+    name
+        The three-letter alphabetic code.
+    value
+        The numeric code.
+    minor
+        The number of digits after the decimal separator used to
+        express amounts, or None where this is not applicable.
+
+These objects have `name` and `value` attributes like those of
+Currency_, so they may be used as the currency of Ledger columns.
+""".format(ISO4217.__doc__)
+
+# Alphabetic code, numeric code and minor unit digits ('-' if N.A.)
+_TABLE = """
+AED7842 AFN9712 ALL0082 AMD0512 AOA9732 ARS0322 AUD0362 AWG5332 AZN9442
+BAM9772 BBD0522 BDT0502 BGN9752 BHD0483 BIF1080 BMD0602 BND0962 BOB0682
+BOV9842 BRL9862 BSD0442 BTN0642 BWP0722 BYN9332 BZD0842 CAD1242 CDF9762
+CHE9472 CHF7562 CHW9482 CLF9904 CLP1520 CNY1562 COP1702 COU9702 CRC1882
+CUC9312 CUP1922 CVE1322 CZK2032 DJF2620 DKK2082 DOP2142 DZD0122 EGP8182
+ERN2322 ETB2302 EUR9782 FJD2422 FKP2382 GBP8262 GEL9812 GHS9362 GIP2922
+GMD2702 GNF3240 GTQ3202 GYD3282 HKD3442 HNL3402 HTG3322 HUF3482 IDR3602
+ILS3762 INR3562 IQD3683 IRR3642 ISK3520 JMD3882 JOD4003 JPY3920 KES4042
+KGS4172 KHR1162 KMF1740 KPW4082 KRW4100 KWD4143 KYD1362 KZT3982 LAK4182
+LBP4222 LKR1442 LRD4302 LSL4262 LYD4343 MAD5042 MDL4982 MGA9692 MKD8072
+MMK1042 MNT4962 MOP4462 MRU9292 MUR4802 MVR4622 MWK4542 MXN4842 MXV9792
+MYR4582 MZN9432 NAD5162 NGN5662 NIO5582 NOK5782 NPR5242 NZD5542 OMR5123
+PAB5902 PEN6042 PGK5982 PHP6082 PKR5862 PLN9852 PYG6000 QAR6342 RON9462
+RSD9412 RUB6432 RWF6460 SAR6822 SBD0902 SCR6902 SDG9382 SEK7522 SGD7022
+SHP6542 SLE9252 SLL6942 SOS7062 SRD9682 SSP7282 STN9302 SVC2222 SYP7602
+SZL7482 THB7642 TJS9722 TMT9342 TND7883 TOP7762 TRY9492 TTD7802 TWD9012
+TZS8342 UAH9802 UGX8000 USD8402 USN9972 UYI9400 UYU8582 UYW9274 UZS8602
+VED9262 VES9282 VND7040 VUV5480 WST8822 XAF9500 XAG961- XAU959- XBA955-
+XBB956- XBC957- XBD958- XCD9512 XCG5322 XDR960- XOF9520 XPD964- XPF9530
+XPT962- XSU994- XTS963- XUA965- XXX999- YER8862 ZAR7102 ZMW9672 ZWG9242
+"""
+
+_registry = None
 
 
 @enum.unique
@@ -42,3 +85,81 @@ class Currency(enum.Enum):
     GBP = 826
     XBC = "bitcoin"
     XTW = "tallywallet"
+
+
+class Registry(object):
+    """
+    A lookup container for the currencies of `ISO 4217`_.
+
+    Currencies may be retrieved by alphabetic code or numeric code.
+    """
+
+    def __init__(self, table=_TABLE):
+        self.codes = {}
+        self.numbers = {}
+        for item in table.split():
+            minor = item[6:]
+            rv = ISO4217(
+                item[:3], int(item[3:6]),
+                None if minor == "-" else int(minor))
+            self.codes[rv.name] = rv
+            self.numbers[rv.value] = rv
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        else:
+            return True
+
+    def __getitem__(self, key):
+        if isinstance(key, ISO4217):
+            return self.codes[key.name]
+        elif isinstance(key, Currency):
+            if not isinstance(key.value, int):
+                raise KeyError(key)
+            return self.numbers[key.value]
+        elif isinstance(key, int):
+            return self.numbers[key]
+        elif not isinstance(key, str):
+            raise KeyError(key)
+        elif key.isdigit():
+            return self.numbers[int(key)]
+        else:
+            return self.codes[key.upper()]
+
+    def __iter__(self):
+        return iter(self.codes.values())
+
+    def __len__(self):
+        return len(self.codes)
+
+
+def registry():
+    """
+    Return the Registry of `ISO 4217`_ currencies, creating it on first use.
+    """
+    global _registry
+    if _registry is None:
+        _registry = Registry()
+    return _registry
+
+
+def lookup(key):
+    """
+    Return the :py:class:`ISO4217 <tallywallet.common.currency.ISO4217>`
+    object for a currency.
+
+    :param key: An alphabetic code, a numeric code (as an integer or
+                a string of digits), or a member of Currency_ which
+                has an ISO numeric code.
+    """
+    return registry()[key]
+
+
+def minor_units(key):
+    """
+    Return the number of decimal places used for amounts of a currency.
+    """
+    return lookup(key).minor
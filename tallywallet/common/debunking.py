@@ -16,20 +16,32 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with tallywallet.  If not, see <http://www.gnu.org/licenses/>.
 
-import argparse
-from collections import Counter
 from collections import OrderedDict
+from collections import namedtuple
+import contextlib
+import decimal
 from decimal import Decimal
+import json
+import numbers
+import os
 import sys
+import tempfile
 import warnings
 
 from tallywallet.common.currency import Currency as Cy
+from tallywallet.common.flow import Flow
+from tallywallet.common.flow import Model
+from tallywallet.common.flow import Plan
 from tallywallet.common.ledger import Column
 from tallywallet.common.ledger import Ledger
 from tallywallet.common.ledger import Role
 from tallywallet.common.ledger import Status
 from tallywallet.common.output import metadata
 from tallywallet.common.output import journal
+from tallywallet.common.sampling import Schedule
+from tallywallet.common.sampling import periodic
+from tallywallet.common.sampling import schedule
+from tallywallet.common.timing import Timings
 
 __doc__ = """
 The `tallywallet.common.debunking` module presents Keen's simulation
@@ -43,6 +55,29 @@ Or, to make use of the advanced options, read the help like this::
 
     $ python -m tallywallet.common.debunking --help
 
+Every operation of the simulation is linear in the balances of the
+Ledger. So one timestep may be compiled into a matrix, and the simulation
+run as a product of that matrix with a vector of balances. This is much
+quicker than committing each operation to the Ledger. Choose the type of
+number for the calculation with the `--kernel` option.
+
+A long simulation may be interrupted and resumed. With the `--checkpoint`
+option, the state of the simulation is saved to file at every sample and
+periodically in between. Run the same command with `--resume` to continue
+from the last save. The output is as if there had been no interruption.
+
+To see where the time goes, the `--timings` option prints a table of the
+time spent in each operation, in commits to the Ledger, in tests of its
+balance and in writing journals. The `--profile` option runs the
+simulation under the Python profiler.
+
+The same circuit is declared as a :py:mod:`flow <tallywallet.common.flow>`
+Model, which is what the compiled kernels are built from.
+
+Further, the state at the next sample time is the product of the
+balances with a power of the matrix. With the `--jump` option, the
+simulation moves directly from one sample to the next.
+
 """
 
 __all__ = [
@@ -50,7 +85,9 @@ __all__ = [
     "INITIAL", "banking_licence",
     "bank_loan", "bank_charge", "nonbank_interest", "firms_repayment",
     "firms_wages", "nonfirms_consumption",
-    "columns", "simulate"
+    "columns", "parameters", "model", "settings", "cycle", "stepwise",
+    "transition", "multiply", "power", "limit", "bisect", "Options",
+    "simulate"
 ]
 
 SEC = 1
@@ -71,6 +108,64 @@ columns = OrderedDict(
         Column("safe", Cy.USD, Role.income, "{}"),
         ))
 
+# The default rates of the operations, keyed by operation and argument.
+parameters = OrderedDict([
+    ("bank_loan.pa", Decimal("0.5")),
+    ("bank_charge.pa", Decimal("5E-2")),
+    ("firms_repayment.pa", Decimal("0.1")),
+    ("nonbank_interest.paF", Decimal("2E-2")),
+    ("nonbank_interest.paW", Decimal("3E-3")),
+    ("firms_wages.pa", Decimal(3)),
+    ("nonfirms_consumption.paB", Decimal(1)),
+    ("nonfirms_consumption.paW", Decimal(26)),
+])
+
+_repayment = (("licence", 1), ("loans", -1), ("vault", 1), ("firms", -1))
+
+model = Model(
+    columns, [
+        [Flow("loan", "vault", "bank_loan.pa", (
+            ("licence", -1), ("loans", 1), ("vault", -1), ("firms", 1)))],
+        [Flow("charge", "loans", "bank_charge.pa", (
+            ("licence", -1), ("loans", 1), ("vault", -1), ("safe", 1)))],
+        [Flow("principal", "loans", "firms_repayment.pa", _repayment),
+         Flow("interest", "charge", 1, _repayment)],
+        [Flow("firms interest", "firms", "nonbank_interest.paF", (
+            ("firms", 1), ("safe", -1))),
+         Flow("workers interest", "workers", "nonbank_interest.paW", (
+            ("workers", 1), ("safe", -1)))],
+        [Flow("wages", "firms", "firms_wages.pa", (
+            ("firms", -1), ("workers", 1)))],
+        [Flow("bankers consumption", "safe", "nonfirms_consumption.paB", (
+            ("firms", 1), ("safe", -1))),
+         Flow("workers consumption", "workers", "nonfirms_consumption.paW", (
+            ("firms", 1), ("workers", -1)))],
+    ], YEAR, parameters)
+
+
+def _commit_stage(ldgr, dt, stage, rates, sources=None):
+    """
+    Commit to a Ledger the flows of one stage of the module `model`.
+    There is one commit for each posting of a flow.
+
+    :param rates:   A mapping of the names of rates to their values.
+    :param sources: A mapping of the names of earlier flows to their
+                    amounts.
+    :returns:       The total amount of the flows.
+    """
+    scale = Decimal(dt / model.period)
+    amounts = []
+    for flow in stage:
+        rate = rates.get(flow.rate, flow.rate)
+        if flow.source in model.columns:
+            amounts.append(ldgr.value(flow.source) * rate * scale)
+        else:
+            amounts.append(sources[flow.source] * rate)
+    for flow, amount in zip(stage, amounts):
+        for key, sign in flow.postings:
+            ldgr.commit(amount if sign > 0 else -amount, columns[key])
+    return sum(amounts)
+
 
 def banking_licence(ldgr, val):
     """
@@ -85,7 +180,7 @@ def banking_licence(ldgr, val):
     return val
 
 
-def bank_loan(ldgr, dt, pa=Decimal("0.5")):
+def bank_loan(ldgr, dt, pa=parameters["bank_loan.pa"]):
     """
     These two steps create a debit against the licence and
     a corresponding addition to the loans book. The firms'
@@ -94,15 +189,10 @@ def bank_loan(ldgr, dt, pa=Decimal("0.5")):
     2. Lend money
     3. Record loan
     """
-    rv = ldgr.value("vault") * pa * Decimal(dt / YEAR)
-    ldgr.commit(-rv, columns["licence"])
-    ldgr.commit(rv, columns["loans"])
-    ldgr.commit(-rv, columns["vault"])
-    ldgr.commit(rv, columns["firms"])
-    return rv
+    return _commit_stage(ldgr, dt, model.stages[0], {"bank_loan.pa": pa})
 
 
-def bank_charge(ldgr, dt, pa=Decimal("5E-2")):
+def bank_charge(ldgr, dt, pa=parameters["bank_charge.pa"]):
     """
     This operation is a significant departure from Keen's original.
 
@@ -114,15 +204,12 @@ def bank_charge(ldgr, dt, pa=Decimal("5E-2")):
     4. Charge interest
     5. Record interest
     """
-    rv = ldgr.value("loans") * pa * Decimal(dt / YEAR)
-    ldgr.commit(-rv, columns["licence"])
-    ldgr.commit(rv, columns["loans"])
-    ldgr.commit(-rv, columns["vault"])
-    ldgr.commit(rv, columns["safe"])
-    return rv
+    return _commit_stage(ldgr, dt, model.stages[1], {"bank_charge.pa": pa})
 
 
-def firms_repayment(ldgr, dt, interest, pa=Decimal("0.1")):
+def firms_repayment(
+    ldgr, dt, interest, pa=parameters["firms_repayment.pa"]
+):
     """
     The interest calculated in the previous step is debited from
     the firms' account. At the same time, part of the principal
@@ -132,19 +219,15 @@ def firms_repayment(ldgr, dt, interest, pa=Decimal("0.1")):
     6. Repay Loan and Interest
     7. Record Loan and Interest Repayment
     """
-    principal = ldgr.value("loans") * pa * Decimal(dt / YEAR)
-    ldgr.commit(principal, columns["licence"])
-    ldgr.commit(-principal, columns["loans"])
-    ldgr.commit(principal, columns["vault"])
-    ldgr.commit(-principal, columns["firms"])
-    ldgr.commit(interest, columns["licence"])
-    ldgr.commit(-interest, columns["loans"])
-    ldgr.commit(interest, columns["vault"])
-    ldgr.commit(-interest, columns["firms"])
-    return principal + interest
+    return _commit_stage(
+        ldgr, dt, model.stages[2], {"firms_repayment.pa": pa},
+        {"charge": interest})
 
 
-def nonbank_interest(ldgr, dt, paF=Decimal("2E-2"), paW=Decimal("3E-3")):
+def nonbank_interest(
+    ldgr, dt, paF=parameters["nonbank_interest.paF"],
+    paW=parameters["nonbank_interest.paW"]
+):
     """
     Keen's original model only paid interest on the firms' account.
     Wilson added interest for workers too. In order to maintain the
@@ -157,16 +240,11 @@ def nonbank_interest(ldgr, dt, paF=Decimal("2E-2"), paW=Decimal("3E-3")):
     8. Pay firm deposit interest
     9. Pay worker deposit interest
     """
-    firms = ldgr.value("firms") * paF * Decimal(dt / YEAR)
-    workers = ldgr.value("workers") * paW * Decimal(dt / YEAR)
-    ldgr.commit(firms, columns["firms"])
-    ldgr.commit(-firms, columns["safe"])
-    ldgr.commit(workers, columns["workers"])
-    ldgr.commit(-workers, columns["safe"])
-    return firms + workers
+    return _commit_stage(ldgr, dt, model.stages[3], {
+        "nonbank_interest.paF": paF, "nonbank_interest.paW": paW})
 
 
-def firms_wages(ldgr, dt, pa=Decimal(3)):
+def firms_wages(ldgr, dt, pa=parameters["firms_wages.pa"]):
     """
     Keen models the cost of production entirely as workers'
     wages. There is no mention of capital. Clearly this is
@@ -174,13 +252,13 @@ def firms_wages(ldgr, dt, pa=Decimal(3)):
 
     10. Hire Workers
     """
-    rv = ldgr.value("firms") * pa * Decimal(dt / YEAR)
-    ldgr.commit(-rv, columns["firms"])
-    ldgr.commit(rv, columns["workers"])
-    return rv
+    return _commit_stage(ldgr, dt, model.stages[4], {"firms_wages.pa": pa})
 
 
-def nonfirms_consumption(ldgr, dt, paB=Decimal(1), paW=Decimal(26)):
+def nonfirms_consumption(
+    ldgr, dt, paB=parameters["nonfirms_consumption.paB"],
+    paW=parameters["nonfirms_consumption.paW"]
+):
     """
     This operation is as Keen defined it, since it doesn't impact
     the loan ledger or the licence asset which Wilson introduced.
@@ -188,71 +266,657 @@ def nonfirms_consumption(ldgr, dt, paB=Decimal(1), paW=Decimal(26)):
     11. Workers' Consumption
     12. Bankers' Consumption
     """
-    banks = ldgr.value("safe") * paB * Decimal(dt / YEAR)
-    workers = ldgr.value("workers") * paW * Decimal(dt / YEAR)
-    ldgr.commit((banks + workers), columns["firms"])
-    ldgr.commit(-workers, columns["workers"])
-    ldgr.commit(-banks, columns["safe"])
-    return banks + workers
+    return _commit_stage(ldgr, dt, model.stages[5], {
+        "nonfirms_consumption.paB": paB, "nonfirms_consumption.paW": paW})
 
 
-def simulate(samples, initial=INITIAL, interval=HOUR, ledger=None):
+operations = (
+    bank_loan, bank_charge, firms_repayment, nonbank_interest,
+    firms_wages, nonfirms_consumption)
+
+
+def settings(params=None):
+    """
+    Prepare the keyword arguments of the operations of the simulation.
+
+    :param params:  A mapping of the rates to change from their defaults.
+                    The keys are those of the module `parameters`,
+                    eg: `bank_loan.pa`. Values are converted to Decimal.
+    :returns:       A dictionary of keyword arguments, keyed by the name
+                    of each operation.
+    """
+    rv = {op.__name__: {} for op in operations}
+    for key, val in (params or {}).items():
+        if key not in parameters:
+            raise KeyError("Unknown parameter: {}".format(key))
+        name, arg = key.split(".")
+        rv[name][arg] = val if isinstance(val, Decimal) else Decimal(str(val))
+    return rv
+
+
+def cycle(ldgr, interval, kwargs=None):
+    """
+    Perform in order the operations of one timestep of the simulation.
+
+    :param kwargs:  The keyword arguments of each operation, as made by
+                    :py:func:`settings \
+<tallywallet.common.debunking.settings>`. If None, the default rates apply.
+    """
+    for op in stepwise(ldgr, interval, kwargs):
+        pass
+
+
+def stepwise(ldgr, interval, kwargs=None):
+    """
+    Perform the operations of one timestep as does
+    :py:func:`cycle <tallywallet.common.debunking.cycle>`, yielding the
+    name of each operation after it is done.
+    """
+    kwargs = kwargs or settings()
+    bank_loan(ldgr, interval, **kwargs["bank_loan"])
+    yield "bank_loan"
+    interest = bank_charge(ldgr, interval, **kwargs["bank_charge"])
+    yield "bank_charge"
+    firms_repayment(ldgr, interval, interest, **kwargs["firms_repayment"])
+    yield "firms_repayment"
+    nonbank_interest(ldgr, interval, **kwargs["nonbank_interest"])
+    yield "nonbank_interest"
+    firms_wages(ldgr, interval, **kwargs["firms_wages"])
+    yield "firms_wages"
+    nonfirms_consumption(ldgr, interval, **kwargs["nonfirms_consumption"])
+    yield "nonfirms_consumption"
+
+
+def transition(interval=HOUR, number=Decimal, params=None):
+    """
+    Compile one timestep of the simulation into a matrix.
+
+    The matrix is that of a :py:class:`Plan <tallywallet.common.flow.Plan>`
+    of the module `model`. The arithmetic is exact.
+
+    :param interval:    The value of the simulation timestep in seconds.
+    :param number:      The type of the elements of the matrix;
+                        Decimal, float or Fraction. The numerators and
+                        denominators of Fractions grow with every
+                        timestep, so they suit only short runs, such as
+                        those of the tests.
+    :param params:      A mapping of rates to change from their defaults.
+                        See :py:func:`settings \
+<tallywallet.common.debunking.settings>`.
+    :returns:           A list of rows of the matrix. Rows and columns are
+                        in the order of the module `columns`.
+    """
+    with decimal.localcontext() as ctx:
+        ctx.prec = decimal.MAX_PREC
+        ctx.traps[decimal.Inexact] = True
+        rv = Plan(model, interval, params).matrix()
+
+    if number is Decimal:
+        return [[+i for i in row] for row in rv]
+    else:
+        return [[number(i) for i in row] for row in rv]
+
+
+def multiply(a, b):
+    """
+    Return the product of two matrices, each a list of rows.
+    """
+    cols = list(zip(*b))
+    return [[sum(x * y for x, y in zip(row, col)) for col in cols]
+            for row in a]
+
+
+def power(matrix, n):
+    """
+    Raise a square matrix to the non-negative integer power `n`
+    by repeated squaring.
+    """
+    rv = [[int(i == j) for j in range(len(matrix))]
+          for i in range(len(matrix))]
+    while n:
+        if n & 1:
+            rv = multiply(rv, matrix)
+        n >>= 1
+        if n:
+            matrix = multiply(matrix, matrix)
+    return rv
+
+
+def limit(interval=HOUR, number=Decimal, params=None):
+    """
+    Compile the steady state of the simulation into a matrix.
+
+    Every operation is linear, so the balances after many timesteps are
+    the product of this matrix with the balances now. The transition
+    matrix is squared until it no longer changes at the precision of the
+    current context. The squares are calculated at twice that precision.
+
+    The parameters are those of :py:func:`transition \
+<tallywallet.common.debunking.transition>`.
+    """
+    ctx = decimal.getcontext()
+    with decimal.localcontext() as work:
+        work.prec = 2 * ctx.prec
+        rv = transition(interval, Decimal, params)
+        for n in range(64):
+            square = multiply(rv, rv)
+            if all(
+                ctx.plus(a) == ctx.plus(b)
+                for x, y in zip(rv, square) for a, b in zip(x, y)
+            ):
+                break
+            rv = square
+
+    if number is Decimal:
+        return [[+i for i in row] for row in rv]
+    else:
+        return [[number(i) for i in row] for row in rv]
+
+
+def _update(ldgr, state):
+    """
+    Commit to a Ledger the differences between its balances and `state`.
+    """
+    for key, val in zip(columns, state):
+        if isinstance(val, numbers.Rational):
+            val = Decimal(val.numerator) / Decimal(val.denominator)
+        ldgr.commit(Decimal(val) - ldgr.value(key), columns[key])
+
+
+def save(path, ldgr, tick, ticks, state=None, progress=None, **kwargs):
+    """
+    Write a checkpoint of the simulation to a file. The file is replaced
+    in a single operation, so an interruption leaves either the old
+    checkpoint or the new one.
+
+    :param path:    The path of the checkpoint file.
+    :param ldgr:    The Ledger of the simulation.
+    :param tick:    The number of timesteps completed.
+    :param ticks:   The timesteps of the samples yet to come.
+    :param state:   The balances of a compiled simulation, if any.
+    :param progress:    A dictionary of other values to save.
+
+    Keyword arguments record the settings of the simulation. Numbers
+    are saved as strings so that they are restored exactly.
+    """
+    data = OrderedDict([
+        ("tick", tick), ("ticks", list(ticks)),
+        ("ledger", [[col.label.format(col.ref), str(val)]
+                    for col, val in ldgr._tally.items()]),
+        ("state", None if state is None else [str(i) for i in state]),
+        ("progress", progress or {}),
+        ("settings", kwargs)])
+    fD, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)))
+    with os.fdopen(fD, "w") as fObj:
+        json.dump(data, fObj)
+    os.replace(tmp, path)
+
+
+def load(path):
+    """
+    Read a checkpoint of the simulation from a file.
+
+    Returns a dictionary as written by
+    :py:func:`save <tallywallet.common.debunking.save>`, or None if there
+    is no file.
+    """
+    try:
+        with open(path, "r") as fObj:
+            return json.load(fObj, object_pairs_hook=OrderedDict)
+    except FileNotFoundError:
+        return None
+
+
+def _balanced(ldgr):
+    return ldgr.equation.status is Status.ok
+
+
+def _restore(ldgr, values):
+    for col, val in zip(ldgr.columns.values(), values):
+        diff = val - ldgr.value(col)
+        if diff:
+            ldgr.commit(diff, col)
+
+
+def bisect(ldgr, good, tick, step):
+    """
+    Find where a Ledger first fell out of balance.
+
+    :param ldgr:    The Ledger, out of balance at timestep `tick`.
+    :param good:    A 2-tuple of (timestep, balances) at which the Ledger
+                    was in balance. The balances are those of every column
+                    of the Ledger, in order.
+    :param tick:    The timestep at which the Ledger is out of balance.
+    :param step:    A callable which advances the Ledger by one timestep.
+                    If it returns an iterable, as does :py:func:`stepwise \
+<tallywallet.common.debunking.stepwise>`, the Ledger is tested after each
+                    item, which is taken to name an operation.
+    :returns:       A 2-tuple of the first timestep out of balance, and
+                    the name of the operation which upset it, or None.
+
+    The Ledger is wound back to the balanced state and the timesteps
+    between are searched by halves. So the equation is tested
+    only a few times. Afterwards, the Ledger is restored to its state at
+    `tick`.
+    """
+    final = [ldgr.value(col) for col in ldgr.columns.values()]
+    lo, values = good
+    hi = tick
+    _restore(ldgr, values)
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        for i in range(mid - lo):
+            for op in step(ldgr) or ():
+                pass
+        if _balanced(ldgr):
+            lo = mid
+            values = [ldgr.value(col) for col in ldgr.columns.values()]
+        else:
+            hi = mid
+            _restore(ldgr, values)
+
+    name = None
+    for op in step(ldgr) or ():
+        if not _balanced(ldgr):
+            name = op
+            break
+    _restore(ldgr, final)
+    return (hi, name)
+
+
+def _ticks(samples, interval):
+    """
+    Return the timesteps of the samples of a simulation.
+    """
+    if isinstance(samples, Schedule):
+        if samples.interval != interval:
+            raise ValueError("Schedule interval does not match")
+        return samples.ticks
+    else:
+        return schedule(samples, interval).ticks
+
+
+def _kernel(interval, params=None, plan=False):
+    """
+    Choose how a Ledger is advanced by one timestep.
+
+    :returns:   A 2-tuple of callables, each of which takes a Ledger.
+                The first advances it. The second does the same, yielding
+                a name after each operation or stage, as :py:func:`bisect \
+<tallywallet.common.debunking.bisect>` requires.
+    """
+    if plan:
+        steps = Plan(model, interval, params)
+        return (steps.apply, steps.stepwise)
+
+    kwargs = settings(params)
+
+    def advance(ldgr):
+        cycle(ldgr, interval, kwargs)
+
+    def trace(ldgr):
+        return stepwise(ldgr, interval, kwargs)
+
+    return (advance, trace)
+
+
+def _run(ldgr, advance, trace, tick, span, target, check, good):
+    """
+    Advance a Ledger by `span` timesteps from `tick`, testing its equation
+    every `check` timesteps and at `target`. A warning is given when the
+    Ledger is out of balance.
+
+    :param good:    The last balanced (timestep, balances) as for
+                    :py:func:`bisect <tallywallet.common.debunking.bisect>`,
+                    or None if the Ledger is known to be out of balance.
+    :returns:       The same, updated to the end of the run.
+    """
+    for i in range(1, span + 1):
+        advance(ldgr)
+        now = tick + i
+        if now != target and (not check or now % check):
+            continue
+        elif _balanced(ldgr):
+            good = (now, [ldgr.value(col) for col in ldgr.columns.values()])
+        elif good is None:
+            warnings.warn(
+                "# Unbalanced ledger\n{}".format(journal(ldgr)))
+        else:
+            fault = bisect(ldgr, good, now, trace)
+            good = None
+            warnings.warn(
+                "# Unbalanced ledger at timestep {} after {}"
+                "\n{}".format(*fault, journal(ldgr)))
+    return good
+
+
+def _advance(state, matrix, span, powers=None):
+    """
+    Advance the balances of a compiled simulation by `span` timesteps.
+
+    :param powers:  If given, a dictionary of powers of the matrix keyed
+                    by exponent. The balances then move in a single step.
+    :returns:       A new list of balances.
+    """
+    if powers is not None:
+        if span not in powers:
+            powers[span] = power(matrix, span)
+        return [sum(a * b for a, b in zip(row, state))
+                for row in powers[span]]
+    for i in range(span):
+        state = [sum(a * b for a, b in zip(row, state)) for row in matrix]
+    return state
+
+
+def _settle(current, steady, bound):
+    """
+    Test balances against the steady state of the simulation.
+
+    :param steady:  The matrix made by :py:func:`limit \
+<tallywallet.common.debunking.limit>`.
+    :param bound:   The largest difference allowed, as a fraction.
+    :returns:       The steady state, if every balance is within `bound`
+                    of it. Otherwise None.
+    """
+    fixed = [sum(a * b for a, b in zip(row, current)) for row in steady]
+    if all(abs(a - b) <= bound * abs(b) for a, b in zip(current, fixed)):
+        return fixed
+    else:
+        return None
+
+
+Options = namedtuple("Options", [
+    "number", "jump", "params", "plan", "checkpoint", "every", "resume",
+    "tolerance", "window", "fastforward", "check"])
+Options.__new__.__defaults__ = (
+    None, False, None, False, None, None, False, None, 24, True, 1)
+Options.__doc__ = """`{}`
+
+An 11-tuple of the options to :py:func:`simulate \
+<tallywallet.common.debunking.simulate>`. Every field has a default.
+
+    number
+        If None, the operations are committed to the Ledger
+        at every timestep. Otherwise, the simulation runs
+        on a compiled :py:func:`transition \
+<tallywallet.common.debunking.transition>` matrix with elements of this
+        type, and the Ledger is updated only at sample times.
+    jump
+        If True, the compiled simulation moves from one sample
+        time to the next in a single step, by a power of the
+        transition matrix. The kernel is Decimal unless
+        `number` is given.
+    params
+        A mapping of rates to change from their defaults.
+        See :py:func:`settings <tallywallet.common.debunking.settings>`.
+    plan
+        If True, and `number` is None, each timestep is
+        performed by a :py:class:`Plan <tallywallet.common.flow.Plan>`
+        of the module `model`. There is then one commit to the Ledger
+        for each column, rather than one for each operation.
+    checkpoint
+        The path of a file to which the state of the
+        simulation is saved at every sample, before its
+        journal is produced.
+    every
+        If given, the state is saved also at every multiple
+        of this number of timesteps.
+    resume
+        If True, and the checkpoint file exists, the
+        simulation continues from the state saved there,
+        and nothing already produced is repeated.
+        A ValueError is raised if the settings of the
+        checkpoint are not the same as those given.
+    tolerance
+        If given, the simulation looks for a steady state.
+        The state to which the balances tend is found by
+        :py:func:`limit <tallywallet.common.debunking.limit>`.
+        It is reached when no balance differs from it by more than
+        this fraction. So the tolerance does not depend on the
+        timestep or the window. It is a distance to the limit, not a
+        relative change over the window. With the default rates, the
+        distance roughly halves each year; it is 0.1 after about
+        seven years and still above 0.01 after ten.
+    window
+        The number of timesteps between tests for a steady state [24].
+    fastforward
+        If True, once a steady state is found the remaining
+        samples are taken from it without further
+        timesteps. The journal of the next sample has a
+        note of the number of timesteps saved.
+    check
+        The number of timesteps between tests of the
+        Fundamental Accounting Equation [1]. If 0, it is tested
+        only at samples. When the Ledger is out of balance,
+        :py:func:`bisect <tallywallet.common.debunking.bisect>`
+        finds the timestep and operation at fault, and a
+        warning is given.
+""".format(Options.__doc__)
+
+
+def _config(initial, interval, number, opts):
+    """
+    Return the settings of a simulation which a checkpoint must share
+    to be resumed.
+    """
+    return OrderedDict([
+        ("initial", initial), ("interval", interval),
+        ("number", getattr(number, "__name__", None)),
+        ("jump", opts.jump), ("plan", opts.plan),
+        ("params", OrderedDict(
+            (k, str(v)) for k, v in sorted((opts.params or {}).items()))),
+        ("tolerance",
+         None if opts.tolerance is None else str(opts.tolerance)),
+        ("window", opts.window), ("fastforward", opts.fastforward)])
+
+
+def simulate(
+    samples, initial=INITIAL, interval=HOUR, ledger=None, sinks=(),
+    options=None, **kwargs
+):
     """
     Run the simulation by repeating the operations described above.
     At the end of every cycle, the equality of the
     Fundamental Accounting Equation is tested. A warning is raised if
     the equality fails.
 
-    :param samples: A sequence of times. At each of these the simulation
+    :param samples: A sequence of times, or a :py:class:`Schedule \
+<tallywallet.common.sampling.Schedule>`. At each of these the simulation
                     will print out the state of the Ledger. The simulation
                     will stop after the final sample time has passed.
     :param initial: The initial value of the banking licence.
     :param interval:    The value of the simulation timestep in seconds.
     :param ledger:  An existing Ledger object. If None is passed, a new
                     one will be created.
+    :param sinks:   A sequence of callables. Each is called at every
+                    sample with the time and the Ledger. See the
+                    :py:mod:`sampling <tallywallet.common.sampling>` module.
+    :param options: An :py:class:`Options \
+<tallywallet.common.debunking.Options>` object. If None, the defaults
+                    are used.
+    :param kwargs:  Any field of Options may also be given by name. It
+                    replaces that field of `options`.
     :returns:       This routine is a generator which yields RSON_ strings.
                     The final return value is the ledger object used during
                     the simulation.
     """
-    t = 0
     ldgr = ledger or Ledger(*columns.values(), ref=Cy.USD)
     cols = ldgr.columns
-    yield metadata(ldgr)
-
-    banking_licence(ldgr, initial)
+    opts = (options or Options())._replace(**kwargs)
+    number = opts.number
+    if opts.jump:
+        number = number or Decimal
+    params = opts.params
+    ticks = _ticks(samples, interval)
+
+    config = _config(initial, interval, number, opts)
+    every = opts.every if opts.checkpoint else None
+    saved = load(opts.checkpoint) if opts.checkpoint and opts.resume else None
+    if saved is None:
+        tick = 0
+        yield metadata(ldgr)
+
+        banking_licence(ldgr, initial)
+
+        yield journal(
+            ldgr, ts=0, note="Keen Money Circuit with balanced accounting")
+    else:
+        if saved["settings"] != config:
+            raise ValueError("Checkpoint settings do not match")
+        tick = saved["tick"]
+        ticks = saved["ticks"]
+        for label, val in saved["ledger"]:
+            col = cols[label]
+            ldgr.commit(Decimal(val) - ldgr.value(col), col)
+
+    if number is not None:
+        matrix = transition(interval, number, params)
+        if saved is None:
+            state = [number(ldgr.value(i)) for i in columns]
+        else:
+            state = [number(i) for i in saved["state"]]
+        powers = {1: matrix} if opts.jump else None
+    else:
+        state = None
+        advance, trace = _kernel(interval, params, opts.plan)
+        good = (tick, [ldgr.value(col) for col in cols.values()])
+
+    progress = {"steady": None, "noted": False}
+    if saved is not None:
+        progress.update(saved["progress"])
+    if opts.tolerance is not None:
+        bound = (number or Decimal)(str(opts.tolerance))
+        steady = limit(interval, number or Decimal, params)
+
+    for n, target in enumerate(ticks):
+        if progress["steady"] is not None and opts.fastforward:
+            tick = target
+
+        while tick < target:
+            span = target - tick
+            if every:
+                span = min(span, every - tick % every)
+            if opts.tolerance is not None:
+                span = min(span, opts.window - tick % opts.window)
+
+            if state is None:
+                good = _run(
+                    ldgr, advance, trace, tick, span, target, opts.check,
+                    good)
+            else:
+                state = _advance(state, matrix, span, powers)
+
+            tick += span
+            if (
+                opts.tolerance is not None and progress["steady"] is None
+                and not tick % opts.window
+            ):
+                fixed = _settle(
+                    state or [ldgr.value(i) for i in columns], steady, bound)
+                if fixed is not None:
+                    progress["steady"] = tick
+                    if opts.fastforward:
+                        tick = target
+                        if state is None:
+                            _update(ldgr, fixed)
+                        else:
+                            state = fixed
+
+            if every and tick < target and not tick % every:
+                save(
+                    opts.checkpoint, ldgr, tick, ticks[n:], state, progress,
+                    **config)
+
+        t = tick * interval
+        if number is not None:
+            _update(ldgr, state)
+            if ldgr.equation.status is not Status.ok:
+                warnings.warn(
+                    "# Unbalanced ledger\n{}".format(journal(ldgr)))
+
+        if progress["steady"] is not None and not progress["noted"]:
+            progress["noted"] = True
+            note = "Steady state at {}. {} timesteps saved".format(
+                progress["steady"] * interval,
+                ticks[-1] - progress["steady"] if opts.fastforward else 0)
+            msg = journal(ldgr, ts=t, note=note)
+        else:
+            msg = journal(ldgr, ts=t)
+        for sink in sinks:
+            sink(t, ldgr)
+
+        if opts.checkpoint:
+            save(
+                opts.checkpoint, ldgr, tick, ticks[n + 1:], state, progress,
+                **config)
+
+        yield msg
+    return ldgr
 
-    yield journal(
-        ldgr, ts=t, note="Keen Money Circuit with balanced accounting")
 
-    while samples:
-        t += interval
-        bank_loan(ldgr, interval),
-        interest = bank_charge(ldgr, interval)
-        flows = (
-            firms_repayment(ldgr, interval, interest),
-            nonbank_interest(ldgr, interval),
-            firms_wages(ldgr, interval),
-            nonfirms_consumption(ldgr, interval))
+# Fraction is not offered. The sizes of its terms grow without bound.
+kernels = OrderedDict([
+    ("ledger", {}), ("plan", {"plan": True}), ("decimal", {"number": Decimal}),
+    ("float", {"number": float})])
 
-        if not ldgr.equation.status is Status.ok:
-            warnings.warn(
-                "# Unbalanced ledger\n{}".format(journal(ldgr)))
 
-        if t >= samples[0]:
-            yield journal(ldgr, ts=t)
-            samples.pop(0)
-    return ldgr
+def timed(timings):
+    """
+    Return a context manager within which the operations of the
+    simulation, the commits to a Ledger, the tests of its equation and
+    the making of journals are recorded by a :py:class:`Timings \
+<tallywallet.common.timing.Timings>` object.
+    """
+    module = sys.modules[__name__]
+    rv = contextlib.ExitStack()
+    for op in operations:
+        rv.enter_context(timings.patch(module, op.__name__))
+    rv.enter_context(timings.patch(Plan, "apply", "Plan.apply"))
+    rv.enter_context(timings.patch(Ledger, "commit"))
+    rv.enter_context(timings.patch(Ledger, "equation"))
+    rv.enter_context(timings.patch(module, "journal"))
+    return rv
 
 
 def main(args):
     warnings.simplefilter("error")
-    samples = [YEAR * i for i in range(11)]
-    for msg in simulate(samples, args.initial, args.interval):
-        print(msg)
-    return len(samples) and 1  # an error if samples not empty
+    samples = periodic(YEAR, 10 * YEAR, args.interval)
+    options = Options(
+        jump=args.jump, checkpoint=args.checkpoint, every=args.every,
+        resume=args.resume, tolerance=args.steady, window=args.window,
+        check=args.check)._replace(**kernels[args.kernel])
+
+    def job():
+        for msg in simulate(
+            samples, args.initial, args.interval, options=options
+        ):
+            print(msg)
+
+    timings = Timings() if args.timings is not None else None
+    with timed(timings) if timings else contextlib.ExitStack():
+        if args.profile is not None:
+            import cProfile
+            import pstats
+            profile = cProfile.Profile()
+            profile.runcall(job)
+        else:
+            job()
+
+    if args.profile:
+        profile.dump_stats(args.profile)
+    elif args.profile is not None:
+        stats = pstats.Stats(profile, stream=sys.stderr)
+        stats.sort_stats("cumulative").print_stats(20)
+
+    if timings:
+        sys.stderr.write(timings.table())
+        if args.timings:
+            timings.save(args.timings)
+    return 0
 
 
 def parser():
+    import argparse
     rv = argparse.ArgumentParser(
         description=__doc__,
         formatter_class=argparse.RawDescriptionHelpFormatter)
@@ -262,6 +926,41 @@ def parser():
     rv.add_argument(
         "--interval", type=int, default=HOUR,
         help="Set the simulation interval (s) [{}]".format(HOUR))
+    rv.add_argument(
+        "--kernel", choices=list(kernels), default="ledger",
+        help="Select the arithmetic of the simulation [ledger]")
+    rv.add_argument(
+        "--jump", action="store_true", default=False,
+        help="Move directly between sample times")
+    rv.add_argument(
+        "--checkpoint", default=None,
+        help="Save the state of the simulation to this file")
+    rv.add_argument(
+        "--every", type=int, default=1000,
+        help="Set the number of timesteps between checkpoints [1000]")
+    rv.add_argument(
+        "--resume", action="store_true", default=False,
+        help="Continue from the checkpoint file, if it exists")
+    rv.add_argument(
+        "--steady", type=Decimal, default=None,
+        help="Stop at a steady state when every balance is within this "
+        "fraction of its limit, eg: 0.1 . This is a distance to the limit, "
+        "not a change over the window. The circuit nears its limit "
+        "slowly; 0.1 is reached after about 7 years, 0.01 not within 10")
+    rv.add_argument(
+        "--window", type=int, default=24,
+        help="Set the number of timesteps to test for a steady state [24]")
+    rv.add_argument(
+        "--check", type=int, default=1,
+        help="Set the number of timesteps between tests of the balance. "
+        "If 0, test only at samples [1]")
+    rv.add_argument(
+        "--profile", nargs="?", const="", default=None, metavar="FILE",
+        help="Profile the run. Print the statistics, or save them to FILE")
+    rv.add_argument(
+        "--timings", nargs="?", const="", default=None, metavar="FILE",
+        help="Print the time spent in each operation. "
+        "Save them also to FILE as JSON")
     return rv
 
 
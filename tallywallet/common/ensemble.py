@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+#   encoding: UTF-8
+
+# This file is part of tallywallet.
+#
+# Tallywallet is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Tallywallet is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with tallywallet.  If not, see <http://www.gnu.org/licenses/>.
+
+from collections import namedtuple
+from collections import OrderedDict
+import functools
+import random
+
+from tallywallet.common.currency import Currency as Cy
+from tallywallet.common.debunking import HOUR
+from tallywallet.common.debunking import INITIAL
+from tallywallet.common.debunking import banking_licence
+from tallywallet.common.debunking import columns
+from tallywallet.common.debunking import power
+from tallywallet.common.debunking import transition
+from tallywallet.common.ledger import Ledger
+from tallywallet.common.sampling import Schedule
+from tallywallet.common.sampling import schedule
+
+__doc__ = """
+The ensemble module runs the simulation of
+:py:mod:`debunking <tallywallet.common.debunking>` along many paths,
+each with its own rates drawn at random. The result is a summary of the
+distribution of each balance at each sample time.
+
+Paths are advanced together in blocks. A block is a list of rows, one for
+each path, of the balances of the columns. Between samples, each row is
+multiplied by a power of the transition matrix of its path. The balances
+are then passed to streaming estimators of percentiles, so the memory
+used does not grow with the number of paths.
+
+The rates of each path are drawn from a generator seeded by the seed of
+the ensemble and the number of the path. The result is the same for
+any size of block.
+
+The transition matrix of a set of rates is compiled once. Paths which
+draw the same rates, as when a range has no width, share the matrix and
+its powers. Only the most recent sets are kept, as many as fit a block.
+"""
+
+Summary = namedtuple(
+    "Summary", ["ts", "column", "count", "mean", "percentiles"])
+Summary.__doc__ = """`{}`
+
+The distribution of one balance at one sample time:
+
+    ts
+        The sample time.
+    column
+        The name of the column.
+    count
+        The number of paths.
+    mean
+        The mean balance.
+    percentiles
+        An ordered dictionary of estimated balances, keyed by
+        fraction, eg: 0.5 for the median.
+""".format(Summary.__doc__)
+
+
+class P2(object):
+    """
+    An estimator of a single percentile of a stream of numbers, by the P²
+    algorithm of Jain and Chlamtac (1985). It keeps five numbers, however
+    long the stream.
+
+    :param p:   The percentile as a fraction between 0 and 1.
+    """
+
+    def __init__(self, p):
+        self.p = p
+        self.count = 0
+        self.heights = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self.steps = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, x):
+        """
+        Add a number to the stream.
+        """
+        self.count += 1
+        q = self.heights
+        if self.count <= 5:
+            q.append(x)
+            q.sort()
+            return
+
+        n = self.positions
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = next(i for i in range(4) if q[i] <= x < q[i + 1])
+
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.steps[i]
+
+        for i in (1, 2, 3):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (
+                d <= -1 and n[i - 1] - n[i] < -1
+            ):
+                d = 1 if d > 0 else -1
+                rv = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) /
+                    (n[i + 1] - n[i]) +
+                    (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) /
+                    (n[i] - n[i - 1]))
+                if not q[i - 1] < rv < q[i + 1]:
+                    rv = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = rv
+                n[i] += d
+
+    @property
+    def value(self):
+        """
+        The current estimate of the percentile. While there are five
+        numbers or fewer, it is exact.
+        """
+        q = self.heights
+        if not q:
+            return None
+        if self.count > 5:
+            return q[2]
+        pos = self.p * (len(q) - 1)
+        lo = int(pos)
+        hi = min(lo + 1, len(q) - 1)
+        return q[lo] + (pos - lo) * (q[hi] - q[lo])
+
+
+def draw(ranges, seed, path):
+    """
+    Draw the rates of one path.
+
+    :param ranges:  A mapping of parameter name to a 2-tuple of (low, high).
+    :param seed:    The seed of the ensemble.
+    :param path:    The number of the path.
+    :returns:       An ordered dictionary of rates.
+    """
+    rng = random.Random("{}.{}".format(seed, path))
+    return OrderedDict(
+        (k, rng.uniform(float(lo), float(hi)))
+        for k, (lo, hi) in ranges.items())
+
+
+def ensemble(
+    size, ranges, samples, initial=INITIAL, interval=HOUR, seed=0,
+    block=256, percentiles=(0.05, 0.5, 0.95)
+):
+    """
+    Run the simulation along many paths of random rates.
+
+    :param size:    The number of paths.
+    :param ranges:  A mapping of parameter name to a 2-tuple of (low, high).
+                    Each path has rates drawn uniformly from these ranges.
+                    See :py:data:`parameters
+                    <tallywallet.common.debunking.parameters>`.
+    :param samples: A sequence of times, or a :py:class:`Schedule \\
+<tallywallet.common.sampling.Schedule>`.
+    :param initial: The initial value of the banking licence.
+    :param interval:    The value of the simulation timestep in seconds.
+    :param seed:    The seed for the random rates.
+    :param block:   The number of paths advanced together.
+    :param percentiles: A sequence of the percentiles to estimate,
+                        as fractions.
+    :returns:       A list of
+                    :py:class:`Summary <tallywallet.common.ensemble.Summary>`
+                    objects, by sample time and then by column.
+    """
+    if not isinstance(samples, Schedule):
+        samples = schedule(samples, interval)
+    ldgr = Ledger(*columns.values(), ref=Cy.USD)
+    banking_licence(ldgr, initial)
+    start = [float(ldgr.value(i)) for i in columns]
+
+    gaps = [b - a for a, b in zip([0] + samples.ticks, samples.ticks)]
+    totals = [[0.0] * len(columns) for i in gaps]
+    estimators = [
+        [[P2(p) for p in percentiles] for key in columns] for i in gaps]
+
+    @functools.lru_cache(maxsize=block)
+    def compiled(rates):
+        return (transition(interval, float, OrderedDict(rates)), {})
+
+    for first in range(0, size, block):
+        paths = range(first, min(first + block, size))
+        plans = [
+            compiled(tuple(draw(ranges, seed, n).items())) for n in paths]
+        rows = [list(start) for n in paths]
+        for s, gap in enumerate(gaps):
+            for j, (matrix, steps) in enumerate(plans):
+                if gap not in steps:
+                    steps[gap] = power(matrix, gap)
+                step = steps[gap]
+                rows[j] = [
+                    sum(a * b for a, b in zip(row, rows[j])) for row in step]
+
+            for row in rows:
+                for c, val in enumerate(row):
+                    totals[s][c] += val
+                    for estimator in estimators[s][c]:
+                        estimator.add(val)
+
+    return [
+        Summary(
+            tick * interval, key, size, totals[s][c] / size if size else None,
+            OrderedDict(
+                (p, e.value) for p, e in zip(percentiles, estimators[s][c])))
+        for s, tick in enumerate(samples.ticks)
+        for c, key in enumerate(columns)]
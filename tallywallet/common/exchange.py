@@ -16,7 +16,11 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with tallywallet.  If not, see <http://www.gnu.org/licenses/>.
 
+from collections import namedtuple
+from collections import OrderedDict
 from decimal import Decimal as Dl
+import itertools
+import threading
 
 from tallywallet.common.trade import TradeFees
 from tallywallet.common.trade import TradeGain
@@ -26,15 +30,87 @@ The exchange module contains functionality to enable conversion between
 currencies.
 """
 
+PlanInfo = namedtuple("PlanInfo", ["hits", "misses", "maxsize", "currsize"])
+
+_versions = itertools.count()
+
+
+class PlanCache(object):
+    """
+    A bounded cache of the combined rates along TradePaths.
+
+    Each entry is keyed by the version of an Exchange_ and a TradePath_.
+    Since an Exchange takes a new version whenever it is modified, a
+    cached rate is never used once the rates it was made from have changed.
+
+    The cache may be shared between threads. A lock guards its entries
+    and statistics.
+    """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+
+    def rate(self, exchange, path):
+        """
+        Return the product of the rates for the two legs of `path`.
+        """
+        key = (exchange.version, path)
+        with self._lock:
+            try:
+                rv = self._plans[key]
+            except KeyError:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._plans.move_to_end(key)
+                return rv
+
+        rv = (exchange.get((path.rcv, path.work)) *
+              exchange.get((path.work, path.out)))
+        with self._lock:
+            self._plans[key] = rv
+            if len(self._plans) > self.maxsize:
+                self._plans.popitem(last=False)
+        return rv
+
+    def info(self):
+        """
+        Return a PlanInfo tuple of the statistics of the cache.
+        """
+        with self._lock:
+            return PlanInfo(
+                self.hits, self.misses, self.maxsize, len(self._plans))
+
+    def clear(self):
+        """
+        Empty the cache and reset its statistics.
+        """
+        with self._lock:
+            self._plans.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+plans = PlanCache()
+
 
 def convert(self, val, path, fees=TradeFees(0, 0)):
     """
     Return the calculated outcome of converting the amount `val`
     via the TradePath `path`.
     """
-    work = (val - fees.rcv) * self.get((path.rcv, path.work))
-    rv = work * self.get((path.work, path.out)) - fees.out
-    return rv
+    return (val - fees.rcv) * plans.rate(self, path) - fees.out
+
+
+def rate(self, path):
+    """
+    Return the combined rate of exchange via the TradePath `path`.
+    """
+    return plans.rate(self, path)
 
 
 def gain(self, val, path, prior=None, fees=TradeFees(0, 0)):
@@ -66,8 +142,35 @@ def infer_rate(self, key):
             else:
                 raise err
 
-Exchange = type("Exchange", (dict,),
-                {"convert": convert, "gain": gain, "get": infer_rate})
+
+def mutator(name):
+    method = getattr(dict, name)
+
+    def wrapper(self, *args, **kwargs):
+        self.version = next(_versions)
+        return method(self, *args, **kwargs)
+
+    wrapper.__name__ = name
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+
+def init(self, *args, **kwargs):
+    self.version = next(_versions)
+    dict.__init__(self, *args, **kwargs)
+
+
+def reduce(self):
+    return (self.__class__, (dict(self),))
+
+Exchange = type(
+    "Exchange", (dict,),
+    dict({
+        "__init__": init, "__reduce__": reduce,
+        "convert": convert, "gain": gain, "get": infer_rate, "rate": rate},
+        **{name: mutator(name) for name in (
+            "__setitem__", "__delitem__", "__ior__", "clear", "pop", "popitem",
+            "setdefault", "update")}))
 Exchange.__doc__ = """
 An exchange is a lookup container for currency exchange rates.
 
@@ -89,4 +192,13 @@ therefore be considered as `gain` from one currency to the next.
     * The rate of a currency against itself is unity.
     * The rate of one currency against another is the reciprocal of the
       reverse rate (if defined).
+
+.. py:method:: rate(path)
+
+   Return the combined rate of exchange via a TradePath_.
+
+   Rates are looked up in a module-level PlanCache which is keyed by the
+   `version` attribute of the Exchange. The version changes whenever the
+   Exchange is modified, so repeated conversions along the same path under
+   the same rates are a single multiplication.
 """
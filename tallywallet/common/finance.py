@@ -20,6 +20,7 @@ from collections import namedtuple
 import datetime
 import decimal
 from decimal import Decimal
+import functools
 
 Note = namedtuple(
     "Note",
@@ -63,6 +64,56 @@ An Amortization object records a payment against an amortization schedule:
 """.format(Amortization.__doc__)
 
 
+Solution = namedtuple(
+    "Solution",
+    ["rate", "iterations", "residual", "converged", "bisections"])
+Solution.__doc__ = """`{}`
+
+A Solution reports the outcome of a search for a rate of return:
+
+    rate
+        The rate found.
+    iterations
+        The number of times the present value was evaluated.
+    residual
+        The net present value of the cash flows at that rate.
+    converged
+        True if a change of sign was found, and the search met its
+        tolerance within it.
+    bisections
+        The number of steps taken by bisection rather than Newton's method.
+""".format(Solution.__doc__)
+
+# The day count basis of an annual rate of interest
+BASIS = datetime.timedelta(days=360)
+
+
+@functools.lru_cache(maxsize=1024)
+def _compound(interest, spelling, period, span, n, context):
+    rate = interest * Decimal(span / period)
+    return (rate, (1 + rate) ** n)
+
+
+def compound(interest, period, span, n):
+    """
+    Return a 2-tuple of (rate, factor). The rate is that of `interest`
+    per `period`, scaled to the interval `span`. The factor is the
+    compound growth over `n` of those intervals.
+
+    A portfolio of loans typically has only a handful of distinct terms.
+    So results are kept in a bounded cache, keyed by the arguments and the
+    precision and rounding of the current Decimal context.
+    The statistics of the cache are available from `compound.cache_info()`.
+    """
+    ctx = decimal.getcontext()
+    return _compound(
+        interest, str(interest), period, span, n,
+        (ctx.prec, ctx.rounding, ctx.Emin, ctx.Emax))
+
+compound.cache_info = _compound.cache_info
+compound.cache_clear = _compound.cache_clear
+
+
 def discount_simple(note:Note):
     """
     Calculates the discounted value of an ordinary simple annuity.
@@ -72,11 +123,30 @@ def discount_simple(note:Note):
  
     """
     n = int(note.term / note.period)
-    i = note.interest * Decimal(note.period / datetime.timedelta(days=360))
-    R = note.principal * i / (1 - (1 + i) ** -n)
+    i, v = compound(note.interest, BASIS, note.period, -n)
+    R = note.principal * i / (1 - v)
     return (n, i, R)
 
 
+def periods(note:Note):
+    """
+    Return the number of payments made against a
+    :py:class:`Note <tallywallet.common.finance.Note>` by its
+    amortization schedule.
+    """
+    return -(-note.term // note.period)
+
+
+def elapsed(start, interval, when):
+    """
+    Return the number of whole intervals between `start` and `when`.
+    If `when` is an integer it is taken to be that number already.
+    """
+    if isinstance(when, int):
+        return when
+    return (when - start) // interval
+
+
 def schedule(note:Note, places=2, rounding=decimal.ROUND_UP):
     """
     Calculate the amortization schedule for a
@@ -108,11 +178,197 @@ def schedule(note:Note, places=2, rounding=decimal.ROUND_UP):
         yield Amortization(ts, payment, interest, repaid, balance)
 
 
+def schedule_variable(note:Note, rates, places=2, rounding=decimal.ROUND_UP):
+    """
+    Calculate the amortization schedule for a
+    :py:class:`Note <tallywallet.common.finance.Note>` whose rate of
+    interest is reset from time to time.
+
+    rates
+        An iterable of 2-tuples of (date, interest) in date order. Each
+        new rate applies from the first period which begins on or after
+        its date. Until then, the `interest` of the Note applies.
+    places, rounding
+        As for :py:func:`schedule <tallywallet.common.finance.schedule>`.
+
+    When the rate changes, the remaining balance is amortized afresh over
+    the remaining periods of the term. A reset to the rate already in force
+    changes nothing. If the new rate is zero, the payment is the balance
+    divided equally between the remaining periods. Rates are read from the
+    iterable only as they are needed, so it may be a generator of
+    indefinite length.
+
+    This function is a generator. It produces a sequence of
+    :py:class:`Amortization <tallywallet.common.finance.Amortization>`
+    objects. Without any resets, they are those of
+    :py:func:`schedule <tallywallet.common.finance.schedule>`.
+    """
+    quantum = Decimal(10) ** -places
+    n = int(note.term / note.period)
+    resets = iter(rates)
+    pending = next(resets, None)
+    current = note.interest
+    payment = None
+    balance = note.principal
+    end = note.date + note.term
+    ts = note.date
+    k = 0
+    while ts < end:
+        changed = payment is None
+        while pending is not None and pending[0] <= ts:
+            changed = changed or pending[1] != current
+            current = pending[1]
+            pending = next(resets, None)
+
+        if changed:
+            remaining = max(n - k, 1)
+            rate, v = compound(current, BASIS, note.period, -remaining)
+            annuity = balance * rate / (1 - v) if rate else balance / remaining
+            payment = annuity.quantize(quantum, rounding=rounding)
+
+        ts += note.period
+        k += 1
+        interest = rate * balance
+        payment = min(balance + interest, payment)
+        repaid = payment - interest
+        balance -= repaid
+        yield Amortization(ts, payment, interest, repaid, balance)
+
+
+def outstanding(principal, rate, payment, k):
+    """
+    Return the balance of a loan after `k` regular payments, in the
+    closed form of Schaum's `Mathematics of Finance` Equation 7.2 .
+    The result is not limited at zero.
+    """
+    if not rate:
+        return principal - k * payment
+    growth = (1 + rate) ** k
+    return principal * growth - payment * (growth - 1) / rate
+
+
+def amortization_at(note:Note, when, places=2, rounding=decimal.ROUND_UP):
+    """
+    Calculate a single
+    :py:class:`Amortization <tallywallet.common.finance.Amortization>`
+    from the schedule of a
+    :py:class:`Note <tallywallet.common.finance.Note>` without iterating
+    over the periods before it.
+
+    when
+        The number of the payment, counting from 1. Alternatively, a date;
+        the payment is the last one made on or before it.
+    places, rounding
+        As for :py:func:`schedule <tallywallet.common.finance.schedule>`.
+
+    The balance before the payment is found in closed form. The last
+    step is then done just as in
+    :py:func:`schedule <tallywallet.common.finance.schedule>`, which
+    corrects the final payment when rounding has made it smaller than
+    the regular one.
+    """
+    k = min(elapsed(note.date, note.period, when), periods(note))
+    if k < 1:
+        raise ValueError("No payment made by {}".format(when))
+    n, rate, annuity = discount_simple(note)
+    payment = annuity.quantize(Decimal(10) ** -places, rounding=rounding)
+    balance = outstanding(note.principal, rate, payment, k - 1)
+    ts = note.date + k * note.period
+    if k > 1 and balance <= 0:
+        # Paid off by an earlier payment
+        return Amortization(ts, *(Decimal(0),) * 4)
+
+    interest = rate * balance
+    payment = min(balance + interest, payment)
+    repaid = payment - interest
+    return Amortization(ts, payment, interest, repaid, balance - repaid)
+
+
+def payoff(note:Note, places=2, rounding=decimal.ROUND_UP):
+    """
+    Return the number of the payment which clears the balance of a
+    :py:class:`Note <tallywallet.common.finance.Note>`, found by bisection
+    over the closed form of the balance.
+    """
+    n, rate, annuity = discount_simple(note)
+    payment = annuity.quantize(Decimal(10) ** -places, rounding=rounding)
+    lo, hi = 1, periods(note)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if outstanding(note.principal, rate, payment, mid) <= 0:
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+
+def balance_at(note:Note, when, places=2, rounding=decimal.ROUND_UP):
+    """
+    Return the balance of a
+    :py:class:`Note <tallywallet.common.finance.Note>` after a given
+    payment, without iterating over its schedule.
+
+    when
+        The number of payments made. Alternatively, a date; the balance
+        is that after the last payment on or before it.
+    places, rounding
+        As for :py:func:`schedule <tallywallet.common.finance.schedule>`.
+    """
+    k = min(elapsed(note.date, note.period, when), periods(note))
+    if k <= 0:
+        return Decimal(note.principal)
+    return amortization_at(note, k, places, rounding).balance
+
+
+def interest_to(note:Note, when, places=2, rounding=decimal.ROUND_UP):
+    """
+    Return the cumulative interest paid on a
+    :py:class:`Note <tallywallet.common.finance.Note>` up to and including
+    a given payment, without iterating over its schedule.
+
+    Parameters are as for
+    :py:func:`balance_at <tallywallet.common.finance.balance_at>`.
+    """
+    k = min(elapsed(note.date, note.period, when), periods(note))
+    if k <= 0:
+        return Decimal(0)
+
+    n, rate, annuity = discount_simple(note)
+    payment = annuity.quantize(Decimal(10) ** -places, rounding=rounding)
+    last = payoff(note, places, rounding)
+    if k < last:
+        paid = k * payment
+        balance = outstanding(note.principal, rate, payment, k)
+    else:
+        final = amortization_at(note, last, places, rounding)
+        paid = (last - 1) * payment + final.payment
+        balance = final.balance
+    return paid - (note.principal - balance)
+
+
+def value_at(date, principal, term, period, interest, when, m=1, **kwargs):
+    """
+    Return the value of a debt at a point in time, without iterating over
+    the series of
+    :py:func:`value_series <tallywallet.common.finance.value_series>`.
+    Parameters are as for that function. Additionally:
+
+    when
+        The number of compounding intervals which have passed.
+        Alternatively, a date; the value is that at the end of the last
+        interval on or before it.
+    """
+    interval = min(term, period / m)
+    k = min(elapsed(date, interval, when), term // interval)
+    rate, growth = compound(interest, period, interval, k)
+    return principal * growth
+
+
 def value_simple(note:Note):
     """
     Returns the simple value of a promissory note on maturity.
     """
-    return next(value_series(m=1, **note._asdict()))[1]
+    return value_at(when=1, m=1, **note._asdict())
 
 
 def value_series(date, principal, term, period, interest, m=1, **kwargs):
@@ -126,9 +382,173 @@ def value_series(date, principal, term, period, interest, m=1, **kwargs):
     This function is a generator. It produces 2-tuples of (date, value).
     """
     interval = min(term, period / m)
-    rate = interest * Decimal(interval / period)
+    rate, growth = compound(interest, period, interval, 1)
     t = date
     for i in range(term // interval):
         t += interval
-        principal = principal * (1 + rate)
+        principal = principal * growth
         yield (t, principal)
+
+
+def solve(f, guess, lo=Decimal("-0.99"), hi=Decimal(1),
+          tol=Decimal("1E-15"), maxiter=100):
+    """
+    Find a root of a decreasing function by Newton's method.
+    Whenever a Newton step would leave the interval known to contain the
+    root, a bisection step is taken instead.
+
+    :param f:       A function of the rate. It returns a 2-tuple of
+                    its value and its derivative.
+    :param guess:   The first estimate of the rate.
+    :param lo:      The lower bound of the search. It is moved halfway
+                    to -1 until the value of `f` there is not negative,
+                    or it is within `tol` of -1.
+    :param hi:      The upper bound. It is doubled until the value of `f`
+                    there is not positive.
+    :param tol:     The search ends when the rate changes by less
+                    than this amount.
+    :rtype: Solution
+
+    If no change of sign is found between the bounds, there is no root
+    to find. The Solution then has the bound with the smaller residual,
+    and is not converged.
+    """
+    n = 1
+    low = f(lo)[0]
+    while low < 0 and 1 + lo > tol and n < maxiter:
+        n += 1
+        lo = (lo - 1) / 2
+        low = f(lo)[0]
+
+    n += 1
+    high = f(hi)[0]
+    while high > 0 and low >= 0 and n < maxiter:
+        n += 1
+        lo, low, hi = hi, high, 2 * hi
+        high = f(hi)[0]
+
+    if low < 0 or high > 0:
+        rate, val = min((lo, low), (hi, high), key=lambda x: abs(x[1]))
+        return Solution(rate, n, val, False, 0)
+
+    rate = guess if lo < guess < hi else (lo + hi) / 2
+    bisections = 0
+    while n < maxiter:
+        n += 1
+        val, slope = f(rate)
+        if val > 0:
+            lo = rate
+        elif val < 0:
+            hi = rate
+        else:
+            return Solution(rate, n, val, True, bisections)
+
+        nxt = rate - val / slope if slope else None
+        if nxt is None or not lo < nxt < hi:
+            nxt = (lo + hi) / 2
+            bisections += 1
+        if abs(nxt - rate) < tol:
+            return Solution(nxt, n, f(nxt)[0], True, bisections)
+        rate = nxt
+
+    return Solution(rate, n, f(rate)[0], False, bisections)
+
+
+def irr(flows, guess=Decimal("0.1"), **kwargs):
+    """
+    Calculate the internal rate of return of a stream of cash flows.
+
+    :param flows:   A sequence of 2-tuples of (time, amount). Time is
+                    measured in periods, and the rate is per period.
+                    Money paid out is negative, and money received is
+                    positive. The first flow is usually the outlay.
+    :param guess:   The first estimate of the rate.
+
+    Other keyword arguments are passed to
+    :py:func:`solve <tallywallet.common.finance.solve>`.
+
+    :rtype: Solution
+    """
+    flows = [(Decimal(t), Decimal(a)) for t, a in flows]
+
+    def f(rate):
+        g = 1 + rate
+        val = slope = Decimal(0)
+        for t, a in flows:
+            v = a * g ** -t
+            val += v
+            slope -= t * v / g
+        return (val, slope)
+
+    return solve(f, Decimal(guess), **kwargs)
+
+
+def yield_to_maturity(note:Note, price, places=2, rounding=decimal.ROUND_UP,
+                      **kwargs):
+    """
+    Calculate the yield of a
+    :py:class:`Note <tallywallet.common.finance.Note>` bought for `price`
+    on the date it is agreed.
+
+    The cash flows are those of
+    :py:func:`schedule <tallywallet.common.finance.schedule>`, with
+    `places` and `rounding` as for that function. They are a regular
+    payment up to a final one, so their present value is found in closed
+    form rather than summed period by period.
+
+    Other keyword arguments are passed to
+    :py:func:`solve <tallywallet.common.finance.solve>`.
+
+    :rtype: Solution. The rate is annual, on the same basis as the
+            `interest` of the Note.
+    """
+    n, i, annuity = discount_simple(note)
+    payment = annuity.quantize(Decimal(10) ** -places, rounding=rounding)
+    last = payoff(note, places, rounding)
+    final = amortization_at(note, last, places, rounding).payment
+    m = last - 1
+    price = Decimal(price)
+
+    def f(rate):
+        g = 1 + rate
+        v = g ** -m
+        w = v / g
+        if rate:
+            annuity = (1 - v) / rate
+            d = (m * w * rate - (1 - v)) / (rate * rate)
+        else:
+            annuity = Decimal(m)
+            d = Decimal(-m * (m + 1)) / 2
+        val = payment * annuity + final * w - price
+        slope = payment * d - last * final * w / g
+        return (val, slope)
+
+    scale = Decimal(BASIS / note.period)
+    rv = solve(f, i, **kwargs)
+    return rv._replace(rate=rv.rate * scale)
+
+
+def map_yields(
+    notes, prices, places=2, rounding=decimal.ROUND_UP, **kwargs
+):
+    """
+    Calculate the yields of many Notes, each bought at the corresponding
+    price. This is a convenience which calls
+    :py:func:`yield_to_maturity
+    <tallywallet.common.finance.yield_to_maturity>` for each Note in turn,
+    and its arguments are as for that function. There is no saving from
+    solving the Notes together.
+
+    This function is a generator. It produces a sequence of
+    :py:class:`Solution <tallywallet.common.finance.Solution>` objects.
+    Notes which are identical apart from their dates are solved once.
+    """
+    seen = {}
+    for note, price in zip(notes, prices):
+        key = (note._replace(date=None), Decimal(price))
+        try:
+            rv = seen[key]
+        except KeyError:
+            rv = seen[key] = yield_to_maturity(
+                note, price, places, rounding, **kwargs)
+        yield rv
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+#   encoding: UTF-8
+
+# This file is part of tallywallet.
+#
+# Tallywallet is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Tallywallet is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with tallywallet.  If not, see <http://www.gnu.org/licenses/>.
+
+from collections import namedtuple
+from decimal import Decimal
+from numbers import Number
+
+from tallywallet.common.ledger import Role
+
+__doc__ = """
+The flow module describes a circuit of money as data rather than code.
+
+A :py:class:`Model <tallywallet.common.flow.Model>` declares the columns
+of a Ledger and the flows of money between them. Each
+:py:class:`Flow <tallywallet.common.flow.Flow>` moves an amount
+proportional to the balance of a column, or to the amount of an earlier
+flow. The flows are arranged in stages. All the amounts of a stage are
+found before any of them is posted.
+
+A Model is checked before use. In particular, every flow must keep the
+Fundamental Accounting Equation in balance.
+It is then compiled into a :py:class:`Plan <tallywallet.common.flow.Plan>`
+for a given timestep, in which the rates and the positions of the columns
+are worked out in advance.
+"""
+
+Flow = namedtuple("Flow", ["name", "source", "rate", "postings"])
+Flow.__doc__ = """`{}`
+
+A movement of money between the columns of a Ledger:
+
+    name
+        A unique name for the flow.
+    source
+        The name of a column, or of an earlier flow. The amount of the
+        flow is proportional to the balance of the column or the amount
+        of the earlier flow.
+    rate
+        A number, or the name of a parameter of the Model. When the source
+        is a column, the rate is per `period` of the Model. When the
+        source is a flow, the rate is a simple multiplier.
+    postings
+        A sequence of 2-tuples of (column name, sign). The amount is
+        added to each column, multiplied by the sign.
+""".format(Flow.__doc__)
+
+Model = namedtuple("Model", ["columns", "stages", "period", "params"])
+Model.__doc__ = """`{}`
+
+A declarative description of a circuit of money:
+
+    columns
+        An ordered dictionary of
+        :py:class:`Columns <tallywallet.common.ledger.Column>`
+        keyed by name.
+    stages
+        A sequence of stages. Each stage is a sequence of Flows.
+    period
+        The time over which rates apply, in seconds.
+    params
+        A dictionary of the default values of named rates.
+""".format(Model.__doc__)
+
+
+def validate(model):
+    """
+    Check a Model for errors.
+
+    A ValueError is raised if a flow has a duplicate name, refers to an
+    unknown column, flow or parameter, or if its postings would not keep
+    the Fundamental Accounting Equation in balance.
+    """
+    known = set(model.columns)
+    for stage in model.stages:
+        for flow in stage:
+            if flow.name in known:
+                raise ValueError("Duplicate name: {}".format(flow.name))
+            if flow.source not in known:
+                raise ValueError("Unknown source of {}: {}".format(
+                    flow.name, flow.source))
+            if not isinstance(flow.rate, Number) and (
+                flow.rate not in model.params
+            ):
+                raise ValueError("Unknown rate of {}: {}".format(
+                    flow.name, flow.rate))
+
+            lhs = rhs = 0
+            for key, sign in flow.postings:
+                try:
+                    col = model.columns[key]
+                except KeyError:
+                    raise ValueError("Unknown column in {}: {}".format(
+                        flow.name, key))
+                if col.role in (Role.asset, Role.expense, Role.dividend):
+                    lhs += sign
+                else:
+                    rhs += sign
+            if lhs != rhs:
+                raise ValueError("Unbalanced flow: {}".format(flow.name))
+            known.add(flow.name)
+    return model
+
+
+def _perform(vals, steps):
+    for n, source, factor, postings in steps:
+        vals[n] = vals[source] * factor
+    for n, source, factor, postings in steps:
+        amount = vals[n]
+        for i, sign in postings:
+            if sign == 1:
+                vals[i] += amount
+            elif sign == -1:
+                vals[i] -= amount
+            else:
+                vals[i] += sign * amount
+
+
+class Plan(object):
+    """
+    A Model compiled for a fixed timestep.
+
+    :param model:       A Model object. It is validated first.
+    :param interval:    The simulation timestep in seconds.
+    :param params:      A mapping of rates to change from the defaults of
+                        the Model. A KeyError is raised for a name which
+                        is not a parameter of the Model.
+
+    The balances of the columns are held as a list, in the order of the
+    columns of the Model. The amounts of the flows follow them in a
+    single working list, so that every source and every posting is found
+    by position.
+    """
+
+    def __init__(self, model, interval, params=None):
+        validate(model)
+        self.model = model
+        self.interval = interval
+        rates = dict(model.params)
+        for key, val in (params or {}).items():
+            if key not in rates:
+                raise KeyError("Unknown parameter: {}".format(key))
+            rates[key] = val
+        scale = Decimal(interval / model.period)
+        index = {k: n for n, k in enumerate(model.columns)}
+        self.stages = []
+        for stage in model.stages:
+            steps = []
+            for flow in stage:
+                rate = rates.get(flow.rate, flow.rate)
+                rate = rate if isinstance(rate, Decimal) else Decimal(
+                    str(rate))
+                factor = rate * scale if flow.source in model.columns else rate
+                steps.append((
+                    len(index), index[flow.source], factor,
+                    tuple((index[k], sign) for k, sign in flow.postings)))
+                index[flow.name] = len(index)
+            self.stages.append(steps)
+        self.size = len(index)
+
+    def step(self, state):
+        """
+        Advance a list of balances by one timestep.
+
+        Returns a new list of balances.
+        """
+        vals = list(state) + [0] * (self.size - len(state))
+        for steps in self.stages:
+            _perform(vals, steps)
+        return vals[:len(state)]
+
+    def apply(self, ldgr):
+        """
+        Advance a Ledger by one timestep. There is one commit for each
+        column which changes.
+        """
+        cols = list(self.model.columns.values())
+        state = [ldgr.value(col) for col in cols]
+        for col, old, new in zip(cols, state, self.step(state)):
+            if new != old:
+                ldgr.commit(new - old, col)
+
+    def stepwise(self, ldgr):
+        """
+        Advance a Ledger by one timestep as does :py:meth:`apply`, but
+        commit the changes of each stage as it is done. After each
+        stage, yield the names of its flows, separated by commas.
+        """
+        cols = list(self.model.columns.values())
+        vals = [ldgr.value(col) for col in cols]
+        vals += [0] * (self.size - len(vals))
+        for stage, steps in zip(self.model.stages, self.stages):
+            state = vals[:len(cols)]
+            _perform(vals, steps)
+            for col, old, new in zip(cols, state, vals):
+                if new != old:
+                    ldgr.commit(new - old, col)
+            yield ", ".join(flow.name for flow in stage)
+
+    def matrix(self):
+        """
+        Return the transition matrix of one timestep as a list of rows.
+
+        Since every flow is proportional to a balance, a timestep is a
+        linear map of the balances. Each column of the matrix is found
+        by a step from a single balance of one.
+        """
+        n = len(self.model.columns)
+        cols = [self.step([int(i == j) for i in range(n)]) for j in range(n)]
+        return [list(row) for row in zip(*cols)]
@@ -89,6 +89,7 @@ class Ledger(object):
             i.currency: i for i in cols if i.role is Role.trading}
         self._rates = {i: Exchange({}) for i in args}
         self._tally = OrderedDict((i, Dl(0)) for i in cols)
+        self._paths = {}
         self.transaction = singledispatch(transaction)
 
     @property
@@ -126,13 +127,11 @@ http://en.wikipedia.org/wiki/Accounting_equation
         try:
             lhs = sum(
                 self._rates[col].convert(
-                    self._tally[col],
-                    TradePath(col.currency, self.ref, self.ref))
+                    self._tally[col], self._path(col.currency))
                 for col in lhCols)
             rhs = sum(
                 self._rates[col].convert(
-                    self._tally.get(col, Dl(0)),
-                    TradePath(col.currency, self.ref, self.ref))
+                    self._tally.get(col, Dl(0)), self._path(col.currency))
                 for col in rhCols) + sum(
                 self._tally.get(col, Dl(0)) for col in trCols)
         except KeyError:
@@ -144,6 +143,14 @@ http://en.wikipedia.org/wiki/Accounting_equation
 
         return FAE(lhs, rhs, st)
 
+    def _path(self, currency):
+        try:
+            return self._paths[currency]
+        except KeyError:
+            rv = TradePath(currency, self.ref, self.ref)
+            self._paths[currency] = rv
+            return rv
+
     def add_column(self, ref, role, *, label="{}", currency=None):
         assert role is not Role.trading
         crncy = currency or self.ref
@@ -178,7 +185,7 @@ http://en.wikipedia.org/wiki/Accounting_equation
             account = self._tradingAccounts[c.currency]
             trade = exchange.gain(
                 self._tally[c],
-                path=TradePath(c.currency, self.ref, self.ref),
+                path=self._path(c.currency),
                 prior=self._rates.get(c))
             yield (trade, c, exchange)
 
@@ -189,6 +196,9 @@ http://en.wikipedia.org/wiki/Accounting_equation
         If you supply an exchange argument, `trade` may be a TradeGain
         object. In this usage, a trading account in the currency of the
         ledger column will accept any exchange gain or loss.
+        A rise in the value of an asset, expense or dividend column is a
+        gain to the trading account. A rise in the value of a column on
+        the other side of the equation, eg: a liability, is a loss.
 
         Otherwise, `trade` should be a number. It will be added to the
         specified column in the ledger.
@@ -197,13 +207,18 @@ http://en.wikipedia.org/wiki/Accounting_equation
         st = Status.ok
         account = self._tradingAccounts[col.currency]
         try:
-            self._tally[account] += trade.gain
-            self._rates[col] = exchange
+            gain = trade.gain
         except AttributeError:
             if isinstance(trade, Number):
                 self._tally[col] += trade
             else:
                 st = Status.error
+        else:
+            if col.role in (Role.asset, Role.expense, Role.dividend):
+                self._tally[account] += gain
+            else:
+                self._tally[account] -= gain
+            self._rates[col] = exchange
 
         return (trade, col, exchange, kwargs, st)
 
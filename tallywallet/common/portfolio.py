@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+#   encoding: UTF-8
+
+# This file is part of tallywallet.
+#
+# Tallywallet is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Tallywallet is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with tallywallet.  If not, see <http://www.gnu.org/licenses/>.
+
+from array import array
+from collections import namedtuple
+from collections import OrderedDict
+import concurrent.futures
+import decimal
+from decimal import Decimal
+import itertools
+import operator
+
+from tallywallet.common.finance import Amortization
+from tallywallet.common.finance import discount_simple
+from tallywallet.common.finance import periods
+
+__doc__ = """
+The portfolio module calculates amortization schedules for many
+:py:class:`Notes <tallywallet.common.finance.Note>` at once.
+
+Notes which have the same number of payments are gathered into a batch.
+The schedules of a batch are then advanced together, one period at a
+time, over arrays of values. This avoids the cost of a generator and an
+:py:class:`Amortization <tallywallet.common.finance.Amortization>`
+object for every payment of every Note.
+
+There are two modes of calculation. The exact mode uses Decimal
+arithmetic and reproduces the results of
+:py:func:`schedule <tallywallet.common.finance.schedule>`. The fast mode
+uses floating point. The size of the differences between the two may be
+checked with
+:py:func:`discrepancy <tallywallet.common.portfolio.discrepancy>`.
+
+The schedules of a large portfolio may also be calculated in parallel
+by a pool of processes. See
+:py:func:`parallel <tallywallet.common.portfolio.parallel>`. The
+processes return their batches in the compact form of
+:py:class:`Columns <tallywallet.common.portfolio.Columns>`. These are
+passed on as they are, and unpacked only where the values are needed.
+"""
+
+Schedules = namedtuple(
+    "Schedules",
+    ["index", "payment", "interest", "repaid", "balance"])
+Schedules.__doc__ = """`{}`
+
+A batch of amortization schedules for Notes with the same number of
+payments:
+
+    index
+        A list of the positions of the Notes in the portfolio.
+    payment
+        A list with a row for each period. Each row is a list of
+        the payments of the Notes in the batch.
+    interest
+        A list of rows of the amounts paid as interest.
+    repaid
+        A list of rows of the amounts repaid from the principal.
+    balance
+        A list of rows of the remaining balances.
+""".format(Schedules.__doc__)
+
+Columns = namedtuple(
+    "Columns", ["index", "count", "principal", "payment", "interest"])
+Columns.__doc__ = """`{}`
+
+A batch of amortization schedules in a compact form for transfer
+between processes:
+
+    index
+        A list of the positions of the Notes in the portfolio.
+    count
+        The number of payments of each Note.
+    principal
+        The principal of each Note.
+    payment
+        The payments of all the Notes, period by period.
+    interest
+        The amounts paid as interest.
+
+Decimal values are held as a string, separated by spaces. Floating point
+values are held as the bytes of an array of doubles. The amounts repaid
+and the balances are not sent. They are recovered by subtraction.
+""".format(Columns.__doc__)
+
+Discrepancy = namedtuple(
+    "Discrepancy", ["payment", "interest", "repaid", "balance"])
+Discrepancy.__doc__ = """`{}`
+
+The largest absolute differences between two sets of schedules, for
+each field of the amortization.
+""".format(Discrepancy.__doc__)
+
+
+def batches(notes):
+    """
+    Group a sequence of Notes by their number of payments.
+
+    Returns an ordered dictionary of lists of positions in the sequence,
+    keyed by number of payments.
+    """
+    rv = OrderedDict()
+    for n, note in enumerate(notes):
+        rv.setdefault(periods(note), []).append(n)
+    return rv
+
+
+def advance(count, principal, rate, payment):
+    """
+    Calculate a batch of schedules from lists of the principal, periodic
+    rate and regular payment of each Note. The arithmetic is that of the
+    type of the values supplied.
+
+    Returns a Schedules object with an empty index.
+    """
+    balance = list(principal)
+    rv = Schedules([], [], [], [], [])
+    for k in range(count):
+        interest = [r * b for r, b in zip(rate, balance)]
+        paid = [min(b + i, p) for b, i, p in zip(balance, interest, payment)]
+        repaid = [p - i for p, i in zip(paid, interest)]
+        balance = [b - r for b, r in zip(balance, repaid)]
+        rv.payment.append(paid)
+        rv.interest.append(interest)
+        rv.repaid.append(repaid)
+        rv.balance.append(balance)
+    return rv
+
+
+def schedules(notes, places=2, rounding=decimal.ROUND_UP, exact=True):
+    """
+    Calculate the amortization schedules of a portfolio of Notes.
+
+    places
+        An integer. The regular payment is rounded to this number of
+        decimal places.
+    rounding
+        Selects the rounding method. Must be one of the constants defined
+        for this purpose in the `decimal` standard library module.
+    exact
+        If True, the calculation is done in Decimal arithmetic. Otherwise
+        floating point is used.
+
+    This function is a generator. It produces a sequence of
+    :py:class:`Schedules <tallywallet.common.portfolio.Schedules>`
+    objects, one for each batch of Notes with the same number of payments.
+    """
+    quantum = Decimal(10) ** -places
+    notes = list(notes)
+    number = Decimal if exact else float
+    for count, index in batches(notes).items():
+        principal = []
+        rate = []
+        payment = []
+        for n in index:
+            note = notes[n]
+            _, i, annuity = discount_simple(note)
+            principal.append(number(note.principal))
+            rate.append(number(i))
+            payment.append(
+                number(annuity.quantize(quantum, rounding=rounding)))
+
+        rv = advance(count, principal, rate, payment)
+        rv.index.extend(index)
+        yield rv
+
+
+def records(batch, notes):
+    """
+    Unpack a batch of schedules into Amortization objects.
+
+    :param batch: A Schedules object.
+    :param notes: The sequence of Notes in the portfolio.
+
+    This function is a generator. It produces 2-tuples of the position
+    of a Note in the portfolio and an
+    :py:class:`Amortization <tallywallet.common.finance.Amortization>`.
+    """
+    for j, n in enumerate(batch.index):
+        note = notes[n]
+        ts = note.date
+        for k in range(len(batch.payment)):
+            ts += note.period
+            yield (n, Amortization(
+                ts, batch.payment[k][j], batch.interest[k][j],
+                batch.repaid[k][j], batch.balance[k][j]))
+
+
+def discrepancy(exact, approx):
+    """
+    Compare two sequences of Schedules for the same portfolio, typically
+    the results of the exact and the fast modes of
+    :py:func:`schedules <tallywallet.common.portfolio.schedules>`.
+
+    Returns a Discrepancy object of Decimal values.
+    """
+    rv = {i: Decimal(0) for i in Discrepancy._fields}
+    for a, b in zip(exact, approx):
+        for field in Discrepancy._fields:
+            rows = zip(getattr(a, field), getattr(b, field))
+            rv[field] = max([rv[field]] + [
+                abs(Decimal(x) - Decimal(y))
+                for rowA, rowB in rows for x, y in zip(rowA, rowB)])
+    return Discrepancy(**rv)
+
+
+def pack(batch, principal):
+    """
+    Pack a :py:class:`Schedules <tallywallet.common.portfolio.Schedules>`
+    object into a
+    :py:class:`Columns <tallywallet.common.portfolio.Columns>` object.
+
+    :param batch:       A Schedules object.
+    :param principal:   A list of the principal of each Note in the batch.
+    """
+    vals = []
+    for flat in (
+        principal, [i for row in batch.payment for i in row],
+        [i for row in batch.interest for i in row]
+    ):
+        if flat and isinstance(flat[0], float):
+            vals.append(array("d", flat).tobytes())
+        else:
+            vals.append(" ".join(map(str, flat)))
+    return Columns(list(batch.index), len(batch.payment), *vals)
+
+
+def unpack(cols):
+    """
+    Recreate a batch of schedules from a Columns object.
+
+    The amounts repaid and the balances are calculated as they were by
+    :py:func:`advance <tallywallet.common.portfolio.advance>`. So for
+    Decimal values, this must be done in the context of the original
+    calculation.
+
+    Returns a :py:class:`Schedules <tallywallet.common.portfolio.Schedules>`
+    object, the values of which are of the type they were packed from.
+    """
+    width = len(cols.index)
+    vals = []
+    for col in cols[2:]:
+        if isinstance(col, bytes):
+            flat = array("d")
+            flat.frombytes(col)
+            flat = flat.tolist()
+        else:
+            # Payments repeat from one period to the next.
+            text = col.split()
+            table = {i: Decimal(i) for i in set(text)}
+            flat = list(map(table.__getitem__, text))
+        vals.append(flat)
+
+    principal, payment, interest = vals
+    rv = Schedules(list(cols.index), [], [], [], [])
+    balance = principal
+    for k in range(0, width * cols.count, width):
+        paid = payment[k:k + width]
+        charged = interest[k:k + width]
+        repaid = list(map(operator.sub, paid, charged))
+        balance = list(map(operator.sub, balance, repaid))
+        rv.payment.append(paid)
+        rv.interest.append(charged)
+        rv.repaid.append(repaid)
+        rv.balance.append(balance)
+    return rv
+
+
+def chunk(notes, offset=0, places=2, rounding=decimal.ROUND_UP, exact=True,
+          context=None):
+    """
+    Calculate the schedules of a chunk of a portfolio by
+    :py:func:`schedules <tallywallet.common.portfolio.schedules>`.
+    The first Note of the chunk is at position `offset` in the portfolio.
+    The calculation is done in the Decimal `context` if one is given.
+
+    Returns a list of Columns objects, one for each batch.
+    """
+    number = Decimal if exact else float
+    rv = []
+    with decimal.localcontext(context):
+        for batch in schedules(notes, places, rounding, exact):
+            principal = [number(notes[n].principal) for n in batch.index]
+            batch.index[:] = [offset + n for n in batch.index]
+            rv.append(pack(batch, principal))
+    return rv
+
+
+def parallel(notes, places=2, rounding=decimal.ROUND_UP, exact=True,
+             workers=None, chunksize=1000):
+    """
+    Calculate the schedules of a portfolio of Notes in a pool of
+    processes.
+
+    workers
+        The number of processes. If None, the number of processors
+        on the machine. If 0, the work is done in this process.
+    chunksize
+        The number of Notes sent to a process at a time.
+
+    Other parameters are as for
+    :py:func:`schedules <tallywallet.common.portfolio.schedules>`.
+
+    This function is a generator. It produces a sequence of
+    :py:class:`Columns <tallywallet.common.portfolio.Columns>` objects,
+    one for each batch, in the order of the chunks of the portfolio.
+    Their indexes are positions in the whole portfolio.
+
+    Recreating the values costs more than calculating them in batches
+    here by :py:func:`schedules <tallywallet.common.portfolio.schedules>`.
+    So the Columns are not unpacked. Pass to
+    :py:func:`unpack <tallywallet.common.portfolio.unpack>` only those
+    which are needed, in the Decimal context of this call, which is also
+    the context in which the processes work.
+    """
+    notes = list(notes)
+    context = decimal.getcontext().copy()
+    offsets = range(0, len(notes), chunksize)
+    args = (
+        [notes[i:i + chunksize] for i in offsets], offsets,
+        itertools.repeat(places, len(offsets)),
+        itertools.repeat(rounding, len(offsets)),
+        itertools.repeat(exact, len(offsets)),
+        itertools.repeat(context, len(offsets)))
+    if workers == 0:
+        for batches in map(chunk, *args):
+            yield from batches
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        for batches in pool.map(chunk, *args):
+            yield from batches
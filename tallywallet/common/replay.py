@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+#   encoding: UTF-8
+
+# This file is part of tallywallet.
+#
+# Tallywallet is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Tallywallet is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with tallywallet.  If not, see <http://www.gnu.org/licenses/>.
+
+from collections import namedtuple
+import csv
+import datetime
+from decimal import Decimal
+import json
+import time
+
+from tallywallet.common.currency import Currency
+from tallywallet.common.exchange import Exchange
+from tallywallet.common.ledger import Role
+
+__doc__ = """
+The replay module drives a Ledger from a historical feed of exchange
+rates. Each tick revalues the affected columns of the Ledger and commits
+the resulting gains to its currency trading accounts.
+
+A rate file may be CSV, with a header row naming the fields `ts`, `rcv`,
+`out` and `rate`::
+
+    ts,rcv,out,rate
+    0,USD,CAD,1.20
+    60,USD,CAD,1.21
+
+or newline-delimited JSON, one object per line::
+
+    {"ts": 0, "rcv": "USD", "out": "CAD", "rate": "1.20"}
+
+"""
+
+Tick = namedtuple("Tick", ["ts", "rcv", "out", "rate"])
+Tick.__doc__ = """`{}`
+
+A 4-tuple recording a single quote from a rate feed:
+
+    ts
+        The time of the quote; either a number of seconds or a datetime.
+    rcv
+        The source Currency_.
+    out
+        The destination Currency_.
+    rate
+        The Decimal rate of exchange from `rcv` to `out`.
+""".format(Tick.__doc__)
+
+
+class ReplayStats(namedtuple("ReplayStats",
+                             ["ticks", "batches", "commits", "elapsed"])):
+    """
+    A 4-tuple which summarises the work done by a replay:
+
+        ticks
+            The number of ticks read from the feed.
+        batches
+            The number of coalesced updates applied to the Exchange.
+        commits
+            The number of trades committed to the Ledger.
+        elapsed
+            The wall-clock time taken, in seconds.
+    """
+
+    @property
+    def tick_rate(self):
+        """Ticks processed per second."""
+        return self.ticks / self.elapsed if self.elapsed else float("inf")
+
+    @property
+    def commit_rate(self):
+        """Commits made per second."""
+        return self.commits / self.elapsed if self.elapsed else float("inf")
+
+
+def timestamp(val):
+    """
+    Interpret the time field of a feed record. Numbers are taken as
+    seconds. Strings are parsed as numbers if possible, otherwise as
+    ISO 8601 datetimes. These may have fractional seconds and a UTC
+    offset, eg: `2013-01-01T00:00:30.250+00:00`. A feed should not mix
+    datetimes with and without an offset.
+
+    Raises ValueError if the string is neither.
+    """
+    if not isinstance(val, str):
+        return val
+    try:
+        return Decimal(val)
+    except ArithmeticError:
+        return datetime.datetime.fromisoformat(val)
+
+
+def tick(record, currency=Currency.__getitem__):
+    """
+    Create a Tick from a mapping of feed fields.
+
+    :param currency: A callable which returns a Currency_ from its code.
+    """
+    return Tick(
+        timestamp(record["ts"]),
+        currency(record["rcv"]), currency(record["out"]),
+        Decimal(str(record["rate"])))
+
+
+def read_csv(stream, currency=Currency.__getitem__):
+    """
+    Read ticks from a CSV file object.
+
+    This function is a generator. It produces a sequence of Tick objects.
+    A record which cannot be read raises ValueError, giving its line
+    number.
+    """
+    reader = csv.DictReader(stream)
+    for record in reader:
+        try:
+            yield tick(record, currency)
+        except (ArithmeticError, ValueError) as e:
+            raise ValueError(
+                "line {0}: {1}".format(reader.line_num, e)) from e
+
+
+def read_ndjson(stream, currency=Currency.__getitem__):
+    """
+    Read ticks from a file object of newline-delimited JSON.
+
+    This function is a generator. It produces a sequence of Tick objects.
+    A record which cannot be read raises ValueError, giving its line
+    number.
+    """
+    for n, line in enumerate(stream, start=1):
+        if line.strip():
+            try:
+                yield tick(json.loads(line), currency)
+            except (ArithmeticError, ValueError) as e:
+                raise ValueError("line {0}: {1}".format(n, e)) from e
+
+
+def duration(window, ts):
+    """
+    Express `window` in the same terms as the difference of two
+    timestamps like `ts`. A window may be a number of seconds or a
+    timedelta.
+    """
+    if isinstance(ts, datetime.datetime):
+        if isinstance(window, datetime.timedelta):
+            return window
+        return datetime.timedelta(seconds=float(window))
+    elif isinstance(window, datetime.timedelta):
+        return Decimal(str(window.total_seconds()))
+    else:
+        return window
+
+
+def coalesce(ticks, window=0):
+    """
+    Gather ticks which fall within `window` of the first tick in each group.
+    Only the latest rate for each pair of currencies is kept.
+
+    :param window:  A number of seconds, or a timedelta.
+
+    This function is a generator. It produces 2-tuples of
+    (timestamp, rates) where `rates` is a dictionary suitable for
+    updating an Exchange_.
+    """
+    start = ts = span = None
+    rates = {}
+    for t in ticks:
+        if span is None:
+            span = duration(window, t.ts)
+        if rates and not t.ts - start < span:
+            yield (ts, rates)
+            rates = {}
+        if not rates:
+            start = t.ts
+        ts = t.ts
+        rates[(t.rcv, t.out)] = t.rate
+
+    if rates:
+        yield (ts, rates)
+
+
+def replay(ledger, ticks, exchange=None, window=0,
+           clock=time.perf_counter):
+    """
+    Revalue a Ledger against a sequence of ticks.
+
+    The Exchange is updated incrementally from each coalesced batch of
+    ticks. Only those columns whose currency is quoted in the batch are
+    adjusted, and their gains are committed to the trading accounts.
+
+    :param ledger:  The Ledger to update.
+    :param ticks:   An iterable of Tick objects.
+    :param exchange: (optional) An Exchange_ of opening rates.
+    :param window:  Ticks within this interval of each other are
+                    applied as a single update. It is a number of
+                    seconds, or a timedelta.
+    :returns:       This routine is a generator which yields the results of
+                    each commit. The final return value is a ReplayStats
+                    object.
+    """
+    counter = [0]
+
+    def counted(seq):
+        for t in seq:
+            counter[0] += 1
+            yield t
+
+    exchange = Exchange(exchange or {})
+    batches = commits = 0
+    start = clock()
+    for ts, rates in coalesce(counted(ticks), window):
+        batches += 1
+        exchange = Exchange(exchange)
+        exchange.update(rates)
+        quoted = set(c for pair in rates for c in pair)
+        cols = [i for i in ledger.columns.values()
+                if i.role is not Role.trading and i.currency in quoted
+                and i.currency != ledger.ref]
+        if not cols:
+            continue
+
+        for trade, col, exch in ledger.adjustments(exchange, cols):
+            commits += 1
+            yield ledger.commit(trade, col, exch, ts=ts)
+
+    return ReplayStats(counter[0], batches, commits, clock() - start)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+#   encoding: UTF-8
+
+# This file is part of tallywallet.
+#
+# Tallywallet is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Tallywallet is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with tallywallet.  If not, see <http://www.gnu.org/licenses/>.
+
+from collections import namedtuple
+from collections import OrderedDict
+
+from tallywallet.common.output import journal
+
+__doc__ = """
+The sampling module decides when a simulation records the state of its
+Ledger, and where the records go.
+
+A :py:class:`Schedule <tallywallet.common.sampling.Schedule>` holds the
+timesteps at which samples are taken. It is worked out once, before the
+simulation begins, so that the timesteps in between may be run without
+a test of the time.
+
+At each sample, every sink is called with the time and the Ledger.
+A sink is any callable. There are two here;
+:py:class:`Arrays <tallywallet.common.sampling.Arrays>` keeps the
+balances in memory and
+:py:class:`Journal <tallywallet.common.sampling.Journal>` writes RSON_
+to a stream.
+"""
+
+Schedule = namedtuple("Schedule", ["interval", "ticks"])
+Schedule.__doc__ = """`{}`
+
+The times at which a simulation takes samples:
+
+    interval
+        The simulation timestep in seconds.
+    ticks
+        A list of the timesteps at which samples are taken, in
+        increasing order. The first timestep is 1.
+""".format(Schedule.__doc__)
+
+
+def schedule(times, interval):
+    """
+    Make a Schedule from a sequence of sample times.
+
+    A sample is taken at the first timestep which ends at or after its
+    time. If more than one sample falls in the same timestep, each later
+    sample is taken one timestep after the last.
+    """
+    rv = []
+    for time in sorted(times):
+        tick = max(1, int(-(-time // interval)), rv[-1] + 1 if rv else 1)
+        rv.append(tick)
+    return Schedule(interval, rv)
+
+
+def periodic(period, stop, interval, start=0):
+    """
+    Make a Schedule of samples taken every `period` seconds from `start`
+    until `stop`.
+    """
+    n = int((stop - start) // period)
+    return schedule((start + i * period for i in range(n + 1)), interval)
+
+
+def decimate(sched, n):
+    """
+    Return a Schedule which keeps every `n` th sample of `sched`, beginning
+    with the first.
+    """
+    return sched._replace(ticks=sched.ticks[::n])
+
+
+class Arrays(object):
+    """
+    A sink which keeps the balances of a Ledger in memory.
+
+    ts
+        A list of the sample times.
+    values
+        An ordered dictionary of lists of balances, keyed by column name.
+    """
+
+    def __init__(self):
+        self.ts = []
+        self.values = OrderedDict()
+
+    def __call__(self, t, ldgr):
+        self.ts.append(t)
+        for key, col in ldgr.columns.items():
+            self.values.setdefault(key, []).append(ldgr.value(col))
+
+
+class Journal(object):
+    """
+    A sink which writes a journal of the Ledger to a text stream.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def __call__(self, t, ldgr):
+        self.stream.write(journal(ldgr, ts=t))
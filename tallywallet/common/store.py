@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+#   encoding: UTF-8
+
+# This file is part of tallywallet.
+#
+# Tallywallet is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Tallywallet is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with tallywallet.  If not, see <http://www.gnu.org/licenses/>.
+
+from collections import namedtuple
+from collections import OrderedDict
+import decimal
+from decimal import Decimal
+from functools import lru_cache
+import hashlib
+from itertools import accumulate
+from itertools import chain
+from itertools import groupby
+from itertools import islice
+from itertools import repeat
+import marshal
+from operator import add
+from operator import sub
+import os
+import tempfile
+
+from tallywallet.common.finance import Amortization
+from tallywallet.common.finance import schedule
+
+__doc__ = """
+The store module keeps the amortization schedules of
+:py:class:`Notes <tallywallet.common.finance.Note>` in files on
+local disk, so that they need not be calculated again.
+
+Each schedule is saved under a digest of the fields of its Note, the
+parameters of the calculation and the Decimal context in which it was
+done. A Note which has not changed is found by its digest, and its
+schedule loaded from file.
+
+Only the payments and the interest of each period are saved; a run of
+equal payments is saved once. On loading, the amounts repaid and the
+balances are recalculated by subtraction. This is done in the same
+Decimal context as the original calculation, so the results are
+identical. Loading a schedule costs less than calculating it.
+
+A file is read with a single system call, since its size is known.
+A warm hit still pays for the digest and the file itself, so the saving
+is greatest for Notes with many payments.
+
+The total size of the files is bounded; when it is exceeded, the
+schedules least recently used are removed.
+"""
+
+FORMAT = "tallywallet.store/2/marshal{}".format(marshal.version)
+
+StoreInfo = namedtuple("StoreInfo", ["hits", "misses", "maxsize", "currsize"])
+StoreInfo.__doc__ = """`{}`
+
+The statistics of a ScheduleStore. Sizes are in bytes.
+""".format(StoreInfo.__doc__)
+
+
+def digest(note, places=2, rounding=decimal.ROUND_UP, context=None):
+    """
+    Return a hexadecimal digest which identifies the schedule of
+    `note` for the given `places` and `rounding`.
+
+    The digest depends also on the Decimal `context` of the calculation,
+    by default the current one, and on the format of the files.
+    """
+    context = context or decimal.getcontext()
+    fields = [
+        note.date.isoformat(), str(note.principal),
+        getattr(note.currency, "name", str(note.currency)),
+        str(note.term), str(note.interest), str(note.period),
+        str(places), str(rounding),
+        str(context.prec), str(context.rounding), str(context.Emin),
+        str(context.Emax), str(context.clamp), FORMAT]
+    return hashlib.sha256("|".join(fields).encode("utf-8")).hexdigest()
+
+
+def pack(records):
+    """
+    Encode a schedule, a sequence of
+    :py:class:`Amortization <tallywallet.common.finance.Amortization>`
+    objects, as bytes.
+    """
+    records = list(records)
+    payments = [
+        (str(val), len(list(run)))
+        for val, run in groupby(i.payment for i in records)]
+    interest = [str(i.interest) for i in records]
+    return marshal.dumps((FORMAT, payments, interest))
+
+
+@lru_cache(maxsize=1024)
+def dates(start, period, count):
+    """
+    Return a tuple of the `count` dates which follow `start` at intervals
+    of `period`. Notes often share their dates, which are immutable.
+    """
+    return tuple(islice(accumulate(
+        chain([start], repeat(period, count)), add), 1, None))
+
+
+def load(data, note):
+    """
+    Recreate the schedule of `note` from the bytes made by
+    :py:func:`pack <tallywallet.common.store.pack>`. This must be done
+    in the Decimal context of the original calculation.
+
+    Returns a list of
+    :py:class:`Amortization <tallywallet.common.finance.Amortization>`
+    objects.
+    """
+    tag, payments, interest = marshal.loads(data)
+    if tag != FORMAT:
+        raise ValueError("Unknown format: {}".format(tag))
+
+    payment = []
+    for val, n in payments:
+        payment.extend(repeat(Decimal(val), n))
+    interest = list(map(Decimal, interest))
+    repaid = list(map(sub, payment, interest))
+    balance = islice(accumulate(chain([note.principal], repaid), sub), 1, None)
+    ts = dates(note.date, note.period, len(repaid))
+    # As Amortization._make, without a call in Python for each record.
+    return list(map(
+        tuple.__new__, repeat(Amortization),
+        zip(ts, payment, interest, repaid, balance)))
+
+
+class ScheduleStore(object):
+    """
+    A cache of amortization schedules in a directory on disk.
+
+    :param path:    The directory in which to keep the files. It is
+                    created if necessary.
+    :param maxsize: The largest total size of the files, in bytes.
+
+    Files already in the directory are used, the most recently modified
+    being taken as the most recently used. A file which cannot be read
+    is removed, and its schedule calculated again.
+    """
+
+    suffix = ".sch"
+    temporary = ".tmp"
+
+    def __init__(self, path, maxsize=64 * 1024 * 1024):
+        self.path = path
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(path, exist_ok=True)
+        entries = []
+        for name in os.listdir(path):
+            if name.endswith(self.suffix):
+                st = os.stat(os.path.join(path, name))
+                entries.append((st.st_mtime, name[:-len(self.suffix)],
+                                st.st_size))
+        self._files = OrderedDict(
+            (key, size) for ts, key, size in sorted(entries))
+        self._size = sum(self._files.values())
+
+    def _locate(self, key):
+        return os.path.join(self.path, key + self.suffix)
+
+    def get(self, note, places=2, rounding=decimal.ROUND_UP):
+        """
+        Return the stored schedule of `note` as a list of
+        :py:class:`Amortization <tallywallet.common.finance.Amortization>`
+        objects, or None if it is not in the store.
+        """
+        key = digest(note, places, rounding)
+        if key not in self._files:
+            return None
+
+        path = self._locate(key)
+        try:
+            fD = os.open(path, os.O_RDONLY)
+            try:
+                data = os.read(fD, self._files[key])
+            finally:
+                os.close(fD)
+            os.utime(path)
+        except FileNotFoundError:
+            self._size -= self._files.pop(key)
+            return None
+
+        try:
+            if len(data) != self._files[key]:
+                raise EOFError("File changed: {}".format(path))
+            rv = load(data, note)
+        except (EOFError, TypeError, ValueError):
+            self._size -= self._files.pop(key)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            return None
+
+        self._files.move_to_end(key)
+        return rv
+
+    def put(self, note, places=2, rounding=decimal.ROUND_UP):
+        """
+        Calculate the schedule of `note` and save it to the store.
+        The schedules least recently used are removed to keep the store
+        within its size.
+
+        Returns the schedule as a list of
+        :py:class:`Amortization <tallywallet.common.finance.Amortization>`
+        objects.
+        """
+        rv = list(schedule(note, places, rounding))
+        key = digest(note, places, rounding)
+        data = pack(rv)
+        fD, tmp = tempfile.mkstemp(suffix=self.temporary, dir=self.path)
+        try:
+            with os.fdopen(fD, "wb") as fObj:
+                fObj.write(data)
+            os.replace(tmp, self._locate(key))
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+        self._size += len(data) - self._files.pop(key, 0)
+        self._files[key] = len(data)
+        while self._size > self.maxsize and len(self._files) > 1:
+            old, size = self._files.popitem(last=False)
+            self._size -= size
+            try:
+                os.remove(self._locate(old))
+            except FileNotFoundError:
+                pass
+        return rv
+
+    def schedule(self, note, places=2, rounding=decimal.ROUND_UP):
+        """
+        Return the schedule of `note` as a list of
+        :py:class:`Amortization <tallywallet.common.finance.Amortization>`
+        objects. It is loaded from the store if present, or else calculated
+        and saved.
+
+        The parameters are those of
+        :py:func:`schedule <tallywallet.common.finance.schedule>`.
+        """
+        rv = self.get(note, places, rounding)
+        if rv is None:
+            self.misses += 1
+            rv = self.put(note, places, rounding)
+        else:
+            self.hits += 1
+        return rv
+
+    def info(self):
+        """
+        Return a StoreInfo tuple of the statistics of the store.
+        """
+        return StoreInfo(self.hits, self.misses, self.maxsize, self._size)
+
+    def clear(self):
+        """
+        Remove all the schedules from the store and reset its statistics.
+        Temporary files left by interrupted writes are removed too.
+        """
+        for key in self._files:
+            try:
+                os.remove(self._locate(key))
+            except FileNotFoundError:
+                pass
+        for name in os.listdir(self.path):
+            if name.endswith(self.temporary):
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except FileNotFoundError:
+                    pass
+        self._files.clear()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+#   encoding: UTF-8
+
+# This file is part of tallywallet.
+#
+# Tallywallet is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Tallywallet is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with tallywallet.  If not, see <http://www.gnu.org/licenses/>.
+
+from collections import namedtuple
+from collections import OrderedDict
+from decimal import Decimal
+import math
+import random
+import sys
+import time
+
+from tallywallet.common.currency import Currency as Cy
+from tallywallet.common.currency import lookup
+from tallywallet.common.currency import registry
+from tallywallet.common.debunking import HOUR
+from tallywallet.common.debunking import INITIAL
+from tallywallet.common.debunking import model
+from tallywallet.common.exchange import Exchange
+from tallywallet.common.flow import Plan
+from tallywallet.common.ledger import Column
+from tallywallet.common.ledger import Ledger
+from tallywallet.common.ledger import Status
+
+__doc__ = """
+The `tallywallet.common.stress` module tests a Ledger of many columns in
+many currencies under changes of exchange rate.
+
+The money circuit of :py:mod:`debunking <tallywallet.common.debunking>`
+is copied many times into one Ledger. Each copy has its own columns, all
+in one currency. The currencies are spread among the copies in turn.
+
+At chosen timesteps, the rates of exchange are changed. The gain or loss
+of each column is found by :py:meth:`Ledger.adjustments \\
+<tallywallet.common.ledger.Ledger.adjustments>` and committed to the
+trading account of its currency. The Fundamental Accounting Equation is
+tested as the run goes on. The result reports the speed of the run and
+the largest difference between the sides of the equation.
+
+For example::
+
+    $ python -m tallywallet.common.stress --size 1000 --currencies 12 \\
+        --ticks 240 --shocks 10
+
+"""
+
+Report = namedtuple(
+    "Report",
+    ["columns", "currencies", "ticks", "shocks", "commits", "checks",
+     "failures", "drift", "seconds"])
+Report.__doc__ = """`{}`
+
+The outcome of a stress run:
+
+    columns
+        The number of columns, not counting trading accounts.
+    currencies
+        The number of currencies.
+    ticks
+        The number of timesteps.
+    shocks
+        The number of changes of exchange rates.
+    commits
+        The number of commits to the Ledger.
+    checks
+        The number of tests of the Fundamental Accounting Equation.
+    failures
+        The number of those tests which failed.
+    drift
+        The largest difference between the two sides of the equation.
+    seconds
+        An ordered dictionary of the time spent in each phase of the
+        run; `step`, `shock` and `check`.
+""".format(Report.__doc__)
+
+
+def currencies(n, ref=Cy.USD):
+    """
+    Choose `n` currencies. The first is `ref`, and the others are taken
+    from the `ISO 4217` registry. A ValueError is raised if there are
+    not enough of them.
+    """
+    name = getattr(ref, "name", None)
+    rest = [
+        i for i in registry()
+        if i.name != name and i.minor is not None][:n - 1]
+    if len(rest) < n - 1:
+        raise ValueError(
+            "Only {} currencies are available".format(len(rest) + 1))
+    return [ref] + rest
+
+
+def build(size, crncys, initial=INITIAL, ref=Cy.USD):
+    """
+    Make a Ledger with `size` copies of the money circuit.
+
+    :param size:    The number of copies.
+    :param crncys:  A sequence of currencies. Copies are given each in
+                    turn.
+    :param initial: The initial value of the banking licence of each copy.
+    :param ref:     The reference currency of the Ledger.
+    :returns:       A 2-tuple of the Ledger and a list of copies. Each copy
+                    is a list of its columns, in the order of the columns
+                    of the circuit.
+    """
+    copies = [
+        [Column("{}.{}".format(key, n), crncys[n % len(crncys)],
+                col.role, col.label)
+         for key, col in model.columns.items()]
+        for n in range(size)]
+    ldgr = Ledger(*(col for cols in copies for col in cols), ref=ref)
+    keys = list(model.columns)
+    for cols in copies:
+        ldgr.commit(initial, cols[keys.index("licence")])
+        ldgr.commit(initial, cols[keys.index("vault")])
+    return ldgr, copies
+
+
+def exchange(rates, ref=Cy.USD):
+    """
+    Make an Exchange from a mapping of currency to its rate against `ref`.
+    """
+    return Exchange({(c, ref): rate for c, rate in rates.items()})
+
+
+def walk(crncys, ticks, count, seed=0, scale=0.05, ref=Cy.USD):
+    """
+    Script a random series of changes of exchange rates.
+
+    :param crncys:  A sequence of currencies.
+    :param ticks:   The number of timesteps of the run.
+    :param count:   The number of changes.
+    :param seed:    The seed of the random number generator.
+    :param scale:   The standard deviation of the logarithm of each change.
+    :returns:       An ordered dictionary keyed by timestep. Each value is
+                    a dictionary of currency to its new rate against `ref`.
+                    The rates at timestep 0 are the initial rates.
+    """
+    rng = random.Random(seed)
+    quantum = Decimal("0.000001")
+    rates = OrderedDict(
+        (c, rng.uniform(0.5, 2)) for c in crncys if c != ref)
+    rv = OrderedDict([(0, OrderedDict(
+        (c, Decimal(r).quantize(quantum)) for c, r in rates.items()))])
+    for tick in sorted(rng.sample(range(1, ticks + 1), min(count, ticks))):
+        for c in rates:
+            rates[c] *= math.exp(rng.gauss(0, scale))
+        rv[tick] = OrderedDict(
+            (c, Decimal(r).quantize(quantum)) for c, r in rates.items())
+    return rv
+
+
+def stress(
+    size, crncys, ticks, shocks=None, interval=HOUR, initial=INITIAL,
+    check=1, ref=Cy.USD, clock=time.perf_counter
+):
+    """
+    Run the money circuit in many copies and many currencies.
+
+    :param size:    The number of copies of the circuit.
+    :param crncys:  A sequence of currencies.
+    :param ticks:   The number of timesteps.
+    :param shocks:  A mapping of timestep to a dictionary of currency to
+                    its new rate against `ref`, as made by
+                    :py:func:`walk <tallywallet.common.stress.walk>`.
+                    Rates at timestep 0 apply from the start. Any currency
+                    without a rate there starts at par.
+    :param interval:    The simulation timestep in seconds.
+    :param initial: The initial value of the banking licence of each copy.
+    :param check:   The number of timesteps between tests of the
+                    Fundamental Accounting Equation. It is tested also
+                    after every change of rates.
+    :param ref:     The reference currency of the Ledger.
+    :param clock:   A callable which returns a time in seconds.
+    :returns:       A 2-tuple of a :py:class:`Report \\
+<tallywallet.common.stress.Report>` and the Ledger.
+    """
+    shocks = OrderedDict(sorted((shocks or {}).items()))
+    seconds = OrderedDict((k, 0.0) for k in ("step", "shock", "check"))
+    steps = Plan(model, interval)
+    ldgr, copies = build(size, crncys, initial, ref)
+    cols = [col for copy in copies for col in copy]
+    commits = 2 * size
+    checks = failures = 0
+    drift = Decimal(0)
+
+    rates = OrderedDict((c, Decimal(1)) for c in crncys if c != ref)
+    rates.update(shocks.pop(0, {}))
+    for trade, col, exch in ldgr.adjustments(exchange(rates, ref), cols):
+        ldgr.commit(trade, col, exch)
+        commits += 1
+    states = [[ldgr.value(col) for col in copy] for copy in copies]
+
+    for tick in range(1, ticks + 1):
+        start = clock()
+        for copy, state in zip(copies, states):
+            new = steps.step(state)
+            for col, old, val in zip(copy, state, new):
+                if val != old:
+                    ldgr.commit(val - old, col)
+                    commits += 1
+            state[:] = new
+        seconds["step"] += clock() - start
+
+        shock = shocks.get(tick)
+        if shock:
+            start = clock()
+            rates.update(shock)
+            for trade, col, exch in ldgr.adjustments(
+                exchange(rates, ref),
+                [col for col in cols if col.currency in shock]
+            ):
+                ldgr.commit(trade, col, exch)
+                commits += 1
+            seconds["shock"] += clock() - start
+
+        if shock or not tick % check or tick == ticks:
+            start = clock()
+            lhs, rhs, st = ldgr.equation
+            checks += 1
+            if st is not Status.ok:
+                failures += 1
+            if lhs is not None:
+                drift = max(drift, abs(lhs - rhs))
+            seconds["check"] += clock() - start
+
+    rv = Report(
+        len(cols), len(set(crncys)), ticks,
+        len([i for i in shocks if 0 < i <= ticks]),
+        commits, checks, failures, drift, seconds)
+    return rv, ldgr
+
+
+def shock(arg):
+    """
+    Parse a command line value of the form `tick:code=rate,code=rate,...`.
+    Currencies are given by their alphabetic codes.
+    """
+    tick, vals = arg.split(":", 1)
+    return (int(tick), OrderedDict(
+        (lookup(code).name, Decimal(rate))
+        for code, rate in (i.split("=", 1) for i in vals.split(","))))
+
+
+def main(args):
+    crncys = currencies(args.currencies)
+    if args.shock:
+        codes = {c.name: c for c in crncys}
+        unknown = set(k for t, rates in args.shock for k in rates) - set(codes)
+        if unknown:
+            raise ValueError("Not a currency of the run: {}".format(
+                ", ".join(sorted(unknown))))
+        shocks = OrderedDict(
+            (tick, {codes[k]: v for k, v in rates.items()})
+            for tick, rates in args.shock)
+    else:
+        shocks = walk(crncys, args.ticks, args.shocks, seed=args.seed)
+    start = time.perf_counter()
+    rv, ldgr = stress(
+        args.size, crncys, args.ticks, shocks, interval=args.interval,
+        check=args.check)
+    elapsed = time.perf_counter() - start
+    for key, val in rv._asdict().items():
+        if key == "seconds":
+            for phase, secs in val.items():
+                print("{:<12} {:.3f}".format(phase + " (s)", secs))
+        else:
+            print("{:<12} {}".format(key, val))
+    print("{:<12} {:.0f}".format("commits/s", rv.commits / elapsed))
+    return 0 if rv.failures == 0 else 1
+
+
+def parser():
+    import argparse
+    rv = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    rv.add_argument(
+        "--size", type=int, default=100,
+        help="Set the number of copies of the circuit [100]")
+    rv.add_argument(
+        "--currencies", type=int, default=4,
+        help="Set the number of currencies [4]")
+    rv.add_argument(
+        "--ticks", type=int, default=24,
+        help="Set the number of timesteps [24]")
+    rv.add_argument(
+        "--shocks", type=int, default=4,
+        help="Set the number of random changes of rates [4]")
+    rv.add_argument(
+        "--shock", type=shock, action="append", default=[],
+        help="Script a change of rates, eg: 12:AED=0.25,AFN=0.01 . "
+        "Replaces the random changes")
+    rv.add_argument(
+        "--seed", type=int, default=0,
+        help="Set the seed for random changes [0]")
+    rv.add_argument(
+        "--check", type=int, default=1,
+        help="Set the number of timesteps between tests of the balance [1]")
+    rv.add_argument(
+        "--interval", type=int, default=HOUR,
+        help="Set the simulation interval (s) [{}]".format(HOUR))
+    return rv
+
+
+def run():
+    p = parser()
+    args = p.parse_args()
+    rv = main(args)
+    sys.exit(rv)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+#   encoding: UTF-8
+
+# This file is part of tallywallet.
+#
+# Tallywallet is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Tallywallet is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with tallywallet.  If not, see <http://www.gnu.org/licenses/>.
+
+from collections import OrderedDict
+import concurrent.futures
+from decimal import Decimal
+import itertools
+import json
+import os
+import random
+import sys
+
+from tallywallet.common.currency import Currency as Cy
+from tallywallet.common.debunking import HOUR
+from tallywallet.common.debunking import INITIAL
+from tallywallet.common.debunking import YEAR
+from tallywallet.common.debunking import columns
+from tallywallet.common.debunking import parameters
+from tallywallet.common.debunking import simulate
+from tallywallet.common.ledger import Ledger
+
+__doc__ = """
+The `tallywallet.common.sweep` module runs the simulation of
+:py:mod:`debunking <tallywallet.common.debunking>` many times over
+different values of its rates.
+
+The values are chosen either from a grid, or at random from ranges.
+The runs are shared among a pool of processes. The balances of the
+Ledger at each sample time are collected into a single set of columns,
+ordered by run and by sample.
+
+If a results file is named, each run is recorded there as it finishes,
+with its rates and the settings of the simulation. A sweep which is
+interrupted may be started again with the same file; the runs already
+recorded are not repeated. A file of runs with other settings is
+refused.
+
+For example::
+
+    $ python -m tallywallet.common.sweep \\
+        --grid bank_loan.pa=0.4,0.5,0.6 --grid firms_wages.pa=2,3 \\
+        --output sweep.jsonl
+
+"""
+
+
+def grid(axes):
+    """
+    Generate the points of a grid of rates.
+
+    :param axes:    A mapping of parameter name to a sequence of values.
+    :returns:       A list of dictionaries, one for every combination of
+                    values. The last axis varies fastest.
+    """
+    keys = list(axes)
+    return [
+        OrderedDict(zip(keys, vals))
+        for vals in itertools.product(*(axes[k] for k in keys))]
+
+
+def design(ranges, size, seed=0, places=6):
+    """
+    Generate points of rates chosen at random.
+
+    :param ranges:  A mapping of parameter name to a 2-tuple of (low, high).
+    :param size:    The number of points.
+    :param seed:    The seed of the random number generator. The same seed
+                    gives the same points.
+    :param places:  Values are rounded to this number of decimal places.
+    :returns:       A list of dictionaries of Decimal values.
+    """
+    rng = random.Random(seed)
+    quantum = Decimal(10) ** -places
+    return [
+        OrderedDict(
+            (k, Decimal(rng.uniform(float(lo), float(hi))).quantize(quantum))
+            for k, (lo, hi) in ranges.items())
+        for n in range(size)]
+
+
+def trial(params, samples, initial=INITIAL, interval=HOUR,
+          number=Decimal, jump=True):
+    """
+    Run the simulation once.
+
+    :param params:  A mapping of rates to change from their defaults.
+
+    Other parameters are as for
+    :py:func:`simulate <tallywallet.common.debunking.simulate>`.
+
+    Returns a list of the balances of the Ledger columns at each sample
+    time. Each balance is a string.
+    """
+    ldgr = Ledger(*columns.values(), ref=Cy.USD)
+    sim = simulate(
+        list(samples), initial, interval, ledger=ldgr, number=number,
+        jump=jump, params=params)
+    next(sim)  # metadata
+    next(sim)  # initial state
+    return [[str(ldgr.value(k)) for k in columns] for msg in sim]
+
+
+def conditions(samples, initial=INITIAL, interval=HOUR, number=Decimal,
+               jump=True):
+    """
+    Describe the settings of the trials of a sweep, as they are saved in
+    each record of a results file.
+
+    The parameters are those of
+    :py:func:`trial <tallywallet.common.sweep.trial>`.
+    """
+    return OrderedDict([
+        ("samples", list(samples)), ("initial", initial),
+        ("interval", interval),
+        ("number", getattr(number, "__name__", None)), ("jump", jump)])
+
+
+def recorded(path):
+    """
+    Read the runs recorded in a results file.
+
+    Returns a dictionary of run records keyed by run number. A record
+    which was cut short by an interruption is ignored.
+    """
+    rv = {}
+    try:
+        with open(path, "r") as fObj:
+            for line in fObj:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                rv[record["run"]] = record
+    except FileNotFoundError:
+        pass
+    return rv
+
+
+def sweep(points, samples, path=None, workers=None, **kwargs):
+    """
+    Run the simulation for every point of a set of rates.
+
+    :param points:  A sequence of mappings of rates, as made by
+                    :py:func:`grid <tallywallet.common.sweep.grid>` or
+                    :py:func:`design <tallywallet.common.sweep.design>`.
+    :param samples: A sequence of sample times.
+    :param path:    The path of a results file. Runs already recorded
+                    there with the same rates are not repeated.
+                    A ValueError is raised if the file holds runs with
+                    settings other than those given.
+    :param workers: The number of processes. If None, the number of
+                    processors on the machine. If 0, the work is done
+                    in this process.
+
+    Other keyword arguments are passed to
+    :py:func:`trial <tallywallet.common.sweep.trial>`.
+
+    Returns an ordered dictionary of columns of equal length. There is a
+    row for every sample of every run, ordered by run and then by sample.
+    The columns are `run`, `ts`, the name of each parameter and the name
+    of each Ledger column.
+    """
+    points = [
+        OrderedDict((k, str(v)) for k, v in point.items())
+        for point in points]
+    samples = list(samples)
+    options = json.loads(json.dumps(conditions(samples, **kwargs)))
+    done = {}
+    for n, record in (recorded(path) if path else {}).items():
+        if record.get("settings") != options:
+            raise ValueError("Results file settings do not match")
+        elif n < len(points) and record["params"] == points[n]:
+            done[n] = record
+    todo = [n for n in range(len(points)) if n not in done]
+
+    fObj = open(path, "a") if path else None
+    if fObj is not None and fObj.tell():
+        with open(path, "rb") as check:
+            check.seek(-1, os.SEEK_END)
+            if check.read(1) != b"\n":
+                fObj.write("\n")  # Finish a record cut short
+    try:
+        if workers == 0:
+            results = (
+                (n, trial(points[n], samples, **kwargs)) for n in todo)
+            for n, values in results:
+                done[n] = save(fObj, n, points[n], values, options)
+        else:
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers
+            ) as pool:
+                jobs = {
+                    pool.submit(trial, points[n], samples, **kwargs): n
+                    for n in todo}
+                for job in concurrent.futures.as_completed(jobs):
+                    n = jobs[job]
+                    done[n] = save(
+                        fObj, n, points[n], job.result(), options)
+    finally:
+        if fObj is not None:
+            fObj.close()
+
+    names = sorted(set(k for point in points for k in point),
+                   key=list(parameters).index)
+    rv = OrderedDict(
+        (k, []) for k in ["run", "ts"] + names + list(columns))
+    for n in range(len(points)):
+        for ts, vals in zip(samples, done[n]["values"]):
+            rv["run"].append(n)
+            rv["ts"].append(ts)
+            for k in names:
+                rv[k].append(Decimal(points[n].get(k, parameters[k])))
+            for k, val in zip(columns, vals):
+                rv[k].append(Decimal(val))
+    return rv
+
+
+def save(fObj, n, params, values, settings=None):
+    """
+    Write the record of a run to an open results file, if there is one.
+    Returns the record.
+
+    :param settings:    The settings of the simulation, as made by
+                        :py:func:`conditions \
+<tallywallet.common.sweep.conditions>`.
+    """
+    rv = OrderedDict([
+        ("run", n), ("params", params), ("settings", settings),
+        ("values", values)])
+    if fObj is not None:
+        fObj.write(json.dumps(rv) + "\n")
+        fObj.flush()
+        os.fsync(fObj.fileno())
+    return rv
+
+
+def axis(arg):
+    """
+    Parse a command line value of the form `name=value,value,...`.
+    """
+    name, vals = arg.split("=", 1)
+    if name not in parameters:
+        raise ValueError("Unknown parameter: {}".format(name))
+    return (name, [Decimal(i) for i in vals.split(",")])
+
+
+def main(args):
+    if args.random:
+        points = design(
+            OrderedDict(args.grid), args.random, seed=args.seed)
+    else:
+        points = grid(OrderedDict(args.grid))
+    samples = [YEAR * i for i in range(1, 11)]
+    rv = sweep(
+        points, samples, path=args.output, workers=args.workers,
+        initial=args.initial, interval=args.interval)
+    print(",".join(rv))
+    for row in zip(*rv.values()):
+        print(",".join(str(i) for i in row))
+    return 0
+
+
+def parser():
+    import argparse
+    rv = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    rv.add_argument(
+        "--grid", type=axis, action="append", default=[],
+        help="Set the values of a rate, eg: bank_loan.pa=0.4,0.5 . "
+        "Choose from: {}".format(", ".join(parameters)))
+    rv.add_argument(
+        "--random", type=int, default=0,
+        help="Choose this number of points at random. Each --grid "
+        "option then gives the low and high values of a range, "
+        "eg: bank_loan.pa=0.4,0.6")
+    rv.add_argument(
+        "--seed", type=int, default=0,
+        help="Set the seed for random points [0]")
+    rv.add_argument(
+        "--output", default=None,
+        help="Record runs in this file, resuming any found there")
+    rv.add_argument(
+        "--workers", type=int, default=None,
+        help="Set the number of processes [one per processor]")
+    rv.add_argument(
+        "--initial", type=int, default=INITIAL,
+        help="Set the initial level of vault funds [{}]".format(INITIAL))
+    rv.add_argument(
+        "--interval", type=int, default=HOUR,
+        help="Set the simulation interval (s) [{}]".format(HOUR))
+    return rv
+
+
+def run():
+    p = parser()
+    args = p.parse_args()
+    if args.random:
+        for name, vals in args.grid:
+            if len(vals) != 2:
+                p.error("--random needs a low and high value: {}".format(
+                    name))
+    rv = main(args)
+    sys.exit(rv)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+#   encoding: UTF-8
+
+# This file is part of tallywallet.
+#
+# Tallywallet is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Tallywallet is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with tallywallet.  If not, see <http://www.gnu.org/licenses/>.
+
+import datetime
+from decimal import Decimal
+
+from tallywallet.common.finance import Note
+
+
+def book(
+    size, dates=28, terms=5, rates=7, periods=3, interest=Decimal("0.04"),
+    currencies=("USD",)
+):
+    """
+    Return a list of varied Notes for testing. The fields of the Notes
+    cycle through the given number of values:
+
+    dates
+        Consecutive days from the start of 2014.
+    terms
+        Whole years of 360 days.
+    rates
+        Steps of 1% from `interest`.
+    periods
+        Multiples of 30 days.
+    currencies
+        The values given.
+
+    The principal rises by 37 from one Note to the next.
+    """
+    return [
+        Note(
+            datetime.date(2014, 1, 1) + datetime.timedelta(days=n % dates),
+            Decimal(1000 + 37 * n), currencies[n % len(currencies)],
+            datetime.timedelta(days=360 * (1 + n % terms)),
+            interest + Decimal(n % rates) / 100,
+            datetime.timedelta(days=30 * (1 + n % periods)))
+        for n in range(size)]
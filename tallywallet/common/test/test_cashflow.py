@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+#   encoding: UTF-8
+
+# This file is part of tallywallet.
+#
+# Tallywallet is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Tallywallet is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with tallywallet.  If not, see <http://www.gnu.org/licenses/>.
+
+from decimal import Decimal
+import unittest
+
+from tallywallet.common.cashflow import BORROWER
+from tallywallet.common.cashflow import LENDER
+from tallywallet.common.cashflow import Posting
+from tallywallet.common.cashflow import bulk
+from tallywallet.common.cashflow import cashflows
+from tallywallet.common.cashflow import merge
+from tallywallet.common.cashflow import post
+from tallywallet.common.currency import Currency as Cy
+from tallywallet.common.finance import schedule
+from tallywallet.common.ledger import Ledger
+from tallywallet.common.ledger import Role
+from tallywallet.common.ledger import Status
+from tallywallet.common.test.helpers import book
+
+
+# Notes in two currencies, some with the same dates
+NOTES = dict(
+    dates=3, terms=4, rates=1, periods=1, interest=Decimal("0.05"),
+    currencies=(Cy.USD, Cy.GBP))
+
+
+class CashFlowTests(unittest.TestCase):
+
+    def test_merge_order(self):
+        notes = book(12, **NOTES)
+        rv = list(merge(notes))
+        self.assertEqual(
+            sum(len(list(schedule(i))) for i in notes), len(rv))
+        dates = [record.date for n, note, record in rv]
+        self.assertEqual(sorted(dates), dates)
+
+    def test_aggregate_totals(self):
+        notes = book(12, **NOTES)
+        flows = list(cashflows(notes))
+        keys = [(i.date, i.currency) for i in flows]
+        self.assertEqual(len(keys), len(set(keys)))
+        for currency in (Cy.USD, Cy.GBP):
+            self.assertEqual(
+                sum(i.payment for note in notes if note.currency is currency
+                    for i in schedule(note)),
+                sum(i.payment for i in flows if i.currency is currency))
+        self.assertEqual(
+            sum(len(list(schedule(i))) for i in notes),
+            sum(i.count for i in flows))
+        self.assertEqual((Cy.USD, 2), (flows[0].currency, flows[0].count))
+        self.assertEqual((Cy.GBP, 2), (flows[1].currency, flows[1].count))
+
+    def test_post_to_ledger(self):
+        notes = book(8, **NOTES)
+        ldgr = Ledger(ref=Cy.USD)
+        cash = ldgr.add_column("cash", Role.asset)
+        income = ldgr.add_column("income", Role.income)
+        loans = ldgr.add_column("loans", Role.asset)
+        capital = ldgr.add_column("capital", Role.capital)
+        lent = sum(i.principal for i in notes if i.currency is Cy.USD)
+        ldgr.commit(lent, loans)
+        ldgr.commit(lent, capital)
+
+        usd = (i for i in cashflows(notes) if i.currency is Cy.USD)
+        flows = list(post(ldgr, usd, cash, income, loans))
+        self.assertTrue(flows)
+        self.assertIs(Status.ok, ldgr.equation.status)
+        self.assertAlmostEqual(0, ldgr.value("loans"), places=10)
+        self.assertEqual(sum(i.interest for i in flows), ldgr.value("income"))
+
+    def test_post_by_currency(self):
+        ldgr = Ledger(ref=Cy.USD)
+        cols = {
+            c: [ldgr.add_column(
+                "{} {}".format(c.name, name), role, currency=c)
+                for name, role in (
+                    ("cash", Role.asset), ("income", Role.income),
+                    ("loans", Role.asset))]
+            for c in (Cy.USD, Cy.GBP)}
+        cash, income, loans = (
+            {c: v[n] for c, v in cols.items()} for n in range(3))
+        flows = cashflows(book(4, **NOTES))
+        for flow in post(ldgr, flows, cash, income, loans):
+            pass
+        self.assertGreater(ldgr.value("GBP cash"), 0)
+        self.assertLess(ldgr.value("GBP loans"), 0)
+        self.assertGreater(ldgr.value("USD income"), 0)
+
+
+class BulkPostingTests(unittest.TestCase):
+
+    def setUp(self):
+        self.ldgr = Ledger(ref=Cy.USD)
+        self.cols = {
+            name: self.ldgr.add_column(name, role)
+            for name, role in (
+                ("cash", Role.asset), ("income", Role.income),
+                ("loans", Role.asset), ("capital", Role.capital),
+                ("expense", Role.expense), ("debt", Role.liability))}
+
+    def test_lender_batches_by_date(self):
+        notes = [i for i in book(12, **NOTES) if i.currency is Cy.USD]
+        lent = sum(i.principal for i in notes)
+        self.ldgr.commit(lent, self.cols["loans"])
+        self.ldgr.commit(lent, self.cols["capital"])
+
+        rv = list(bulk(self.ldgr, merge(notes), self.cols))
+        self.assertEqual(
+            len(set(r.date for i in notes for r in schedule(i))), len(rv))
+        self.assertEqual(
+            sum(len(list(schedule(i))) for i in notes),
+            sum(i.count for i in rv))
+        self.assertIs(Status.ok, self.ldgr.equation.status)
+        self.assertAlmostEqual(0, self.ldgr.value("loans"), places=10)
+
+        ldgr = Ledger(ref=Cy.USD)
+        cash, income, loans = (
+            ldgr.add_column(i, Role.asset)
+            for i in ("cash", "income", "loans"))
+        list(post(ldgr, cashflows(notes), cash, income, loans))
+        self.assertEqual(ldgr.value("cash"), self.ldgr.value("cash"))
+        self.assertEqual(ldgr.value("income"), self.ldgr.value("income"))
+
+    def test_batch_size(self):
+        notes = [i._replace(currency=Cy.USD) for i in book(8, **NOTES)]
+        rv = list(bulk(self.ldgr, merge(notes), self.cols, size=3))
+        self.assertTrue(all(0 < i.count <= 3 for i in rv))
+        self.assertEqual(
+            sum(len(list(schedule(i))) for i in notes),
+            sum(i.count for i in rv))
+
+    def test_borrower(self):
+        notes = [i._replace(currency=Cy.USD) for i in book(4, **NOTES)]
+        cols = dict(self.cols, loans=self.cols["debt"])
+        borrowed = sum(i.principal for i in notes)
+        self.ldgr.commit(borrowed, self.cols["cash"])
+        self.ldgr.commit(borrowed, self.cols["debt"])
+        for batch in bulk(self.ldgr, merge(notes), cols, rules=BORROWER):
+            self.assertIs(Status.ok, self.ldgr.equation.status)
+        self.assertAlmostEqual(0, self.ldgr.value("debt"), places=10)
+        self.assertGreater(self.ldgr.value("expense"), 0)
+
+    def test_unbalanced_rules(self):
+        rules = LENDER[:2] + (Posting("repaid", 1, "loans"),)
+        stream = merge(book(2, **NOTES))
+        self.assertRaises(
+            ValueError, list, bulk(self.ldgr, stream, self.cols, rules))
+        self.assertEqual(0, self.ldgr.value("cash"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+#   encoding: UTF-8
+
+# This file is part of tallywallet.
+#
+# Tallywallet is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Tallywallet is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with tallywallet.  If not, see <http://www.gnu.org/licenses/>.
+
+from decimal import Decimal as Dl
+import itertools
+import unittest
+import unittest.mock
+
+from tallywallet.common.consistency import consistent
+from tallywallet.common.consistency import inconsistencies
+from tallywallet.common.consistency import residuals
+from tallywallet.common.currency import Currency as Cy
+from tallywallet.common.exchange import Exchange
+
+
+class ConsistencyTests(unittest.TestCase):
+
+    def test_consistent_triangle(self):
+        exchange = Exchange({
+            (Cy.USD, Cy.CAD): Dl("1.2"),
+            (Cy.GBP, Cy.USD): Dl("1.5"),
+            (Cy.GBP, Cy.CAD): Dl("1.8"),
+            (Cy.CAD, Cy.CAD): Dl(1),
+        })
+        self.assertTrue(consistent(exchange))
+
+    def test_inconsistent_triangle(self):
+        exchange = Exchange({
+            (Cy.USD, Cy.CAD): Dl("1.2"),
+            (Cy.GBP, Cy.USD): Dl("1.5"),
+            (Cy.GBP, Cy.CAD): Dl("1.9"),
+        })
+        rv = list(inconsistencies(exchange))
+        self.assertEqual(1, len(rv))
+        pair, cycle, product = rv[0]
+        self.assertEqual((Cy.GBP, Cy.CAD), pair)
+        self.assertEqual(cycle[0], cycle[-1])
+        self.assertEqual(4, len(cycle))
+        self.assertAlmostEqual(1.9 / 1.8, product)
+
+        # Trading round the cycle in the reported direction is a gain
+        val = Dl(1)
+        for rcv, out in zip(cycle, cycle[1:]):
+            val *= exchange.get((rcv, out))
+        self.assertGreater(val, 1)
+
+    def test_asymmetric_quotes(self):
+        exchange = Exchange({
+            (Cy.GBP, Cy.USD): Dl(2),
+            (Cy.USD, Cy.GBP): Dl("0.4"),
+        })
+        rv = list(inconsistencies(exchange))
+        self.assertEqual(1, len(rv))
+        self.assertAlmostEqual(1.25, rv[0].product)
+        self.assertEqual(3, len(rv[0].cycle))
+
+    def test_self_rate(self):
+        exchange = Exchange({(Cy.GBP, Cy.GBP): Dl("1.01")})
+        rv = list(inconsistencies(exchange))
+        self.assertEqual([(Cy.GBP, Cy.GBP)], [i.pair for i in rv])
+
+    def test_rate_not_positive(self):
+        for rate in (Dl(0), Dl("-1.2")):
+            with self.subTest(rate=rate):
+                exchange = Exchange({
+                    (Cy.USD, Cy.CAD): Dl("1.2"),
+                    (Cy.GBP, Cy.USD): rate,
+                })
+                with self.assertRaisesRegex(ValueError, "GBP/USD"):
+                    consistent(exchange)
+
+    def test_tolerance(self):
+        exchange = Exchange({
+            (Cy.USD, Cy.CAD): Dl("1.2"),
+            (Cy.GBP, Cy.USD): Dl("1.5"),
+            (Cy.GBP, Cy.CAD): Dl("1.8001"),
+        })
+        self.assertFalse(consistent(exchange))
+        self.assertTrue(consistent(exchange, tolerance=1E-3))
+
+    def test_full_currency_set(self):
+        codes = ["C{:03d}".format(i) for i in range(180)]
+        values = {c: Dl(n + 1) for n, c in enumerate(codes)}
+        exchange = Exchange(
+            ((a, b), values[b] / values[a])
+            for a, b in itertools.combinations(codes, 2))
+        exchange[(codes[7], codes[90])] *= Dl("1.001")
+
+        with unittest.mock.patch(
+            "tallywallet.common.consistency.residuals", wraps=residuals
+        ) as passes:
+            rv = list(inconsistencies(exchange))
+        self.assertEqual(1, passes.call_count)
+        self.assertTrue(rv)
+        self.assertTrue(all(
+            codes[7] in i.cycle and codes[90] in i.cycle for i in rv))
+
+    def test_bad_tree_edge(self):
+        codes = ["C{:03d}".format(i) for i in range(20)]
+        values = {c: Dl(n + 1) for n, c in enumerate(codes)}
+        exchange = Exchange(
+            ((a, b), values[b] / values[a])
+            for a, b in itertools.combinations(codes, 2))
+        exchange[(codes[0], codes[5])] *= Dl("1.01")
+
+        rv = list(inconsistencies(exchange))
+        self.assertEqual([(codes[0], codes[5])], [i.pair for i in rv])
+        self.assertEqual(rv[0].cycle[0], rv[0].cycle[-1])
+        self.assertAlmostEqual(1.01, rv[0].product)
+
+    def test_bad_tree_edge_full_set(self):
+        codes = ["C{:03d}".format(i) for i in range(180)]
+        values = {c: Dl(n + 1) for n, c in enumerate(codes)}
+        exchange = Exchange(
+            ((a, b), values[b] / values[a])
+            for a, b in itertools.combinations(codes, 2))
+        exchange[(codes[0], codes[90])] *= Dl("1.001")
+
+        with unittest.mock.patch(
+            "tallywallet.common.consistency.residuals", wraps=residuals
+        ) as passes:
+            rv = list(inconsistencies(exchange))
+        self.assertEqual(2, passes.call_count)
+        self.assertEqual([(codes[0], codes[90])], [i.pair for i in rv])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+#   encoding: UTF-8
+
+# This file is part of tallywallet.
+#
+# Tallywallet is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Tallywallet is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with tallywallet.  If not, see <http://www.gnu.org/licenses/>.
+
+from decimal import Decimal as Dl
+import unittest
+
+from tallywallet.common.currency import Currency as Cy
+from tallywallet.common.currency import ISO4217
+from tallywallet.common.currency import Registry
+from tallywallet.common.currency import lookup
+from tallywallet.common.currency import minor_units
+from tallywallet.common.currency import registry
+from tallywallet.common.exchange import Exchange
+from tallywallet.common.ledger import Column
+from tallywallet.common.ledger import Ledger
+from tallywallet.common.ledger import Role
+from tallywallet.common.ledger import Status
+
+
+class RegistryTests(unittest.TestCase):
+
+    def test_lookup_by_code(self):
+        self.assertEqual(ISO4217("EUR", 978, 2), lookup("EUR"))
+        self.assertIs(lookup("eur"), lookup("EUR"))
+
+    def test_lookup_by_number(self):
+        self.assertIs(lookup("JPY"), lookup(392))
+        self.assertIs(lookup("AUD"), lookup("036"))
+
+    def test_lookup_by_enum(self):
+        for c in (Cy.CAD, Cy.USD, Cy.GBP):
+            self.assertEqual(c.name, lookup(c).name)
+        self.assertRaises(KeyError, lookup, Cy.XTW)
+
+    def test_minor_units(self):
+        self.assertEqual(2, minor_units("USD"))
+        self.assertEqual(0, minor_units("JPY"))
+        self.assertEqual(3, minor_units("KWD"))
+        self.assertEqual(4, minor_units("CLF"))
+        self.assertIsNone(minor_units("XAU"))
+
+    def test_unique_codes(self):
+        reg = registry()
+        self.assertIs(reg, registry())
+        self.assertGreater(len(reg), 150)
+        self.assertEqual(len(reg), len(set(i.value for i in reg)))
+        self.assertTrue(all(len(i.name) == 3 for i in reg))
+
+    def test_unknown_code(self):
+        self.assertNotIn("ZZZ", registry())
+        self.assertRaises(KeyError, lookup, "ZZZ")
+
+    def test_unknown_type(self):
+        for key in (3.0, None, ("GBP",)):
+            with self.subTest(key=key):
+                self.assertNotIn(key, registry())
+                self.assertRaises(KeyError, lookup, key)
+
+    def test_custom_table(self):
+        reg = Registry("XTW0011 XTS963-")
+        self.assertEqual(2, len(reg))
+        self.assertEqual(1, reg["XTW"].value)
+
+    def test_ledger_columns(self):
+        chf = lookup("CHF")
+        jpy = lookup("JPY")
+        ldgr = Ledger(
+            Column("Swiss cash", chf, Role.asset, "{}"),
+            Column("Yen cash", jpy, Role.asset, "{}"),
+            Column("Capital", chf, Role.capital, "{}"),
+            ref=chf)
+        cols = ldgr.columns
+        self.assertIn("JPY trading account", cols)
+        for args in ldgr.adjustments(Exchange({(jpy, chf): Dl("0.006")})):
+            ldgr.commit(*args)
+        ldgr.commit(Dl(100), cols["Swiss cash"])
+        ldgr.commit(Dl(10000), cols["Yen cash"])
+        ldgr.commit(Dl(160), cols["Capital"])
+        self.assertIs(Status.ok, ldgr.equation.status)
+
+
+if __name__ == "__main__":
+    unittest.main()
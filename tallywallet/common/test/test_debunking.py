@@ -16,14 +16,26 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with tallywallet.  If not, see <http://www.gnu.org/licenses/>.
 
+from collections import OrderedDict
 from decimal import Decimal
 from decimal import ROUND_UP
+from fractions import Fraction
+import inspect
+import os
+import tempfile
 import unittest
 import unittest as functest
+import unittest.mock
+import warnings
 
 from tallywallet.common.currency import Currency as Cy
 from tallywallet.common.debunking import *
+from tallywallet.common.debunking import kernels
+from tallywallet.common.debunking import load
+from tallywallet.common.debunking import operations
+from tallywallet.common.debunking import parser
 from tallywallet.common.exchange import Exchange
+from tallywallet.common.flow import Plan
 from tallywallet.common.ledger import Column
 from tallywallet.common.ledger import Ledger
 from tallywallet.common.ledger import Role
@@ -119,6 +131,426 @@ class DebunkingTests(unittest.TestCase):
         self.assertEqual(-val, self.ldgr.value("firms"))
         self.assertEqual(val, self.ldgr.value("vault"))
 
+    def test_parameters(self):
+        rv = OrderedDict(
+            ("{}.{}".format(op.__name__, arg.name), arg.default)
+            for op in operations
+            for arg in inspect.signature(op).parameters.values()
+            if arg.default is not arg.empty)
+        self.assertEqual(list(rv.items()), list(parameters.items()))
+
+
+class KernelTests(unittest.TestCase):
+
+    def run_simulation(self, samples, interval, number=None):
+        return list(simulate(list(samples), interval=interval, number=number))
+
+    def test_transition(self):
+        ldgr = Ledger(*columns.values(), ref=Cy.USD)
+        banking_licence(ldgr, INITIAL)
+        bank_loan(ldgr, YEAR)
+        state = [ldgr.value(i) for i in columns]
+        cycle(ldgr, DAY)
+
+        matrix = transition(DAY)
+        self.assertEqual(len(columns), len(matrix))
+        rv = [sum(a * b for a, b in zip(row, state)) for row in matrix]
+        for key, val in zip(columns, rv):
+            self.assertAlmostEqual(ldgr.value(key), val, places=12)
+
+        for number in (float, Fraction):
+            matrix = transition(DAY, number)
+            self.assertTrue(
+                all(isinstance(i, number) for row in matrix for i in row))
+
+    def test_same_journals(self):
+        samples = [WEEK * i for i in range(0, 53, 13)]
+        expected = self.run_simulation(samples, DAY)
+        for number in (Decimal, float):
+            with self.subTest(number=number):
+                self.assertEqual(
+                    expected, self.run_simulation(samples, DAY, number))
+
+    def test_exact_kernel(self):
+        samples = [DAY, WEEK]
+        self.assertEqual(
+            self.run_simulation(samples, DAY),
+            self.run_simulation(samples, DAY, Fraction))
+
+    def test_power(self):
+        matrix = transition(DAY, Fraction)
+        rv = power(matrix, 0)
+        self.assertEqual(multiply(rv, matrix), matrix)
+        rv = matrix
+        for n in range(1, 6):
+            self.assertEqual(rv, power(matrix, n))
+            rv = multiply(rv, matrix)
+
+    def test_jump(self):
+        samples = [WEEK * i for i in range(0, 53, 13)]
+        expected = self.run_simulation(samples, DAY)
+        for number in (Decimal, float):
+            with self.subTest(number=number):
+                self.assertEqual(expected, list(simulate(
+                    list(samples), interval=DAY, number=number, jump=True)))
+
+        samples = [0, 1, DAY, DAY + 1, WEEK + DAY // 2]
+        self.assertEqual(
+            self.run_simulation(samples, DAY, Fraction),
+            list(simulate(samples, interval=DAY, number=Fraction, jump=True)))
+        self.assertEqual(5, len(samples))
+
+    def test_options(self):
+        samples = [DAY, WEEK, 2 * WEEK]
+        expected = self.run_simulation(samples, DAY, float)
+        options = Options(number=float, jump=True)
+        self.assertEqual(expected, list(simulate(
+            list(samples), interval=DAY, options=options)))
+        self.assertEqual(
+            self.run_simulation(samples, DAY, Fraction),
+            list(simulate(
+                list(samples), interval=DAY, options=options,
+                number=Fraction)))
+        self.assertRaises(
+            ValueError, list, simulate(samples, interval=DAY, speed=2))
+
+    def test_parser(self):
+        args = parser().parse_args(["--checkpoint", "sim.chk", "--resume"])
+        self.assertEqual(("sim.chk", True), (args.checkpoint, args.resume))
+        args = parser().parse_args(["--kernel", "float", "--jump"])
+        self.assertTrue(args.jump)
+        self.assertEqual({"number": float}, kernels[args.kernel])
+        args = parser().parse_args([])
+        self.assertEqual({}, kernels[args.kernel])
+        self.assertNotIn("fraction", kernels)
+        self.assertEqual((None, None), (args.profile, args.timings))
+        args = parser().parse_args(["--timings", "--profile", "sim.prof"])
+        self.assertEqual(("sim.prof", ""), (args.profile, args.timings))
+
+
+class Interrupted(Exception):
+    pass
+
+
+class FragileLedger(Ledger):
+    """
+    A Ledger which fails after its equation has been checked a number
+    of times.
+    """
+
+    def __init__(self, *args, limit, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.limit = limit
+
+    @property
+    def equation(self):
+        self.limit -= 1
+        if self.limit < 0:
+            raise Interrupted
+        return super().equation
+
+
+class CheckpointTests(unittest.TestCase):
+
+    samples = [DAY * i for i in range(0, 61, 10)]
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "debunking.chk")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def resume(self, **kwargs):
+        return list(simulate(
+            self.samples, interval=DAY, checkpoint=self.path, resume=True,
+            **kwargs))
+
+    def test_resume_after_sample(self):
+        for kwargs in (
+            {}, {"plan": True}, {"number": Decimal}, {"number": float},
+            {"number": Fraction, "jump": True}, {"jump": True},
+        ):
+            with self.subTest(**kwargs):
+                expected = list(
+                    simulate(list(self.samples), interval=DAY, **kwargs))
+                sim = simulate(
+                    list(self.samples), interval=DAY, checkpoint=self.path,
+                    every=3, **kwargs)
+                output = [next(sim) for i in range(5)]
+                sim.close()
+                self.assertEqual(
+                    "".join(expected), "".join(output + self.resume(**kwargs)))
+
+    def test_resume_between_samples(self):
+        expected = "".join(simulate(list(self.samples), interval=DAY))
+        ldgr = FragileLedger(*columns.values(), ref=Cy.USD, limit=27)
+        output = []
+        try:
+            for msg in simulate(
+                list(self.samples), interval=DAY, ledger=ldgr,
+                checkpoint=self.path, every=5
+            ):
+                output.append(msg)
+        except Interrupted:
+            pass
+        self.assertEqual(25, load(self.path)["tick"])
+        self.assertEqual(expected, "".join(output + self.resume()))
+
+    def test_checkpoint_format(self):
+        for msg in simulate(
+            list(self.samples[:2]), interval=DAY, checkpoint=self.path,
+            number=Fraction
+        ):
+            pass
+        rv = load(self.path)
+        self.assertEqual([], rv["ticks"])
+        self.assertIsInstance(rv["ledger"][0][1], str)
+        self.assertTrue(all("/" in i for i in rv["state"][1:3]))
+        self.assertEqual("Fraction", rv["settings"]["number"])
+
+    def test_settings_must_match(self):
+        for msg in simulate(
+            list(self.samples[:2]), interval=DAY, checkpoint=self.path
+        ):
+            pass
+        sim = simulate(
+            [], interval=HOUR, checkpoint=self.path, resume=True)
+        self.assertRaises(ValueError, list, sim)
+
+    def test_resume_without_checkpoint(self):
+        self.assertIsNone(load(self.path))
+        self.assertEqual(
+            list(simulate(list(self.samples), interval=DAY)),
+            list(simulate(
+                list(self.samples), interval=DAY, checkpoint=self.path,
+                resume=True)))
+        self.assertTrue(os.path.isfile(self.path))
+
+
+class CountingLedger(Ledger):
+
+    checks = 0
+
+    @property
+    def equation(self):
+        self.checks += 1
+        return super().equation
+
+
+class SkewedLedger(Ledger):
+
+    threshold = Decimal(1E6)
+
+    def commit(self, trade, col, exchange=None, **kwargs):
+        rv = super().commit(trade, col, exchange, **kwargs)
+        if col.ref == "workers" and self.value("workers") > self.threshold:
+            super().commit(1, columns["safe"])
+        return rv
+
+
+class BalanceCheckTests(unittest.TestCase):
+
+    samples = [DAY * i for i in range(0, 201, 50)]
+    threshold = Decimal(1E6)
+
+    def firms_wages(self, ldgr, dt, **kwargs):
+        rv = firms_wages(ldgr, dt, **kwargs)
+        if ldgr.value("workers") > self.threshold:
+            ldgr.commit(1, columns["safe"])
+        return rv
+
+    def test_check_cadence(self):
+        for check, expected in ((1, 200), (7, 33), (0, 5)):
+            with self.subTest(check=check):
+                ldgr = CountingLedger(*columns.values(), ref=Cy.USD)
+                output = list(simulate(
+                    list(self.samples), interval=DAY, ledger=ldgr,
+                    check=check))
+                self.assertEqual(expected, ldgr.checks)
+                self.assertEqual(
+                    list(simulate(list(self.samples), interval=DAY)), output)
+
+    def test_bisect(self):
+        ldgr = Ledger(*columns.values(), ref=Cy.USD)
+        banking_licence(ldgr, INITIAL)
+        tick = 0
+        crossed = False
+        while not crossed:
+            tick += 1
+            for op in stepwise(ldgr, DAY):
+                crossed = crossed or (
+                    op == "firms_wages" and
+                    ldgr.value("workers") > self.threshold)
+        self.assertTrue(0 < tick < 200)
+        finals = []
+
+        with unittest.mock.patch(
+            "tallywallet.common.debunking.firms_wages", self.firms_wages
+        ):
+            for check in (1, 7, 0):
+                with self.subTest(check=check):
+                    ldgr = Ledger(*columns.values(), ref=Cy.USD)
+                    with warnings.catch_warnings(record=True) as caught:
+                        warnings.simplefilter("always")
+                        list(simulate(
+                            list(self.samples), interval=DAY, ledger=ldgr,
+                            check=check))
+                    self.assertIn(
+                        "timestep {} after firms_wages".format(tick),
+                        str(caught[0].message))
+                    self.assertFalse(
+                        any("after" in str(i.message) for i in caught[1:]))
+                    finals.append([ldgr.value(i) for i in ldgr.columns])
+        self.assertEqual(finals[0], finals[1])
+        self.assertEqual(finals[0], finals[2])
+
+    def test_bisect_plan(self):
+        plan = Plan(model, DAY)
+        ldgr = Ledger(*columns.values(), ref=Cy.USD)
+        banking_licence(ldgr, INITIAL)
+        tick = 0
+        while ldgr.value("workers") <= SkewedLedger.threshold:
+            tick += 1
+            plan.apply(ldgr)
+
+        ldgr = Ledger(*columns.values(), ref=Cy.USD)
+        banking_licence(ldgr, INITIAL)
+        for i in range(tick - 1):
+            plan.apply(ldgr)
+        stage = next(
+            name for name in plan.stepwise(ldgr)
+            if ldgr.value("workers") > SkewedLedger.threshold)
+
+        ldgr = SkewedLedger(*columns.values(), ref=Cy.USD)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            list(simulate(
+                list(self.samples), interval=DAY, ledger=ldgr, plan=True))
+        self.assertIn(
+            "timestep {} after {}".format(tick, stage),
+            str(caught[0].message))
+
+
+class SteadyStateTests(unittest.TestCase):
+
+    samples = [YEAR * i for i in range(0, 31, 2)]
+
+    @staticmethod
+    def balances(ldgr):
+        return [ldgr.value(i) for i in columns]
+
+    def trial(self, tolerance=None, **kwargs):
+        ldgr = Ledger(*columns.values(), ref=Cy.USD)
+        output = list(simulate(
+            list(self.samples), interval=DAY, ledger=ldgr,
+            tolerance=tolerance, **kwargs))
+        return output, self.balances(ldgr)
+
+    def test_off_by_default(self):
+        output, vals = self.trial(jump=True)
+        self.assertFalse(any("Steady" in i for i in output))
+
+    def test_fastforward(self):
+        for kwargs in ({}, {"number": float}, {"jump": True}):
+            with self.subTest(**kwargs):
+                output, expected = self.trial(**kwargs)
+                output, vals = self.trial(Decimal("1E-5"), **kwargs)
+                notes = [i for i in output if "Steady" in i]
+                self.assertEqual(1, len(notes))
+                saved = int(notes[0].split("timesteps saved")[0].split()[-1])
+                self.assertTrue(0 < saved < self.samples[-1] // DAY)
+                for val, ref in zip(vals, expected):
+                    self.assertAlmostEqual(
+                        0, float((val - ref) / max(ref, 1)), places=3)
+
+    def test_report_only(self):
+        expected, ref = self.trial(jump=True)
+        output, vals = self.trial(
+            Decimal("1E-5"), jump=True, fastforward=False)
+        self.assertEqual(
+            [i.quantize(Decimal("0.01")) for i in ref],
+            [i.quantize(Decimal("0.01")) for i in vals])
+        notes = [i for i in output if "Steady" in i]
+        self.assertEqual(1, len(notes))
+        self.assertIn("0 timesteps saved", notes[0])
+
+    def test_resume(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "debunking.chk")
+            expected = list(simulate(
+                list(self.samples), interval=DAY, jump=True,
+                tolerance="1E-5"))
+            for n in (3, len(expected) - 3):
+                with self.subTest(n=n):
+                    sim = simulate(
+                        list(self.samples), interval=DAY, jump=True,
+                        tolerance="1E-5", checkpoint=path, every=100)
+                    output = [next(sim) for i in range(n)]
+                    sim.close()
+                    output.extend(simulate(
+                        list(self.samples), interval=DAY, jump=True,
+                        tolerance="1E-5", checkpoint=path, every=100,
+                        resume=True))
+                    self.assertEqual(expected, output)
+
+
+class SteadyStateHourlyTests(unittest.TestCase):
+    """
+    Hourly timesteps over ten years, as run from the command line.
+    """
+
+    samples = [YEAR * i for i in range(0, 11)]
+
+    def trial(self, **kwargs):
+        ldgr = Ledger(*columns.values(), ref=Cy.USD)
+        output = list(simulate(
+            list(self.samples), interval=HOUR, ledger=ldgr, jump=True,
+            **kwargs))
+        return output, [ldgr.value(i) for i in columns]
+
+    def test_limit(self):
+        steady = limit(HOUR)
+        state = [Decimal(INITIAL), 0, Decimal(INITIAL), 0, 0, 0]
+        fixed = [sum(a * b for a, b in zip(row, state)) for row in steady]
+        self.assertEqual(fixed[0], fixed[2])
+        self.assertEqual(2 * INITIAL, round(sum(fixed)))
+        later = [sum(a * b for a, b in zip(row, fixed)) for row in steady]
+        self.assertEqual(
+            [i.quantize(Decimal("0.01")) for i in fixed],
+            [i.quantize(Decimal("0.01")) for i in later])
+
+    def test_not_yet_steady(self):
+        expected, ref = self.trial()
+        output, vals = self.trial(tolerance=Decimal("1E-5"))
+        self.assertFalse(any("Steady" in i for i in output))
+        self.assertEqual(
+            [i.quantize(Decimal("0.01")) for i in ref],
+            [i.quantize(Decimal("0.01")) for i in vals])
+
+    def test_suggested_tolerance(self):
+        args = parser().parse_args(["--steady", "0.1"])
+        output, vals = self.trial(tolerance=args.steady)
+        notes = [i for i in output if "Steady" in i]
+        self.assertEqual(1, len(notes))
+        ts = int(notes[0].split("Steady state at ")[1].split(".")[0])
+        self.assertTrue(6 * YEAR < ts < 8 * YEAR)
+
+    def test_within_tolerance(self):
+        expected, ref = self.trial()
+        bound = Decimal("0.05")
+        saved = []
+        for window in (24, 168):
+            with self.subTest(window=window):
+                output, vals = self.trial(tolerance=bound, window=window)
+                notes = [i for i in output if "Steady" in i]
+                self.assertEqual(1, len(notes))
+                saved.append(
+                    int(notes[0].split("timesteps saved")[0].split()[-1]))
+                for val, exact in zip(vals, ref):
+                    self.assertLessEqual(abs(val - exact), bound * exact)
+        self.assertLess(abs(saved[0] - saved[1]), 168)
+
 
 class SimulationTests(functest.TestCase):
     """
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+#   encoding: UTF-8
+
+# This file is part of tallywallet.
+#
+# Tallywallet is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Tallywallet is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with tallywallet.  If not, see <http://www.gnu.org/licenses/>.
+
+from collections import OrderedDict
+import random
+import tracemalloc
+import unittest
+import unittest.mock
+
+from tallywallet.common.debunking import DAY
+from tallywallet.common.debunking import WEEK
+from tallywallet.common.debunking import columns
+from tallywallet.common.debunking import simulate
+from tallywallet.common.debunking import transition
+from tallywallet.common.ensemble import P2
+from tallywallet.common.ensemble import draw
+from tallywallet.common.ensemble import ensemble
+from tallywallet.common.sampling import Arrays
+
+
+class P2Tests(unittest.TestCase):
+
+    def test_few_values_are_exact(self):
+        estimator = P2(0.5)
+        self.assertIsNone(estimator.value)
+        for x in (5, 1, 3):
+            estimator.add(x)
+        self.assertEqual(3, estimator.value)
+
+    def test_estimates(self):
+        rng = random.Random(1)
+        vals = [rng.expovariate(1) for i in range(10000)]
+        ordered = sorted(vals)
+        for p in (0.05, 0.5, 0.95):
+            estimator = P2(p)
+            for x in vals:
+                estimator.add(x)
+            exact = ordered[int(p * len(vals))]
+            self.assertAlmostEqual(exact, estimator.value, delta=0.05)
+            self.assertEqual(5, len(estimator.heights))
+
+
+class EnsembleTests(unittest.TestCase):
+
+    ranges = OrderedDict([
+        ("bank_loan.pa", (0.4, 0.6)), ("firms_wages.pa", (2.5, 3.5))])
+    samples = [WEEK * i for i in range(1, 5)]
+
+    def test_draw(self):
+        rv = draw(self.ranges, 0, 7)
+        self.assertEqual(rv, draw(self.ranges, 0, 7))
+        self.assertNotEqual(rv, draw(self.ranges, 0, 8))
+        self.assertNotEqual(rv, draw(self.ranges, 1, 7))
+        self.assertTrue(0.4 <= rv["bank_loan.pa"] <= 0.6)
+
+    def test_shape(self):
+        rv = ensemble(20, self.ranges, self.samples, interval=DAY)
+        self.assertEqual(len(self.samples) * len(columns), len(rv))
+        self.assertEqual(list(columns), [i.column for i in rv[:6]])
+        self.assertEqual(self.samples, sorted(set(i.ts for i in rv)))
+        for summary in rv:
+            lo, mid, hi = summary.percentiles.values()
+            self.assertLessEqual(lo, mid)
+            self.assertLessEqual(mid, hi)
+
+    def test_blocks_do_not_change_result(self):
+        self.assertEqual(
+            ensemble(30, self.ranges, self.samples, interval=DAY, block=7),
+            ensemble(30, self.ranges, self.samples, interval=DAY, block=64))
+
+    def test_matrix_shared_by_rates(self):
+        ranges = OrderedDict([("bank_loan.pa", (0.5, 0.5))])
+        with unittest.mock.patch(
+            "tallywallet.common.ensemble.transition", wraps=transition
+        ) as compiled:
+            ensemble(10, ranges, self.samples, interval=DAY, block=3)
+        self.assertEqual(1, compiled.call_count)
+
+    def test_memory_bounded(self):
+        peaks = []
+        for size in (100, 400):
+            tracemalloc.start()
+            ensemble(size, self.ranges, self.samples, interval=DAY, block=25)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        self.assertLess(peaks[1], 1.5 * peaks[0])
+
+    def test_fixed_rates(self):
+        ranges = OrderedDict([("bank_loan.pa", (0.5, 0.5))])
+        rv = ensemble(10, ranges, self.samples, interval=DAY, block=3)
+        arrays = Arrays()
+        list(simulate(self.samples, interval=DAY, sinks=[arrays]))
+        for summary in rv:
+            n = self.samples.index(summary.ts)
+            expected = float(arrays.values[summary.column][n])
+            self.assertAlmostEqual(expected, summary.mean, delta=1E-3)
+            for val in summary.percentiles.values():
+                self.assertAlmostEqual(expected, val, delta=1E-3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -16,12 +16,17 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with tallywallet.  If not, see <http://www.gnu.org/licenses/>.
 
+from collections import OrderedDict
 from decimal import Decimal as Dl
 import functools
+import pickle
+import threading
 import unittest
 
 from tallywallet.common.currency import Currency as Cy
 from tallywallet.common.exchange import Exchange
+from tallywallet.common.exchange import PlanCache
+from tallywallet.common.exchange import plans
 from tallywallet.common.trade import TradeGain
 from tallywallet.common.trade import TradePath
 
@@ -96,5 +101,82 @@ class ExchangeTests(unittest.TestCase):
         self.assertEqual(10, val)
 
 
+class PlanCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        plans.clear()
+
+    def test_version_changes_on_update(self):
+        exchng = Exchange({(Cy.GBP, Cy.USD): Dl(2)})
+        versions = {exchng.version}
+        exchng[(Cy.GBP, Cy.USD)] = Dl(3)
+        versions.add(exchng.version)
+        exchng.update({(Cy.CAD, Cy.USD): Dl("0.8")})
+        versions.add(exchng.version)
+        exchng.pop((Cy.CAD, Cy.USD))
+        versions.add(exchng.version)
+        self.assertEqual(4, len(versions))
+        self.assertNotEqual(exchng.version, Exchange(exchng).version)
+
+    def test_repeated_conversion_hits(self):
+        exchng = Exchange({(Cy.GBP, Cy.USD): Dl(2)})
+        path = TradePath(Cy.GBP, Cy.GBP, Cy.USD)
+        for n in range(10):
+            self.assertEqual(20, exchng.convert(10, path))
+        self.assertEqual(1, plans.misses)
+        self.assertEqual(9, plans.hits)
+
+    def test_stale_rate_not_used(self):
+        exchng = Exchange({(Cy.GBP, Cy.USD): Dl(2)})
+        path = TradePath(Cy.USD, Cy.GBP, Cy.GBP)
+        self.assertEqual(Dl("0.5"), exchng.rate(path))
+        exchng[(Cy.GBP, Cy.USD)] = Dl(4)
+        self.assertEqual(Dl("0.25"), exchng.rate(path))
+        self.assertEqual(2, plans.misses)
+
+    def test_pickled_exchange_takes_new_version(self):
+        exchng = Exchange({(Cy.GBP, Cy.USD): Dl(2)})
+        copy = pickle.loads(pickle.dumps(exchng))
+        self.assertEqual(exchng, copy)
+        self.assertIsInstance(copy, Exchange)
+        self.assertNotEqual(exchng.version, copy.version)
+
+    def test_bounded_size(self):
+        cache = PlanCache(maxsize=2)
+        exchng = Exchange({(Cy.GBP, Cy.USD): Dl(2)})
+        for c in (Cy.GBP, Cy.USD, Cy.GBP, Cy.CAD):
+            try:
+                cache.rate(exchng, TradePath(c, Cy.GBP, Cy.USD))
+            except KeyError:
+                pass
+        hits, misses, maxsize, currsize = cache.info()
+        self.assertEqual(1, hits)
+        self.assertEqual(3, misses)
+        self.assertEqual(2, currsize)
+
+    def test_eviction_during_hit(self):
+        cache = PlanCache(maxsize=1)
+        exchng = Exchange({(Cy.GBP, Cy.USD): Dl(2)})
+        path = TradePath(Cy.GBP, Cy.GBP, Cy.USD)
+        other = TradePath(Cy.USD, Cy.GBP, Cy.GBP)
+        cache.rate(exchng, path)
+        rival = threading.Thread(target=cache.rate, args=(exchng, other))
+
+        class Plans(OrderedDict):
+
+            def __getitem__(self, key):
+                rv = super().__getitem__(key)
+                if rival.ident is None:
+                    rival.start()
+                    rival.join(timeout=0.1)
+                return rv
+
+        cache._plans = Plans(cache._plans)
+        self.assertEqual(2, cache.rate(exchng, path))
+        rival.join()
+        hits, misses, maxsize, currsize = cache.info()
+        self.assertEqual((1, 2, 1), (hits, misses, currsize))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -23,10 +23,21 @@ import unittest
 
 from tallywallet.common.finance import Amortization
 from tallywallet.common.finance import Note
+from tallywallet.common.finance import amortization_at
+from tallywallet.common.finance import balance_at
+from tallywallet.common.finance import compound
 from tallywallet.common.finance import discount_simple
+from tallywallet.common.finance import interest_to
+from tallywallet.common.finance import irr
+from tallywallet.common.finance import map_yields
+from tallywallet.common.finance import payoff
 from tallywallet.common.finance import schedule
+from tallywallet.common.finance import schedule_variable
+from tallywallet.common.finance import value_at
 from tallywallet.common.finance import value_series
 from tallywallet.common.finance import value_simple
+from tallywallet.common.finance import yield_to_maturity
+from tallywallet.common.test.helpers import book
 
 class AmortizationTests(unittest.TestCase):
 
@@ -85,6 +96,231 @@ class AmortizationTests(unittest.TestCase):
         self.assertEqual(0, record[-1].balance)
 
 
+class RandomAccessTests(unittest.TestCase):
+
+    def setUp(self):
+        self.loan = Note(
+            datetime.date(2014, 1, 1), 6000, "USD",
+            datetime.timedelta(days=360*3),
+            Decimal("0.16"), datetime.timedelta(days=180))
+
+    def test_amortization_at(self):
+        for places in (0, 2):
+            record = list(schedule(self.loan, places=places))
+            for k, row in enumerate(record, start=1):
+                rv = amortization_at(self.loan, k, places=places)
+                self.assertEqual(row.date, rv.date)
+                for a, b in zip(row[1:], rv[1:]):
+                    self.assertAlmostEqual(a, b, places=18)
+
+    def test_balance_and_interest_at(self):
+        record = list(schedule(self.loan, places=0))
+        self.assertEqual(6000, balance_at(self.loan, 0))
+        self.assertEqual(0, interest_to(self.loan, 0))
+        paid = 0
+        for k, row in enumerate(record, start=1):
+            paid += row.interest
+            self.assertAlmostEqual(
+                row.balance, balance_at(self.loan, k, places=0), places=18)
+            self.assertAlmostEqual(
+                paid, interest_to(self.loan, k, places=0), places=18)
+        self.assertEqual(
+            Decimal("1787.21"),
+            interest_to(self.loan, 6, places=0).quantize(Decimal("0.01")))
+
+    def test_access_by_date(self):
+        record = list(schedule(self.loan))
+        when = record[2].date + datetime.timedelta(days=10)
+        self.assertAlmostEqual(
+            record[2].balance, balance_at(self.loan, when), places=18)
+        self.assertEqual(record[2].date, amortization_at(self.loan, when).date)
+        self.assertRaises(
+            ValueError, amortization_at, self.loan, self.loan.date)
+
+    def test_early_payoff(self):
+        # A term which is not a whole number of periods adds one more
+        # payment to the schedule. The loan is cleared before it.
+        loan = self.loan._replace(term=datetime.timedelta(days=360*3 + 10))
+        record = list(schedule(loan))
+        self.assertEqual(7, len(record))
+        self.assertEqual(0, record[-2].balance)
+        self.assertEqual(6, payoff(loan))
+        self.assertEqual(0, balance_at(loan, 7))
+        self.assertEqual(record[-1], amortization_at(loan, 7))
+        self.assertAlmostEqual(
+            sum(i.interest for i in record), interest_to(loan, 7), places=18)
+
+
+class VariableRateTests(unittest.TestCase):
+
+    def setUp(self):
+        self.loan = Note(
+            datetime.date(2014, 1, 1), Decimal(100000), "USD",
+            datetime.timedelta(days=360*30),
+            Decimal("0.05"), datetime.timedelta(days=30))
+
+    def test_no_resets(self):
+        self.assertEqual(
+            list(schedule(self.loan)),
+            list(schedule_variable(self.loan, [])))
+        same = [(self.loan.date, self.loan.interest)]
+        self.assertEqual(
+            list(schedule(self.loan)),
+            list(schedule_variable(self.loan, same)))
+
+    def test_reset_reamortizes_balance(self):
+        when = self.loan.date + 120 * self.loan.period
+        rv = list(schedule_variable(self.loan, [(when, Decimal("0.07"))]))
+        before = list(schedule(self.loan))[:120]
+        self.assertEqual(before, rv[:120])
+
+        rest = Note(
+            when, before[-1].balance, "USD", 240 * self.loan.period,
+            Decimal("0.07"), self.loan.period)
+        self.assertEqual(list(schedule(rest)), rv[120:])
+        self.assertGreater(rv[120].payment, rv[119].payment)
+
+    def test_reset_between_payments(self):
+        # A reset takes effect from the start of the next period
+        when = self.loan.date + 12 * self.loan.period
+        early = when - datetime.timedelta(days=10)
+        a = list(schedule_variable(self.loan, [(early, Decimal("0.06"))]))
+        b = list(schedule_variable(self.loan, [(when, Decimal("0.06"))]))
+        self.assertEqual(a, b)
+
+    def test_reset_to_zero_rate(self):
+        when = self.loan.date + 120 * self.loan.period
+        rv = list(schedule_variable(self.loan, [(when, Decimal(0))]))
+        balance = rv[119].balance
+        payment = (balance / 240).quantize(
+            Decimal("0.01"), rounding=decimal.ROUND_UP)
+        self.assertEqual(payment, rv[120].payment)
+        self.assertTrue(all(i.interest == 0 for i in rv[120:]))
+        self.assertEqual(0, rv[-1].balance)
+
+    def test_monthly_resets_are_lazy(self):
+        def series():
+            ts = self.loan.date
+            n = 0
+            while True:
+                yield (ts, Decimal("0.04") + Decimal(n % 12) / 1000)
+                ts += self.loan.period
+                n += 1
+
+        rv = list(schedule_variable(self.loan, series()))
+        self.assertEqual(360, len(rv))
+        self.assertEqual(0, rv[-1].balance)
+        self.assertEqual(
+            [r.date for r in schedule(self.loan)], [r.date for r in rv])
+
+
+class FactorCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        compound.cache_clear()
+
+    def test_repeated_terms(self):
+        notes = book(100, dates=1, terms=4, rates=4, periods=4)
+        for note in notes:
+            discount_simple(note)
+        hits, misses, maxsize, currsize = compound.cache_info()
+        self.assertEqual(4, misses)
+        self.assertEqual(96, hits)
+
+    def test_context_is_part_of_key(self):
+        note = book(1)[0]
+        R = discount_simple(note)[2]
+        with decimal.localcontext() as ctx:
+            ctx.prec = 6
+            self.assertNotEqual(R, discount_simple(note)[2])
+        self.assertEqual(R, discount_simple(note)[2])
+        self.assertEqual(2, compound.cache_info().misses)
+
+    def test_spelling_is_part_of_key(self):
+        year = datetime.timedelta(days=360)
+        a = compound(Decimal("0.05"), year, year, 1)
+        b = compound(Decimal("0.050"), year, year, 1)
+        self.assertEqual(a, b)
+        self.assertNotEqual(str(a[0]), str(b[0]))
+
+    def test_cache_is_bounded(self):
+        year = datetime.timedelta(days=360)
+        maxsize = compound.cache_info().maxsize
+        for n in range(maxsize + 100):
+            compound(Decimal(n) / 1000, year, year, 1)
+        compound(Decimal(maxsize + 99) / 1000, year, year, 1)
+        compound(Decimal(0), year, year, 1)
+        hits, misses, maxsize, currsize = compound.cache_info()
+        self.assertEqual(1, hits)
+        self.assertEqual(maxsize + 101, misses)
+        self.assertEqual(maxsize, currsize)
+
+
+class YieldTests(unittest.TestCase):
+
+    def setUp(self):
+        self.loan = Note(
+            datetime.date(2014, 1, 1), 6000, "USD",
+            datetime.timedelta(days=360*3),
+            Decimal("0.16"), datetime.timedelta(days=180))
+
+    def test_irr_single_period(self):
+        rv = irr([(0, -100), (1, 110)])
+        self.assertTrue(rv.converged)
+        self.assertEqual(Decimal("0.1"), rv.rate)
+
+    def test_irr_bracket_expansion(self):
+        rv = irr([(0, -100), (3, 1000)])
+        self.assertTrue(rv.converged)
+        self.assertAlmostEqual(
+            Decimal(10) ** (Decimal(1) / 3) - 1, rv.rate, places=20)
+
+    def test_irr_bisection_fallback(self):
+        # Newton's first step from a poor guess overshoots the bracket
+        rv = irr([(0, -100), (1, 10), (2, 110)], guess=Decimal("0.99"))
+        self.assertTrue(rv.converged)
+        self.assertGreater(rv.bisections, 0)
+        self.assertAlmostEqual(Decimal("0.1"), rv.rate, places=20)
+
+    def test_irr_root_near_minus_one(self):
+        rv = irr([(0, -100), (1, Decimal("0.5"))])
+        self.assertTrue(rv.converged)
+        self.assertAlmostEqual(Decimal("-0.995"), rv.rate, places=12)
+
+    def test_irr_without_root(self):
+        for flows in ([(0, -100)], [(0, -100), (1, -10)], [(0, 100)]):
+            with self.subTest(flows=flows):
+                rv = irr(flows)
+                self.assertFalse(rv.converged)
+                self.assertNotEqual(0, rv.residual)
+
+    def test_yield_at_par(self):
+        rv = yield_to_maturity(self.loan, 6000)
+        self.assertTrue(rv.converged)
+        self.assertAlmostEqual(self.loan.interest, rv.rate, places=20)
+
+    def test_yield_at_discount(self):
+        price = Decimal(5800)
+        rv = yield_to_maturity(self.loan, price)
+        flows = [(0, -price)] + [
+            (k, i.payment) for k, i in enumerate(schedule(self.loan), 1)]
+        check = irr(flows)
+        self.assertGreater(rv.rate, self.loan.interest)
+        self.assertAlmostEqual(2 * check.rate, rv.rate, places=20)
+        self.assertLess(rv.iterations, check.iterations + 2)
+
+    def test_map_yields(self):
+        notes = [
+            self.loan._replace(date=self.loan.date + datetime.timedelta(n))
+            for n in range(10)]
+        prices = [5800, 6000] * 5
+        rv = list(map_yields(notes, prices))
+        self.assertEqual(10, len(rv))
+        self.assertEqual(yield_to_maturity(self.loan, 5800), rv[0])
+        self.assertIs(rv[0], rv[2])
+        self.assertTrue(all(i.converged for i in rv))
+
+
 class TestCompoundInterest(unittest.TestCase):
 
     def test_value_series(self):
@@ -106,6 +342,23 @@ class TestCompoundInterest(unittest.TestCase):
                 for i in series]
         )
 
+    def test_value_at(self):
+        note = Note(
+            date=datetime.date(2012, 7, 30),
+            principal=1000,
+            currency=None,
+            term=datetime.timedelta(days=720),
+            interest=Decimal("0.12"),
+            period=datetime.timedelta(days=360)
+        )
+        series = list(value_series(m=2, **note._asdict()))
+        for k, (t, val) in enumerate(series, start=1):
+            self.assertAlmostEqual(
+                val, value_at(when=k, m=2, **note._asdict()), places=20)
+            self.assertAlmostEqual(
+                val, value_at(when=t, m=2, **note._asdict()), places=20)
+        self.assertEqual(1000, value_at(when=0, **note._asdict()))
+
 
 class TestPromissoryNote(unittest.TestCase):
 
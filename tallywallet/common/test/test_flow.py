@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+#   encoding: UTF-8
+
+# This file is part of tallywallet.
+#
+# Tallywallet is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Tallywallet is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with tallywallet.  If not, see <http://www.gnu.org/licenses/>.
+
+from collections import OrderedDict
+import decimal
+from decimal import Decimal
+import unittest
+
+from tallywallet.common.currency import Currency as Cy
+from tallywallet.common.debunking import DAY
+from tallywallet.common.debunking import HOUR
+from tallywallet.common.debunking import INITIAL
+from tallywallet.common.debunking import WEEK
+from tallywallet.common.debunking import YEAR
+from tallywallet.common.debunking import banking_licence
+from tallywallet.common.debunking import columns
+from tallywallet.common.debunking import cycle
+from tallywallet.common.debunking import model
+from tallywallet.common.debunking import settings
+from tallywallet.common.debunking import simulate
+from tallywallet.common.flow import Flow
+from tallywallet.common.flow import Model
+from tallywallet.common.flow import Plan
+from tallywallet.common.flow import validate
+from tallywallet.common.ledger import Column
+from tallywallet.common.ledger import Ledger
+from tallywallet.common.ledger import Role
+
+
+class CountingLedger(Ledger):
+
+    commits = 0
+
+    def commit(self, *args, **kwargs):
+        self.commits += 1
+        return super().commit(*args, **kwargs)
+
+
+class ValidationTests(unittest.TestCase):
+
+    def setUp(self):
+        self.columns = OrderedDict(
+            (i.ref, i) for i in (
+                Column("cash", Cy.USD, Role.asset, "{}"),
+                Column("debt", Cy.USD, Role.liability, "{}"),
+                Column("costs", Cy.USD, Role.expense, "{}")))
+
+    def model(self, *flows):
+        return Model(self.columns, [flows], YEAR, {"rate": Decimal("0.1")})
+
+    def test_valid(self):
+        rv = self.model(
+            Flow("interest", "debt", "rate", (("costs", 1), ("debt", 1))),
+            Flow("payment", "interest", 1, (("cash", -1), ("debt", -1))))
+        self.assertIs(rv, validate(rv))
+        self.assertIs(model, validate(model))
+
+    def test_unbalanced(self):
+        rv = self.model(
+            Flow("interest", "debt", "rate", (("costs", 1), ("debt", -1))))
+        self.assertRaises(ValueError, validate, rv)
+
+    def test_unknown_names(self):
+        for flow in (
+            Flow("interest", "loans", "rate", (("costs", 1), ("debt", 1))),
+            Flow("interest", "debt", "paX", (("costs", 1), ("debt", 1))),
+            Flow("interest", "debt", "rate", (("fees", 1), ("debt", 1))),
+            Flow("cash", "debt", "rate", (("costs", 1), ("debt", 1))),
+        ):
+            with self.subTest(flow=flow):
+                self.assertRaises(ValueError, validate, self.model(flow))
+
+    def test_source_must_come_first(self):
+        rv = self.model(
+            Flow("payment", "interest", 1, (("cash", -1), ("debt", -1))),
+            Flow("interest", "debt", "rate", (("costs", 1), ("debt", 1))))
+        self.assertRaises(ValueError, validate, rv)
+
+    def test_unknown_parameter(self):
+        self.assertRaises(KeyError, Plan, model, HOUR, {"bank_loan.paX": 1})
+
+
+class PlanTests(unittest.TestCase):
+
+    def ledger(self):
+        rv = Ledger(*columns.values(), ref=Cy.USD)
+        banking_licence(rv, INITIAL)
+        return rv
+
+    def test_step_matches_operations(self):
+        ldgr = self.ledger()
+        plan = Plan(model, DAY)
+        state = [ldgr.value(i) for i in columns]
+        for n in range(30):
+            state = plan.step(state)
+            cycle(ldgr, DAY)
+        for key, val in zip(columns, state):
+            self.assertAlmostEqual(ldgr.value(key), val, places=10)
+
+    def test_matrix_is_exact(self):
+        params = {"firms_wages.pa": "2.5"}
+        with decimal.localcontext() as ctx:
+            ctx.prec = decimal.MAX_PREC
+            ctx.traps[decimal.Inexact] = True
+            matrix = Plan(model, HOUR, params).matrix()
+            for j, key in enumerate(columns):
+                ldgr = Ledger(*columns.values(), ref=Cy.USD)
+                ldgr.commit(Decimal(1), columns[key])
+                cycle(ldgr, HOUR, settings(params))
+                self.assertEqual(
+                    [ldgr.value(i) for i in columns],
+                    [row[j] for row in matrix])
+
+    def test_stepwise(self):
+        plan = Plan(model, DAY)
+        ldgr = self.ledger()
+        expected = self.ledger()
+        for n in range(30):
+            names = list(plan.stepwise(ldgr))
+            plan.apply(expected)
+        self.assertEqual(
+            [", ".join(i.name for i in stage) for stage in model.stages],
+            names)
+        self.assertEqual("wages", names[4])
+        for key in columns:
+            self.assertEqual(expected.value(key), ldgr.value(key))
+
+    def test_plan_kernel(self):
+        samples = [WEEK * i for i in range(0, 53, 13)]
+        self.assertEqual(
+            list(simulate(list(samples), interval=DAY)),
+            list(simulate(list(samples), interval=DAY, plan=True)))
+
+    def test_plan_commits(self):
+        counts = []
+        for step in (lambda x: cycle(x, HOUR), Plan(model, HOUR).apply):
+            ldgr = CountingLedger(*columns.values(), ref=Cy.USD)
+            banking_licence(ldgr, INITIAL)
+            ldgr.commits = 0
+            for n in range(10):
+                step(ldgr)
+            counts.append(ldgr.commits)
+        ops, plan = counts
+        self.assertEqual(10 * sum(
+            len(flow.postings) for stage in model.stages for flow in stage),
+            ops)
+        self.assertLessEqual(plan, 10 * len(columns))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+#   encoding: UTF-8
+
+# This file is part of tallywallet.
+#
+# Tallywallet is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Tallywallet is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with tallywallet.  If not, see <http://www.gnu.org/licenses/>.
+
+import subprocess
+import sys
+import unittest
+
+import tallywallet.common
+
+# Modules of the standard library which are slow to import, and which
+# the package needs only for its command line or not at all.
+HEAVY = {"argparse", "fractions", "inspect"}
+
+# The cumulative import times (us) of modules, as recorded by
+# `-X importtime` on the machine where they were last measured. That of
+# argparse scales them to the speed of the machine running the tests.
+BASELINE = {
+    "argparse": 8821,
+    "tallywallet.common": 683,
+    "tallywallet.common.currency": 5244,
+    "tallywallet.common.debunking": 30892,
+}
+
+# The factor by which an import may be slower than its baseline
+SLACK = 3
+
+
+def importtime(stmt):
+    """
+    Run `stmt` in a fresh interpreter with `-X importtime` and return
+    a dictionary of each imported module and its cumulative import time
+    in microseconds.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", stmt],
+        stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    rv = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line.split(":", 1)[1].split("|")
+        try:
+            rv[fields[2].strip()] = int(fields[1])
+        except ValueError:
+            continue  # The header line
+    return rv
+
+
+def fastest(name, runs=3):
+    """
+    Return the shortest cumulative import time of module `name` over
+    several fresh interpreters.
+    """
+    return min(importtime("import " + name)[name] for i in range(runs))
+
+
+def modules(stmt):
+    """
+    Run `stmt` in a fresh interpreter and return the set of names of
+    the modules loaded afterwards.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-c",
+         stmt + "\nimport sys; print(' '.join(sys.modules))"],
+        stdout=subprocess.PIPE, universal_newlines=True, check=True)
+    return set(proc.stdout.split())
+
+
+class ImportTests(unittest.TestCase):
+
+    def test_package_is_lazy(self):
+        mods = modules("import tallywallet.common")
+        self.assertIn("tallywallet.common", mods)
+        self.assertFalse(
+            [i for i in mods if i.startswith("tallywallet.common.")])
+        self.assertNotIn("decimal", mods)
+        self.assertFalse(HEAVY & mods)
+
+    def test_lazy_attribute(self):
+        mods = modules("import tallywallet.common; tallywallet.common.Ledger")
+        self.assertIn("tallywallet.common.ledger", mods)
+        self.assertNotIn("tallywallet.common.finance", mods)
+
+        self.assertIs(
+            tallywallet.common.ledger.Ledger, tallywallet.common.Ledger)
+        self.assertIn("Exchange", dir(tallywallet.common))
+        self.assertRaises(
+            AttributeError, getattr, tallywallet.common, "Nonexistent")
+
+    def test_currency_import(self):
+        mods = modules("import tallywallet.common.currency")
+        self.assertNotIn("decimal", mods)
+        self.assertFalse(HEAVY & mods)
+
+    def test_debunking_import(self):
+        mods = modules("import tallywallet.common.debunking")
+        self.assertFalse(HEAVY & mods)
+
+
+class ImportTimeTests(unittest.TestCase):
+
+    def test_against_baseline(self):
+        scale = fastest("argparse") / BASELINE["argparse"]
+        for name, recorded in BASELINE.items():
+            if name == "argparse":
+                continue
+            with self.subTest(name=name):
+                self.assertLess(fastest(name), SLACK * scale * recorded)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -185,6 +185,30 @@ class LedgerTests(unittest.TestCase):
         self.assertEqual(lhs, rhs)
         self.assertIs(st, Status.ok)
 
+    def test_commit_exchange_gain_on_liability(self):
+        ldgr = Ledger(
+            Column("Canadian cash", Cy.CAD, Role.asset, "{}"),
+            Column("US loan", Cy.USD, Role.liability, "{}"),
+            Column("Capital", Cy.CAD, Role.capital, "{}"),
+            ref=Cy.CAD)
+        cols = ldgr.columns
+        for args in ldgr.adjustments(Exchange({(Cy.USD, Cy.CAD): Dl("1.2")})):
+            ldgr.commit(*args)
+        ldgr.commit(Dl(300), cols["Canadian cash"])
+        ldgr.commit(Dl(100), cols["US loan"])
+        ldgr.commit(Dl(180), cols["Capital"])
+        self.assertIs(Status.ok, ldgr.equation.status)
+
+        # The loan is worth 10 CAD more; a loss to the trading account
+        trade, col, exchange = next(ldgr.adjustments(
+            Exchange({(Cy.USD, Cy.CAD): Dl("1.3")}), [cols["US loan"]]))
+        self.assertEqual(10, trade.gain)
+        ldgr.commit(trade, col, exchange)
+        self.assertEqual(-10, ldgr.value("USD trading account"))
+        lhs, rhs, st = ldgr.equation
+        self.assertEqual(lhs, rhs)
+        self.assertIs(Status.ok, st)
+
     def test_commit_exchange_gain_via_expenses(self):
         """
         From Selinger table 4.4
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+#   encoding: UTF-8
+
+# This file is part of tallywallet.
+#
+# Tallywallet is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Tallywallet is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with tallywallet.  If not, see <http://www.gnu.org/licenses/>.
+
+import decimal
+from decimal import Decimal
+import unittest
+import unittest.mock
+
+from tallywallet.common.finance import schedule
+from tallywallet.common.portfolio import advance
+from tallywallet.common.portfolio import batches
+from tallywallet.common.portfolio import discrepancy
+from tallywallet.common.portfolio import pack
+from tallywallet.common.portfolio import parallel
+from tallywallet.common.portfolio import records
+from tallywallet.common.portfolio import schedules
+from tallywallet.common.portfolio import unpack
+from tallywallet.common.test.helpers import book
+
+
+class PortfolioTests(unittest.TestCase):
+
+    def test_batches(self):
+        notes = book(30)
+        groups = batches(notes)
+        self.assertEqual(30, sum(len(i) for i in groups.values()))
+        for count, index in groups.items():
+            for n in index:
+                self.assertEqual(count, len(list(schedule(notes[n]))))
+
+    def test_exact_mode_matches_schedule(self):
+        notes = book(30)
+        for places, rounding in (
+            (2, decimal.ROUND_UP), (0, decimal.ROUND_HALF_EVEN)
+        ):
+            rv = {}
+            for batch in schedules(notes, places, rounding):
+                for n, record in records(batch, notes):
+                    rv.setdefault(n, []).append(record)
+
+            for n, note in enumerate(notes):
+                self.assertEqual(
+                    list(schedule(note, places, rounding)), rv[n])
+
+    def test_fast_mode_discrepancy(self):
+        notes = book(30)
+        exact = list(schedules(notes))
+        approx = list(schedules(notes, exact=False))
+        self.assertIsInstance(approx[0].balance[0][0], float)
+        diff = discrepancy(exact, approx)
+        self.assertTrue(all(0 < i < Decimal("1E-6") for i in diff))
+        self.assertEqual(
+            (0, 0, 0, 0), discrepancy(exact, schedules(notes)))
+
+    def test_one_pass_per_batch(self):
+        notes = book(2000)
+        for exact in (True, False):
+            with self.subTest(exact=exact):
+                with unittest.mock.patch(
+                    "tallywallet.common.portfolio.advance", wraps=advance
+                ) as passes:
+                    rv = list(schedules(notes, exact=exact))
+                self.assertEqual(len(batches(notes)), passes.call_count)
+                self.assertEqual(len(rv), passes.call_count)
+                self.assertLess(passes.call_count, 20)
+
+
+class ParallelTests(unittest.TestCase):
+
+    def test_pack_round_trip(self):
+        notes = book(10)
+        for exact, kind in ((True, str), (False, bytes)):
+            with self.subTest(exact=exact):
+                for batch in schedules(notes, exact=exact):
+                    cols = pack(batch, [
+                        notes[n].principal if exact
+                        else float(notes[n].principal)
+                        for n in batch.index])
+                    self.assertIsInstance(cols.payment, kind)
+                    self.assertEqual(len(batch.payment), cols.count)
+                    self.assertEqual(batch, unpack(cols))
+
+    def test_parallel_order(self):
+        notes = book(50)
+        expected = [list(schedule(i)) for i in notes]
+        for workers, size in ((0, 1000), (2, 7)):
+            with self.subTest(workers=workers):
+                rv = [[] for i in notes]
+                for cols in parallel(
+                    notes, workers=workers, chunksize=size
+                ):
+                    for n, record in records(unpack(cols), notes):
+                        rv[n].append(record)
+                self.assertEqual(expected, rv)
+
+    def test_parallel_fast_mode(self):
+        notes = book(50)
+        expected = list(schedules(notes, exact=False))
+        rv = [unpack(i) for i in parallel(notes, exact=False, workers=0)]
+        self.assertEqual(expected, rv)
+
+    def test_parallel_context(self):
+        notes = book(20)
+        with decimal.localcontext() as ctx:
+            ctx.prec = 6
+            expected = list(schedules(notes))
+            rv = [
+                unpack(i) for i in parallel(notes, workers=1, chunksize=7)]
+        self.assertEqual(
+            sorted(j for i in expected for j in records(i, notes)),
+            sorted(j for i in rv for j in records(i, notes)))
+        self.assertNotEqual(expected, list(schedules(notes)))
+
+
+if __name__ == "__main__":
+    unittest.main()
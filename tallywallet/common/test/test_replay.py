@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+#   encoding: UTF-8
+
+# This file is part of tallywallet.
+#
+# Tallywallet is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Tallywallet is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with tallywallet.  If not, see <http://www.gnu.org/licenses/>.
+
+import datetime
+from decimal import Decimal as Dl
+import io
+import unittest
+
+from tallywallet.common.currency import Currency as Cy
+from tallywallet.common.ledger import Column
+from tallywallet.common.ledger import Ledger
+from tallywallet.common.ledger import Role
+from tallywallet.common.ledger import Status
+from tallywallet.common.replay import Tick
+from tallywallet.common.replay import coalesce
+from tallywallet.common.replay import read_csv
+from tallywallet.common.replay import read_ndjson
+from tallywallet.common.replay import replay
+
+
+class ReplayTests(unittest.TestCase):
+
+    def setUp(self):
+        self.ldgr = Ledger(
+            Column("Canadian cash", Cy.CAD, Role.asset, "{}"),
+            Column("US cash", Cy.USD, Role.asset, "{}"),
+            Column("Capital", Cy.CAD, Role.capital, "{}"),
+            ref=Cy.CAD)
+
+    def test_read_csv(self):
+        text = "ts,rcv,out,rate\n0,USD,CAD,1.20\n60,USD,CAD,1.30\n"
+        ticks = list(read_csv(io.StringIO(text)))
+        self.assertEqual(2, len(ticks))
+        self.assertEqual(Tick(Dl(60), Cy.USD, Cy.CAD, Dl("1.30")), ticks[1])
+
+    def test_read_ndjson(self):
+        text = (
+            '{"ts": 0, "rcv": "USD", "out": "CAD", "rate": "1.20"}\n'
+            '\n'
+            '{"ts": 60, "rcv": "USD", "out": "CAD", "rate": "1.30"}\n')
+        ticks = list(read_ndjson(io.StringIO(text)))
+        self.assertEqual(2, len(ticks))
+        self.assertEqual(Dl("1.20"), ticks[0].rate)
+
+    def test_read_iso_timestamps(self):
+        text = (
+            "ts,rcv,out,rate\n"
+            "2013-01-01T00:00:30.250,USD,CAD,1.20\n"
+            "2013-01-01T00:00:30+00:00,USD,CAD,1.21\n"
+            "2013-01-01 00:01:00Z,USD,CAD,1.22\n")
+        ticks = list(read_csv(io.StringIO(text)))
+        self.assertEqual(
+            datetime.datetime(2013, 1, 1, 0, 0, 30, 250000), ticks[0].ts)
+        self.assertEqual(datetime.timezone.utc, ticks[1].ts.tzinfo)
+        self.assertEqual(
+            datetime.timedelta(seconds=30), ticks[2].ts - ticks[1].ts)
+
+    def test_bad_record_gives_line(self):
+        text = "ts,rcv,out,rate\n0,USD,CAD,1.20\n01/01/2013,USD,CAD,1.21\n"
+        with self.assertRaisesRegex(ValueError, "line 3"):
+            list(read_csv(io.StringIO(text)))
+
+        text = (
+            '{"ts": 0, "rcv": "USD", "out": "CAD", "rate": "1.20"}\n'
+            '\n'
+            '{"ts": 60, "rcv": "USD", "out": "CAD", "rate": "n/a"}\n')
+        with self.assertRaisesRegex(ValueError, "line 3"):
+            list(read_ndjson(io.StringIO(text)))
+
+    def test_coalesce_window(self):
+        ticks = [
+            Tick(0, Cy.USD, Cy.CAD, Dl("1.20")),
+            Tick(5, Cy.USD, Cy.CAD, Dl("1.21")),
+            Tick(9, Cy.GBP, Cy.CAD, Dl("2.00")),
+            Tick(10, Cy.USD, Cy.CAD, Dl("1.22")),
+        ]
+        batches = list(coalesce(ticks, window=10))
+        self.assertEqual(2, len(batches))
+        self.assertEqual(9, batches[0][0])
+        self.assertEqual(
+            {(Cy.USD, Cy.CAD): Dl("1.21"), (Cy.GBP, Cy.CAD): Dl("2.00")},
+            batches[0][1])
+        self.assertEqual(4, len(list(coalesce(ticks))))
+
+    def test_coalesce_datetimes(self):
+        text = (
+            "ts,rcv,out,rate\n"
+            "2013-01-01T00:00:00,USD,CAD,1.20\n"
+            "2013-01-01T00:00:30,USD,CAD,1.21\n"
+            "2013-01-01T00:01:00,USD,CAD,1.22\n")
+        ticks = list(read_csv(io.StringIO(text)))
+        self.assertEqual(3, len(list(coalesce(ticks))))
+        for window in (60, Dl(60), datetime.timedelta(minutes=1)):
+            with self.subTest(window=window):
+                batches = list(coalesce(ticks, window))
+                self.assertEqual(2, len(batches))
+                self.assertEqual(
+                    datetime.datetime(2013, 1, 1, 0, 0, 30), batches[0][0])
+                self.assertEqual(
+                    Dl("1.21"), batches[0][1][(Cy.USD, Cy.CAD)])
+
+        batches = list(coalesce(
+            [Tick(0, Cy.USD, Cy.CAD, Dl("1.20")),
+             Tick(Dl(30), Cy.USD, Cy.CAD, Dl("1.21"))],
+            datetime.timedelta(minutes=1)))
+        self.assertEqual(1, len(batches))
+
+    def test_replay_datetime_feed(self):
+        text = (
+            '{"ts": "2013-01-01T00:00:00", "rcv": "USD", "out": "CAD", '
+            '"rate": "1.20"}\n'
+            '{"ts": "2013-01-02T00:00:00", "rcv": "USD", "out": "CAD", '
+            '"rate": "1.30"}\n')
+        cols = self.ldgr.columns
+        feed = read_ndjson(io.StringIO(text))
+        list(replay(self.ldgr, [next(feed)]))
+        for val, name in ((60, "Canadian cash"), (100, "US cash")):
+            self.ldgr.commit(Dl(val), cols[name])
+        self.ldgr.commit(Dl(180), cols["Capital"])
+
+        rv = list(replay(self.ldgr, feed, window=60))
+        self.assertEqual(1, len(rv))
+        self.assertEqual(
+            datetime.datetime(2013, 1, 2), rv[0][3]["ts"])
+        self.assertEqual(10, self.ldgr.value("USD trading account"))
+        self.assertIs(Status.ok, self.ldgr.equation.status)
+
+    def test_replay_selinger_4_1(self):
+        """
+        From Selinger table 4.1, replayed from a rate feed.
+        """
+        text = (
+            "ts,rcv,out,rate\n"
+            "0,USD,CAD,1.20\n"
+            "86400,USD,CAD,1.30\n"
+            "172800,USD,CAD,1.25\n"
+            "259200,USD,CAD,1.15\n")
+        cols = self.ldgr.columns
+        feed = read_csv(io.StringIO(text))
+        sim = replay(self.ldgr, [next(feed)])
+        list(sim)
+        for val, name in ((60, "Canadian cash"), (100, "US cash")):
+            self.ldgr.commit(Dl(val), cols[name])
+        self.ldgr.commit(Dl(180), cols["Capital"])
+        self.assertIs(Status.ok, self.ldgr.equation.status)
+
+        gains = []
+        sim = replay(self.ldgr, feed)
+        try:
+            while True:
+                trade, col, exchange, kwargs, st = next(sim)
+                gains.append(trade.gain)
+                self.assertIs(cols["US cash"], col)
+                self.assertIs(Status.ok, st)
+        except StopIteration as end:
+            stats = end.value
+
+        self.assertEqual([10, -5, -10], gains)
+        self.assertEqual(-5, self.ldgr.value("USD trading account"))
+        self.assertIs(Status.ok, self.ldgr.equation.status)
+        self.assertEqual(3, stats.ticks)
+        self.assertEqual(3, stats.batches)
+        self.assertEqual(3, stats.commits)
+        self.assertGreater(stats.tick_rate, 0)
+
+    def test_replay_foreign_liability(self):
+        ldgr = Ledger(
+            Column("US cash", Cy.USD, Role.asset, "{}"),
+            Column("US loan", Cy.USD, Role.liability, "{}"),
+            ref=Cy.CAD)
+        cols = ldgr.columns
+        list(replay(ldgr, [Tick(0, Cy.USD, Cy.CAD, Dl("1.2"))]))
+        ldgr.commit(Dl(100), cols["US cash"])
+        ldgr.commit(Dl(100), cols["US loan"])
+        self.assertIs(Status.ok, ldgr.equation.status)
+
+        list(replay(ldgr, [Tick(1, Cy.USD, Cy.CAD, Dl("1.3"))]))
+        lhs, rhs, st = ldgr.equation
+        self.assertEqual(130, lhs)
+        self.assertEqual(130, rhs)
+        self.assertIs(Status.ok, st)
+        self.assertEqual(0, ldgr.value("USD trading account"))
+
+    def test_replay_skips_unquoted_columns(self):
+        ticks = [Tick(0, Cy.GBP, Cy.XBC, Dl("1.5"))]
+        sim = replay(self.ldgr, ticks)
+        self.assertEqual([], list(sim))
+
+
+if __name__ == "__main__":
+    unittest.main()
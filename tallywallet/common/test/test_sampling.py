@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+#   encoding: UTF-8
+
+# This file is part of tallywallet.
+#
+# Tallywallet is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Tallywallet is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with tallywallet.  If not, see <http://www.gnu.org/licenses/>.
+
+import io
+import unittest
+
+from tallywallet.common.debunking import DAY
+from tallywallet.common.debunking import HOUR
+from tallywallet.common.debunking import WEEK
+from tallywallet.common.debunking import simulate
+from tallywallet.common.sampling import Arrays
+from tallywallet.common.sampling import Journal
+from tallywallet.common.sampling import Schedule
+from tallywallet.common.sampling import decimate
+from tallywallet.common.sampling import periodic
+from tallywallet.common.sampling import schedule
+
+
+class ScheduleTests(unittest.TestCase):
+
+    def test_explicit(self):
+        rv = schedule([WEEK, 0, DAY + 1, DAY, 1], DAY)
+        self.assertEqual(Schedule(DAY, [1, 2, 3, 4, 7]), rv)
+
+    def test_periodic(self):
+        rv = periodic(WEEK, 4 * WEEK, DAY)
+        self.assertEqual([1, 7, 14, 21, 28], rv.ticks)
+        self.assertEqual(
+            schedule([i * WEEK for i in range(5)], DAY), rv)
+        self.assertEqual([24, 48], periodic(DAY, 2 * DAY, HOUR, DAY).ticks)
+
+    def test_decimate(self):
+        # The samples at 0 and DAY both fall in the first timestep
+        rv = periodic(DAY, 10 * DAY, DAY)
+        self.assertEqual(list(range(1, 12)), rv.ticks)
+        self.assertEqual([1, 6, 11], decimate(rv, 5).ticks)
+
+
+class SinkTests(unittest.TestCase):
+
+    def test_samples_not_changed(self):
+        samples = [DAY * i for i in range(0, 31, 10)]
+        output = list(simulate(samples, interval=DAY))
+        self.assertEqual(4, len(samples))
+        self.assertEqual(
+            output, list(simulate(schedule(samples, DAY), interval=DAY)))
+        self.assertRaises(
+            ValueError, list, simulate(schedule(samples, DAY), interval=HOUR))
+
+    def test_sinks(self):
+        arrays = Arrays()
+        stream = io.StringIO()
+        calls = []
+        output = list(simulate(
+            periodic(WEEK, 4 * WEEK, DAY), interval=DAY,
+            sinks=[arrays, Journal(stream), lambda t, l: calls.append(t)]))
+        self.assertEqual([DAY, WEEK, 2 * WEEK, 3 * WEEK, 4 * WEEK], calls)
+        self.assertEqual(calls, arrays.ts)
+        self.assertEqual(5, len(arrays.values["vault"]))
+        self.assertEqual(
+            output[-1].split("[")[-1],
+            stream.getvalue().split("[")[-1])
+        self.assertEqual("".join(output[2:]), stream.getvalue())
+
+    def test_decimated_jump(self):
+        arrays = Arrays()
+        sched = decimate(periodic(DAY, 60 * DAY, DAY), 20)
+        list(simulate(sched, interval=DAY, jump=True, sinks=[arrays]))
+        full = Arrays()
+        list(simulate(
+            periodic(DAY, 60 * DAY, DAY), interval=DAY, sinks=[full]))
+        self.assertEqual(full.ts[::20], arrays.ts)
+        for a, b in zip(full.values["firms"][::20], arrays.values["firms"]):
+            self.assertAlmostEqual(a, b, places=6)
+
+
+if __name__ == "__main__":
+    unittest.main()
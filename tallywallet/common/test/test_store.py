@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+#   encoding: UTF-8
+
+# This file is part of tallywallet.
+#
+# Tallywallet is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Tallywallet is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with tallywallet.  If not, see <http://www.gnu.org/licenses/>.
+
+import decimal
+from decimal import Decimal
+import os
+import marshal
+import tempfile
+import unittest
+import unittest.mock
+
+from tallywallet.common.finance import schedule
+from tallywallet.common.store import ScheduleStore
+from tallywallet.common.store import digest
+from tallywallet.common.store import load
+from tallywallet.common.store import pack
+from tallywallet.common.test.helpers import book
+
+
+class StoreTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "schedules")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_digest(self):
+        note = book(1, periods=1)[0]
+        self.assertEqual(digest(note), digest(note._replace()))
+        self.assertNotEqual(digest(note), digest(note, places=0))
+        self.assertNotEqual(
+            digest(note), digest(note, rounding=decimal.ROUND_HALF_EVEN))
+        self.assertNotEqual(
+            digest(note), digest(note._replace(interest=Decimal("0.041"))))
+        self.assertNotEqual(
+            digest(note), digest(note, context=decimal.Context(prec=6)))
+
+    def test_unknown_format(self):
+        data = marshal.dumps(("tallywallet.store/0", [], []))
+        self.assertRaises(ValueError, load, data, book(1, periods=1)[0])
+
+    def test_pack_round_trip(self):
+        for note in book(5, periods=1):
+            data = pack(schedule(note, places=0))
+            self.assertIsInstance(data, bytes)
+            self.assertEqual(
+                list(schedule(note, places=0)), load(data, note))
+
+    def test_hit_after_miss(self):
+        store = ScheduleStore(self.path)
+        notes = book(10, periods=1)
+        for note in notes:
+            self.assertEqual(list(schedule(note)), store.schedule(note))
+        self.assertEqual((0, 10), store.info()[:2])
+        for note in notes:
+            self.assertEqual(list(schedule(note)), store.schedule(note))
+        self.assertEqual((10, 10), store.info()[:2])
+
+    def test_decimal_context(self):
+        store = ScheduleStore(self.path)
+        note = book(1, periods=1)[0]
+        self.assertEqual(list(schedule(note)), store.schedule(note))
+        with decimal.localcontext() as ctx:
+            ctx.prec = 6
+            expected = list(schedule(note))
+            self.assertEqual(expected, store.schedule(note))
+            self.assertEqual(expected, store.schedule(note))
+        self.assertNotEqual(list(schedule(note)), expected)
+        self.assertEqual((1, 2), store.info()[:2])
+
+    def test_hit_does_not_calculate(self):
+        notes = book(50, periods=1)
+        store = ScheduleStore(self.path)
+        expected = [store.schedule(note) for note in notes]
+        with unittest.mock.patch(
+            "tallywallet.common.store.schedule", wraps=schedule
+        ) as calculated:
+            self.assertEqual(
+                expected, [store.schedule(note) for note in notes])
+        self.assertEqual(0, calculated.call_count)
+        self.assertEqual((50, 50), store.info()[:2])
+
+    def test_persistence(self):
+        notes = book(4, periods=1)
+        store = ScheduleStore(self.path)
+        for note in notes:
+            store.schedule(note)
+
+        store = ScheduleStore(self.path)
+        self.assertGreater(store.info().currsize, 0)
+        for note in notes:
+            self.assertEqual(list(schedule(note)), store.get(note))
+        self.assertIsNone(store.get(notes[0], places=0))
+
+    def test_eviction(self):
+        notes = book(10, periods=1)
+        size = max(len(pack(schedule(i))) for i in notes)
+        store = ScheduleStore(self.path, maxsize=size * 3)
+        for note in notes:
+            store.schedule(note)
+        self.assertLessEqual(store.info().currsize, size * 3)
+        self.assertIsNone(store.get(notes[0]))
+        self.assertIsNotNone(store.get(notes[-1]))
+        self.assertEqual(
+            store.info().currsize,
+            sum(os.path.getsize(os.path.join(self.path, i))
+                for i in os.listdir(self.path)))
+
+    def test_least_recently_used(self):
+        notes = book(3, periods=1)
+        store = ScheduleStore(self.path)
+        for note in notes:
+            store.schedule(note)
+        store.get(notes[0])
+        store.maxsize = store.info().currsize - 1
+        store.put(notes[2])
+        self.assertIsNotNone(store.get(notes[0]))
+        self.assertIsNone(store.get(notes[1]))
+
+    def test_clear(self):
+        store = ScheduleStore(self.path)
+        for note in book(3, periods=1):
+            store.schedule(note)
+        tempfile.mkstemp(suffix=store.temporary, dir=self.path)
+        store.clear()
+        self.assertEqual((0, 0, 0), store.info()[:2] + store.info()[3:])
+        self.assertFalse(os.listdir(self.path))
+
+    def test_bad_file_is_a_miss(self):
+        note = book(1, periods=1)[0]
+        expected = list(schedule(note))
+        for data in (b"", b"\x00garbage", marshal.dumps(None)):
+            with self.subTest(data=data):
+                store = ScheduleStore(self.path)
+                store.schedule(note)
+                path = store._locate(digest(note))
+                with open(path, "r+b") as fObj:
+                    size = len(fObj.read())
+                    fObj.seek(0)
+                    fObj.truncate()
+                    fObj.write(data[:size])
+                self.assertIsNone(store.get(note))
+                self.assertFalse(os.path.exists(path))
+                self.assertEqual(0, store.info().currsize)
+                self.assertEqual(expected, store.schedule(note))
+
+    def test_rewritten_file_is_a_miss(self):
+        notes = book(2, periods=1)
+        store = ScheduleStore(self.path)
+        for note in notes:
+            store.schedule(note)
+        # Files of a different size, shorter and then longer
+        for source, target in (notes, reversed(notes)):
+            with self.subTest(target=target):
+                with open(store._locate(digest(source)), "rb") as fObj:
+                    data = fObj.read()
+                with open(store._locate(digest(target)), "wb") as fObj:
+                    fObj.write(data)
+                self.assertIsNone(store.get(target))
+                self.assertEqual(
+                    list(schedule(target)), store.schedule(target))
+
+    def test_failed_write_leaves_no_file(self):
+        store = ScheduleStore(self.path)
+        with unittest.mock.patch(
+            "tallywallet.common.store.os.replace", side_effect=OSError
+        ):
+            self.assertRaises(OSError, store.schedule, book(1)[0])
+        self.assertFalse(os.listdir(self.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
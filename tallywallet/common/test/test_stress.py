@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+#   encoding: UTF-8
+
+# This file is part of tallywallet.
+#
+# Tallywallet is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Tallywallet is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with tallywallet.  If not, see <http://www.gnu.org/licenses/>.
+
+from decimal import Decimal
+import itertools
+import unittest
+
+from tallywallet.common.currency import Currency as Cy
+from tallywallet.common.debunking import DAY
+from tallywallet.common.debunking import columns
+from tallywallet.common.debunking import simulate
+from tallywallet.common.ledger import Ledger
+from tallywallet.common.ledger import Status
+from tallywallet.common.stress import build
+from tallywallet.common.stress import currencies
+from tallywallet.common.stress import parser
+from tallywallet.common.stress import stress
+from tallywallet.common.stress import walk
+
+
+class StressTests(unittest.TestCase):
+
+    def test_currencies(self):
+        rv = currencies(5)
+        self.assertEqual(5, len(rv))
+        self.assertIs(Cy.USD, rv[0])
+        self.assertEqual(5, len(set(i.name for i in rv)))
+
+    def test_too_many_currencies(self):
+        self.assertRaises(ValueError, currencies, 10000)
+
+    def test_build(self):
+        crncys = currencies(3)
+        ldgr, copies = build(7, crncys)
+        self.assertEqual(7, len(copies))
+        self.assertEqual(
+            [crncys[n % 3] for n in range(7)],
+            [copy[0].currency for copy in copies])
+        self.assertEqual(7 * len(columns) + 3, len(ldgr.columns))
+
+    def test_walk(self):
+        crncys = currencies(3)
+        rv = walk(crncys, 100, 5, seed=1)
+        self.assertEqual(rv, walk(crncys, 100, 5, seed=1))
+        self.assertEqual(6, len(rv))
+        self.assertEqual(0, list(rv)[0])
+        self.assertTrue(all(0 < i <= 100 for i in list(rv)[1:]))
+        self.assertNotIn(Cy.USD, rv[0])
+
+    def test_single_currency(self):
+        # One currency is the money circuit over again
+        ldgr = Ledger(*columns.values(), ref=Cy.USD)
+        list(simulate([5 * DAY], interval=DAY, ledger=ldgr, plan=True))
+        rv, big = stress(3, [Cy.USD], 5, interval=DAY)
+        self.assertEqual(0, rv.failures)
+        for n in range(3):
+            for key in columns:
+                self.assertEqual(
+                    ldgr.value(key), big.value("{}.{}".format(key, n)))
+
+    def test_shocks_keep_balance(self):
+        crncys = currencies(4)
+        shocks = walk(crncys, 48, 6, seed=2)
+        rv, ldgr = stress(12, crncys, 48, shocks, check=8)
+        self.assertEqual(72, rv.columns)
+        self.assertEqual(6, rv.shocks)
+        self.assertEqual(0, rv.failures)
+        self.assertLess(rv.drift, Decimal("0.01"))
+        self.assertTrue(6 <= rv.checks <= 6 + 6)
+        self.assertIs(Status.ok, ldgr.equation.status)
+
+        # Gains and losses are found in the trading accounts
+        trading = [
+            ldgr.value("{} trading account".format(c.name))
+            for c in crncys[1:]]
+        self.assertTrue(all(trading))
+        self.assertEqual(0, ldgr.value("USD trading account"))
+
+    def test_scripted_shock(self):
+        crncys = currencies(2)
+        foreign = crncys[1]
+        shocks = {0: {foreign: Decimal(2)}, 1: {foreign: Decimal(3)}}
+        rv, ldgr = stress(2, crncys, 1, shocks, initial=100)
+        self.assertEqual(1, rv.shocks)
+        self.assertEqual(0, rv.failures)
+
+        # The foreign copy has an asset and a liability of equal value, so
+        # the gain on one is the loss on the other
+        self.assertAlmostEqual(
+            0, ldgr.value("{} trading account".format(foreign.name)))
+
+    def test_timing(self):
+        rv, ldgr = stress(
+            2, currencies(2), 3, clock=itertools.count().__next__)
+        self.assertEqual(["step", "shock", "check"], list(rv.seconds))
+        self.assertEqual(3, rv.seconds["step"])
+        self.assertEqual(3, rv.seconds["check"])
+
+    def test_parser(self):
+        args = parser().parse_args(["--shock", "12:GBP=1.25,CAD=0.75"])
+        tick, rates = args.shock[0]
+        self.assertEqual(12, tick)
+        self.assertEqual(
+            {"GBP": Decimal("1.25"), "CAD": Decimal("0.75")}, rates)
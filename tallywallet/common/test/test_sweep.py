@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+#   encoding: UTF-8
+
+# This file is part of tallywallet.
+#
+# Tallywallet is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Tallywallet is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with tallywallet.  If not, see <http://www.gnu.org/licenses/>.
+
+from collections import OrderedDict
+from decimal import Decimal
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+import unittest.mock
+
+from tallywallet.common.debunking import DAY
+from tallywallet.common.debunking import YEAR
+from tallywallet.common.debunking import columns
+from tallywallet.common.debunking import settings
+from tallywallet.common.debunking import simulate
+from tallywallet.common.sweep import design
+from tallywallet.common.sweep import grid
+from tallywallet.common.sweep import parser
+from tallywallet.common.sweep import recorded
+from tallywallet.common.sweep import run
+from tallywallet.common.sweep import sweep
+from tallywallet.common.sweep import trial
+
+
+class SweepTests(unittest.TestCase):
+
+    samples = [YEAR // 4, YEAR // 2, YEAR]
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "sweep.jsonl")
+        self.points = grid(OrderedDict([
+            ("bank_loan.pa", [Decimal("0.4"), Decimal("0.5")]),
+            ("firms_wages.pa", [2, 3])]))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_grid(self):
+        self.assertEqual(4, len(self.points))
+        self.assertEqual(
+            [(Decimal("0.4"), 2), (Decimal("0.4"), 3),
+             (Decimal("0.5"), 2), (Decimal("0.5"), 3)],
+            [tuple(i.values()) for i in self.points])
+
+    def test_design(self):
+        ranges = OrderedDict([("bank_charge.pa", ("0.01", "0.1"))])
+        rv = design(ranges, 5, seed=1)
+        self.assertEqual(rv, design(ranges, 5, seed=1))
+        self.assertNotEqual(rv, design(ranges, 5, seed=2))
+        self.assertTrue(
+            all(Decimal("0.01") <= i["bank_charge.pa"] <= Decimal("0.1")
+                for i in rv))
+
+    def test_settings(self):
+        rv = settings({"bank_loan.pa": "0.4"})
+        self.assertEqual({"pa": Decimal("0.4")}, rv["bank_loan"])
+        self.assertEqual({}, rv["firms_wages"])
+        self.assertRaises(KeyError, settings, {"bank_loan.paX": 1})
+
+    def test_trial_matches_simulate(self):
+        params = self.points[1]
+        rv = trial(params, self.samples, interval=DAY, number=None,
+                   jump=False)
+        self.assertEqual(len(self.samples), len(rv))
+
+        default = trial({}, self.samples, interval=DAY)
+        self.assertNotEqual(default, rv)
+        journals = list(
+            simulate(list(self.samples), interval=DAY, params=params))
+        self.assertIn(
+            "{: .2f}".format(Decimal(rv[-1][0])), journals[-1])
+
+    def test_columns(self):
+        rv = sweep(self.points, self.samples, workers=0, interval=DAY)
+        self.assertEqual(
+            ["run", "ts", "bank_loan.pa", "firms_wages.pa"] + list(columns),
+            list(rv))
+        self.assertEqual({12}, set(len(i) for i in rv.values()))
+        self.assertEqual([0, 0, 0, 1, 1, 1], rv["run"][:6])
+        self.assertEqual(self.samples * 4, rv["ts"])
+        self.assertEqual(
+            [Decimal(i) for i in trial(self.points[3], self.samples,
+                                       interval=DAY)[-1]],
+            [rv[k][-1] for k in columns])
+
+    def test_parallel_order(self):
+        expected = sweep(self.points, self.samples, workers=0, interval=DAY)
+        self.assertEqual(
+            expected,
+            sweep(self.points, self.samples, workers=2, interval=DAY))
+
+    def test_resume(self):
+        expected = sweep(self.points, self.samples, workers=0, interval=DAY)
+        sweep(self.points[:2], self.samples, path=self.path, workers=0,
+              interval=DAY)
+        with open(self.path, "a") as fObj:
+            fObj.write('{"run": 2, "par')  # Interrupted
+
+        self.assertEqual(2, len(recorded(self.path)))
+        rv = sweep(
+            self.points, self.samples, path=self.path, workers=0,
+            interval=DAY)
+        self.assertEqual(expected, rv)
+        self.assertEqual(4, len(recorded(self.path)))
+        with open(self.path, "r") as fObj:
+            self.assertEqual(5, len(fObj.readlines()))
+
+    def test_resume_settings_must_match(self):
+        sweep(self.points[:2], self.samples, path=self.path, workers=0,
+              interval=DAY)
+        for kwargs in (
+            {"interval": DAY, "samples": self.samples[:2]},
+            {"interval": DAY * 2, "samples": self.samples},
+            {"interval": DAY, "samples": self.samples, "initial": 1000},
+            {"interval": DAY, "samples": self.samples, "number": float},
+            {"interval": DAY, "samples": self.samples, "jump": False},
+        ):
+            with self.subTest(**kwargs):
+                samples = kwargs.pop("samples")
+                self.assertRaises(
+                    ValueError, sweep, self.points, samples,
+                    path=self.path, workers=0, **kwargs)
+        self.assertEqual(2, len(recorded(self.path)))
+
+    def test_parser(self):
+        args = parser().parse_args(
+            ["--grid", "bank_loan.pa=0.4,0.5", "--random", "3"])
+        self.assertEqual(
+            [("bank_loan.pa", [Decimal("0.4"), Decimal("0.5")])], args.grid)
+        self.assertEqual(3, args.random)
+
+    def test_random_needs_range(self):
+        argv = [
+            "sweep", "--grid", "bank_loan.pa=0.4,0.5,0.6", "--random", "3"]
+        err = io.StringIO()
+        with unittest.mock.patch("sys.argv", argv), \
+                unittest.mock.patch(
+                    "tallywallet.common.sweep.main") as main, \
+                contextlib.redirect_stderr(err):
+            self.assertRaises(SystemExit, run)
+        self.assertFalse(main.called)
+        self.assertIn("bank_loan.pa", err.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
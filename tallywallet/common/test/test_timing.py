@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+#   encoding: UTF-8
+
+# This file is part of tallywallet.
+#
+# Tallywallet is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Tallywallet is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with tallywallet.  If not, see <http://www.gnu.org/licenses/>.
+
+from decimal import Decimal
+import itertools
+import json
+import os
+import tempfile
+import unittest
+
+from tallywallet.common.currency import Currency as Cy
+from tallywallet.common.debunking import DAY
+from tallywallet.common.debunking import columns
+from tallywallet.common.debunking import operations
+from tallywallet.common.debunking import simulate
+from tallywallet.common.debunking import timed
+from tallywallet.common.ledger import Ledger
+from tallywallet.common.timing import Timing
+from tallywallet.common.timing import Timings
+
+
+class Sample(object):
+
+    @staticmethod
+    def double(x):
+        return 2 * x
+
+    @property
+    def value(self):
+        return 1
+
+
+class TimingsTests(unittest.TestCase):
+
+    def setUp(self):
+        # Each reading of the clock is one second later
+        self.timings = Timings(clock=itertools.count().__next__)
+
+    def test_wrap(self):
+        fn = self.timings.wrap("double", Sample.double)
+        self.assertEqual(4, fn(2))
+        self.assertEqual(6, fn(3))
+        self.assertEqual([Timing("double", 2, 2)], self.timings.report())
+
+    def test_patch(self):
+        original = Sample.__dict__["double"]
+        with self.timings.patch(Sample, "double"):
+            self.assertIsNot(original, Sample.__dict__["double"])
+            self.assertEqual(2, Sample.double(1))
+        self.assertIs(original, Sample.__dict__["double"])
+        self.assertEqual([Timing("double", 1, 1)], self.timings.report())
+
+    def test_patch_property(self):
+        with self.timings.patch(Sample, "value", "Sample.value"):
+            self.assertEqual(1, Sample().value)
+            self.assertEqual(1, Sample().value)
+        self.assertIsInstance(Sample.__dict__["value"], property)
+        self.assertEqual(
+            [Timing("Sample.value", 2, 2)], self.timings.report())
+
+    def test_errors_are_counted(self):
+        fn = self.timings.wrap("double", Sample.double)
+        self.assertRaises(TypeError, fn)
+        self.assertEqual(1, self.timings.report()[0].calls)
+
+    def test_table(self):
+        self.timings.wrap("double", Sample.double)(1)
+        lines = self.timings.table().splitlines()
+        self.assertEqual(5, len(lines))
+        self.assertEqual(lines[0], lines[2])
+        self.assertEqual(lines[0], lines[4])
+        self.assertEqual(
+            ["double", "1", "1.000000", "1000000.000"], lines[3].split())
+
+    def test_save(self):
+        self.timings.wrap("double", Sample.double)(1)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "timings.json")
+            self.timings.save(path)
+            with open(path, "r") as fObj:
+                rv = json.load(fObj)
+        self.assertEqual([{"name": "double", "calls": 1, "total": 1}], rv)
+
+
+class SimulationTimingTests(unittest.TestCase):
+
+    def test_timed(self):
+        samples = [DAY * i for i in range(0, 11, 5)]
+        expected = list(simulate(samples, interval=DAY))
+        timings = Timings()
+        with timed(timings):
+            output = list(simulate(samples, interval=DAY))
+        self.assertEqual(expected, output)
+        rv = {i.name: i for i in timings.report()}
+        for op in operations:
+            self.assertEqual(10, rv[op.__name__].calls)
+        self.assertEqual(10, rv["equation"].calls)
+        self.assertEqual(4, rv["journal"].calls)
+        self.assertLess(60, rv["commit"].calls)
+
+        # The functions are put back afterwards
+        calls = timings.calls["commit"]
+        ldgr = Ledger(*columns.values(), ref=Cy.USD)
+        ldgr.commit(Decimal(1), columns["vault"])
+        self.assertEqual(calls, timings.calls["commit"])
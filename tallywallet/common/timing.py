@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+#   encoding: UTF-8
+
+# This file is part of tallywallet.
+#
+# Tallywallet is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Tallywallet is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with tallywallet.  If not, see <http://www.gnu.org/licenses/>.
+
+from collections import namedtuple
+from collections import OrderedDict
+from contextlib import contextmanager
+import functools
+import json
+import time
+
+__doc__ = """
+The timing module measures the time spent in chosen functions.
+
+A :py:class:`Timings <tallywallet.common.timing.Timings>` object
+replaces a function with a wrapper which counts its calls and adds up
+their duration. The original is put back afterwards. Nothing is measured
+unless asked for, so there is no cost to code which is not timed.
+
+Times are inclusive. The time of a function counts also the time of the
+functions it calls, eg: the time of an operation of the simulation
+includes that of its commits to the Ledger.
+"""
+
+Timing = namedtuple("Timing", ["name", "calls", "total"])
+Timing.__doc__ = """`{}`
+
+The time spent in one function:
+
+    name
+        The name under which the function was timed.
+    calls
+        The number of calls.
+    total
+        The total duration of the calls in seconds.
+""".format(Timing.__doc__)
+
+
+class Timings(object):
+    """
+    A record of the time spent in functions.
+
+    :param clock:   A callable which returns a time in seconds.
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.calls = OrderedDict()
+        self.totals = OrderedDict()
+
+    def wrap(self, name, fn):
+        """
+        Return a wrapper of `fn` which records its calls under `name`.
+        """
+        self.calls.setdefault(name, 0)
+        self.totals.setdefault(name, 0.0)
+        clock = self.clock
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.totals[name] += clock() - start
+                self.calls[name] += 1
+        return wrapper
+
+    @contextmanager
+    def patch(self, owner, attr, name=None):
+        """
+        Time the function which is the attribute `attr` of `owner`, a module
+        or class, for the duration of a `with` block. A property is timed
+        when its value is read.
+        """
+        name = name or attr
+        original = owner.__dict__[attr]
+        if isinstance(original, property):
+            setattr(owner, attr, property(self.wrap(name, original.fget)))
+        else:
+            setattr(owner, attr, self.wrap(name, original))
+        try:
+            yield self
+        finally:
+            setattr(owner, attr, original)
+
+    def report(self):
+        """
+        Return a list of Timing objects, those of longest total first.
+        """
+        return sorted(
+            (Timing(k, self.calls[k], self.totals[k]) for k in self.calls),
+            key=lambda x: x.total, reverse=True)
+
+    def table(self):
+        """
+        Return a summary of the timings as a table of text.
+        """
+        rows = [
+            (i.name, str(i.calls), "{:.6f}".format(i.total),
+             "{:.3f}".format(1E6 * i.total / i.calls if i.calls else 0))
+            for i in self.report()]
+        heads = ("Function", "Calls", "Total (s)", "Per call (us)")
+        widths = [max(len(r[n]) for r in rows + [heads]) for n in range(4)]
+        rule = " ".join("=" * w for w in widths)
+        lines = [rule, " ".join(
+            h.ljust(w) for h, w in zip(heads, widths)), rule]
+        for row in rows:
+            lines.append(" ".join(
+                [row[0].ljust(widths[0])] +
+                [v.rjust(w) for v, w in zip(row[1:], widths[1:])]))
+        lines.append(rule)
+        return "\n".join(lines) + "\n"
+
+    def save(self, path):
+        """
+        Write the timings to a file as JSON.
+        """
+        with open(path, "w") as fObj:
+            json.dump(
+                [OrderedDict(i._asdict()) for i in self.report()],
+                fObj, indent=0)
+            fObj.write("\n")